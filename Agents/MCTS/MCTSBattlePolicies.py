@@ -3,6 +3,7 @@ from copy import deepcopy
 import numpy as np
 from vgc.behaviour import BattlePolicy
 from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.engine.Rollout import random_move
 from vgc.datatypes.Objects import GameState, PkmTeam, PkmMove, Pkm
 from Logic.Logic_Agent import KnowledgeBase
 from pyvis.network import Network
@@ -268,7 +269,7 @@ class MonteCarloTreeSearch():
             print(f'Expansion phase (expanded {number_my_top_moves} nodes): {node.id} -> {[n.id for n in node.children]}')
         return node.children
 
-    def simulation(self, leafs: list[MCTSNode]) -> None:
+    def simulation(self, leafs: list[MCTSNode]) -> list[tuple[MCTSNode, int]]:
         '''
         Implements the Playout's simulation starting from the newly generated nodes to some nodes with terminal state.
 
@@ -276,7 +277,7 @@ class MonteCarloTreeSearch():
         - leafs: list of nodes from which the simulation starts.
 
         Returns:
-        The list of nodes with terminal state obtained by the simulations.
+        The list of the nodes from which the backpropagation starts, each one with the winner of its simulation.
         '''
         def get_next_node(n: MCTSNode) -> MCTSNode:
             '''
@@ -323,32 +324,37 @@ class MonteCarloTreeSearch():
                 )
             return n.children[0]
         # For each leaf perform a random simulation
-        return_nodes: list[MCTSNode] = []
+        return_nodes: list[tuple[MCTSNode, int]] = []
         for node in leafs:
+            # Case of no tree visualization: the simulated nodes are not needed, the playout runs inside the engine
+            if not self.enable_tree_visualization:
+                winner, _ = node.env.rollout(random_move, random_move)
+                return_nodes.append((node, winner))
+                continue
             while True:
                 node = get_next_node(node)
                 # Case of termination node
                 if node.env.winner != -1:
-                    return_nodes.append(node)
+                    return_nodes.append((node, node.env.winner))
                     break
         # Case of print
         if self.enable_print:
-            print(f'Simulation phase: returned nodes {[n.id for n in return_nodes]} respectively won by {[n.env.winner for n in return_nodes]}')
+            print(f'Simulation phase: returned nodes {[n.id for n, _ in return_nodes]} respectively won by {[w for _, w in return_nodes]}')
         return return_nodes
 
-    def backpropagation(self, nodes: list[MCTSNode]) -> None:
+    def backpropagation(self, nodes: list[tuple[MCTSNode, int]]) -> None:
         '''
         Implements the Backpropagation phase, which updates the utility of the nodes from the starting one to the root.
 
         Params:
-        - nodes: the nodes from which the backpropagation starts.
+        - nodes: the nodes from which the backpropagation starts, each one with the winner of its simulation.
         '''
         # Case of print
         if self.enable_print:
             print('Backpropagation phase:')
         # Performs a backpropagation for each termination node
-        for node in nodes:
-            winner_value = 1 if self.player_index == node.env.winner else 0
+        for node, winner in nodes:
+            winner_value = 1 if self.player_index == winner else 0
             backprop_nodes: list[MCTSNode] = []
             # Backpropagation pass
             while True:
@@ -461,7 +467,7 @@ class MCTSBattlePolicy(BattlePolicy):
 
         # Initializations
         N = self.params['N']
-        state_copy: GameState = deepcopy(state)
+        state_copy: GameState = state.clone()
         tree = MonteCarloTreeSearch(
             player_index=self.player_index,
             env=state_copy,
@@ -1,4 +1,3 @@
-from copy import deepcopy
 import numpy as np
 from customtkinter import CTk, CTkButton, CTkRadioButton, CTkLabel
 from typing import Tuple
@@ -6,7 +5,7 @@ from typing import Tuple
 from vgc.behaviour import BattlePolicy
 from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, DEFAULT_PARTY_SIZE, TYPE_CHART_MULTIPLIER, DEFAULT_N_ACTIONS
 from vgc.datatypes.Objects import GameState, Pkm, PkmMove
-from vgc.datatypes.Types import PkmStat, PkmType, WeatherCondition
+from vgc.engine.PkmBattleEnv import expected_step
 from pyvis.network import Network
 
 
@@ -29,43 +28,6 @@ def get_pkm_move_name(active: Pkm, action: int):
     return move_name
 
 
-def damage_prediction(move_type: PkmType, pkm_type: PkmType, move_power: float, opp_pkm_type: PkmType,
-                    attack_stage: int, defense_stage: int, weather: WeatherCondition) -> float:
-    '''
-    Predicts the damage of a move based on various factors.
-
-    Params:
-    - move_type: the type of the move.
-    - pkm_type: the type of the Pokémon using the move.
-    - move_power: the power of the move.
-    - opp_pkm_type: the type of the opponent Pokémon.
-    - attack_stage: the attack stage of the Pokémon.
-    - defense_stage: the defense stage of the opponent Pokémon.
-    - weather: the current weather condition.
-
-    Returns:
-    The predicted damage.
-    '''
-    stab = 1.5 if move_type == pkm_type else 1.0
-    if (move_type == PkmType.WATER and weather == WeatherCondition.RAIN) or (
-            move_type == PkmType.FIRE and weather == WeatherCondition.SUNNY):
-        weather_modifier = 1.5
-    elif (move_type == PkmType.WATER and weather == WeatherCondition.SUNNY) or (
-            move_type == PkmType.FIRE and weather == WeatherCondition.RAIN):
-        weather_modifier = 0.5
-    else:
-        weather_modifier = 1.0
-
-    stage_level = attack_stage - defense_stage
-    if stage_level >= 0:
-        stage_modifier = (stage_level + 2.0) / 2
-    else:
-        stage_modifier = 2.0 / (abs(stage_level) + 2.0)
-
-    damage = TYPE_CHART_MULTIPLIER[move_type][opp_pkm_type] * stab * weather_modifier * stage_modifier * move_power
-    return damage
-
-
 def simulate_move(game: GameState, move_id: int, player: bool) -> GameState:
     '''
     Simulates a move and returns the new game state.
@@ -78,33 +40,13 @@ def simulate_move(game: GameState, move_id: int, player: bool) -> GameState:
     Returns:
     The new game state after the move.
     '''
-    new_g = deepcopy(game)
-
     if player != 0 and player != 1:
         raise ValueError('Player must be 0 or 1')
 
-    opp_idx = 1 if player == 0 else 0
-
-    my_team = game.teams[player]
-    opp_team = game.teams[opp_idx]
-
-    my_active = my_team.active
-    opp_active = opp_team.active
-
-    if move_id < DEFAULT_PKM_N_MOVES:
-        move = my_active.moves[move_id]
-        if move.weather !=0 :
-            new_g.weather.condition = move.weather
-        elif move.recover !=0 :
-            my_active.hp = min(my_active.hp + move.recover, my_active.max_hp)
-        else:
-            damage = damage_prediction(move.type, my_active.type, move.power, opp_active.type,
-                                    my_team.stage[PkmStat.ATTACK], opp_team.stage[PkmStat.DEFENSE], new_g.weather.condition)
-            opp_active.hp = max(0, opp_active.hp - damage)
-    else:
-        switch_id = move_id - DEFAULT_PKM_N_MOVES
-        if switch_id < len(my_team.party):
-            my_team.active, my_team.party[switch_id] = my_team.party[switch_id], my_team.active
+    # The opponent passes, the engine applies the mean result of the move (accuracy, effects, hazards)
+    actions = [DEFAULT_N_ACTIONS, DEFAULT_N_ACTIONS]
+    actions[player] = move_id
+    new_g, _, _ = expected_step(game, actions)
 
     return new_g
 
@@ -1,5 +1,5 @@
 from vgc.behaviour.BattlePolicies import BattlePolicy
-from vgc.datatypes.Objects import PkmFullTeam
+from vgc.datatypes.Objects import PkmFullTeam, PkmTeam
 from vgc.engine.PkmBattleEnv import PkmBattleEnv
 from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
 from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
@@ -33,6 +33,13 @@ def main():
         except:
             pass
 
+    # Create a Pokemon battle environment, reused for every battle
+    env = PkmBattleEnv(
+        teams=(PkmTeam(),PkmTeam()),
+        debug=True,
+        encode=(player0.requires_encode(), player1.requires_encode())
+    )
+
     # Iterate on each parameters' combination
     combinations_list: list[dict] = get_params_combinations(params_space_p0)
     print(f'\n=== Total Combinations ===\n{len(combinations_list)}\n=== Number of battles per combination ===\n{combinations_list[0]["N_BATTLES"]}')
@@ -57,14 +64,8 @@ def main():
             full_team1: PkmFullTeam = team_gen.get_team()
             team0 = full_team0.get_battle_team([0,1,2])
             team1 = full_team1.get_battle_team([0,1,2])
-            # Create a Pokemon battle environment and reset it to default settings
-            env = PkmBattleEnv(
-                teams=(team0,team1),
-                debug=True,
-                encode=(player0.requires_encode(), player1.requires_encode())
-            )
-            # Run the battle
-            metrics_dict = run_battle(player0, player1, env, mode='no_output')
+            # Run the battle, reusing the Pokemon battle environment with the new teams
+            metrics_dict = run_battle(player0, player1, env, mode='no_output', teams=(team0,team1))
             # Case of player 0 winner
             if metrics_dict['winner'] == 0:
                 player0_winrate += 1
@@ -77,8 +78,6 @@ def main():
             overall_metrics_dict['avg_n_turns'] += metrics_dict['n_turns']
             overall_metrics_dict['avg_n_switches'] += metrics_dict['n_switches']
             overall_metrics_dict['avg_hp_residue'] += metrics_dict['hp_residue']
-            # Reset the environment
-            env.reset()
             player0.n_switches = 0
 
         # Compute the average of the metrics and save them
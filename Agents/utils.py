@@ -2,13 +2,14 @@ import os
 import sys
 from dotenv import dotenv_values
 from vgc.behaviour.BattlePolicies import BattlePolicy
+from vgc.competition.Adjudicator import Adjudicator
 from vgc.engine.PkmBattleEnv import PkmBattleEnv
 from MCTS.MCTSBattlePolicies import MCTSBattlePolicy
 from MiniMax.MiniMaxBattlePolicies import MiniMaxPlayer
 from Logic.Logic_Agent import LogicPolicy
 from Random.Random_Agent import RandomPolicy
 from Combined.Combined_Agent import CombinedPolicy
-from vgc.datatypes.Objects import Pkm, PkmMove
+from vgc.datatypes.Objects import Pkm, PkmMove, PkmTeam
 
 usage_arguments = '-e first_agent.env second_agent.env -a first_agent second_agent -s statistics_path -p p1=v1:type1 ... pN=vN:typeN'
 
@@ -236,7 +237,8 @@ def get_params_combinations(params: dict) -> list[dict]:
     params_combinations.append(params_i)
     return params_combinations
 
-def run_battle(player0: BattlePolicy, player1: BattlePolicy, env: PkmBattleEnv, mode='console') -> dict:
+def run_battle(player0: BattlePolicy, player1: BattlePolicy, env: PkmBattleEnv, mode='console',
+               adjudicator: Adjudicator = None, teams: tuple[PkmTeam, PkmTeam] = None) -> dict:
     '''
     Performs a single battle between the two players "player0" and "player1" in the environment "env".
 
@@ -245,6 +247,8 @@ def run_battle(player0: BattlePolicy, player1: BattlePolicy, env: PkmBattleEnv,
     - player1: the second player as instance of BattlePolicy class.
     - env: environmento of the battle as instance of PkmBattleEnv class.
     - mode: string which identifies the output modality (e.g. 'console', 'ux').
+    - adjudicator: stops long battles, by default a draw after 100 turns.
+    - teams: teams of the battle, to reuse the environment for a new battle (by default the current teams).
 
     Returns:
     A dictionary with the metrics of the battle for the first player's view with the following keys:\n
@@ -252,15 +256,19 @@ def run_battle(player0: BattlePolicy, player1: BattlePolicy, env: PkmBattleEnv,
     - 'n_switches': number of switches of the first player (player0 has to be implemented a self.n_switches \
     variable where is saved this information).\n
     - 'hp_residue': percentage of the total HP of the first player's team which remains at the end of the battle.\n
-    - 'winner': the winner of the battle (0 if the first player wins, 1 if the second player wins).
+    - 'winner': the winner of the battle (0 if the first player wins, 1 if the second player wins, 0.5 for a draw).
     '''
+    if adjudicator is None:
+        adjudicator = Adjudicator(max_turns=100, no_progress_turns=None, evaluator=None)
     # Reset the environment to get the initial state
-    states, _ = env.reset()
+    states, _ = env.reset(teams=teams)
+    adjudicator.reset(env)
     env.render(mode)
-    # Perform a single battle until it's terminated
+    # Perform a single battle until it's terminated or adjudicated
     index = 0
     terminated = False
-    while not terminated and index < 100:
+    adjudicated = False
+    while not terminated and not adjudicated:
         my_action = player0.get_action(states[0])
         opp_action = player1.get_action(states[1])
         try:
@@ -270,6 +278,7 @@ def run_battle(player0: BattlePolicy, player1: BattlePolicy, env: PkmBattleEnv,
         states, _, terminated, _, _ = env.step([my_action,opp_action])
         env.render(mode)
         index += 1
+        adjudicated = not terminated and adjudicator.observe(env)
     # Get the metrics of the battle for player 0
     metrics_dict: dict = {}
     metrics_dict['n_turns'] = index
@@ -280,5 +289,6 @@ def run_battle(player0: BattlePolicy, player1: BattlePolicy, env: PkmBattleEnv,
         hp_resudue += pkm.hp
         tot_hp += pkm.max_hp
     metrics_dict['hp_residue'] = round(number=(100/tot_hp) * hp_resudue, ndigits=2)
-    metrics_dict['winner'] = env.winner if index < 100 else 0.5
+    winner = adjudicator.winner(env) if adjudicated else env.winner
+    metrics_dict['winner'] = 0.5 if winner == -1 else winner
     return metrics_dict
\ No newline at end of file
@@ -16,6 +16,7 @@ from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, DEFAULT_PARTY_SIZE, DEFAU
 from vgc.datatypes.Objects import GameState, Pkm, PkmFullTeam, PkmRoster, PkmTeam, PkmTemplate
 from vgc.datatypes.Types import PkmStat
 from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.engine.Rollout import greedy_damage
 
 # My teambuild
 
@@ -373,29 +374,18 @@ class FlatMCTS(BattlePolicy):
                     numberOfWins+=1
                 """
                 t = False
-                currentGameState = deepcopy(g)
+                currentGameState = g.clone()
 
                 #First Step always with move i
-                o: GameState = deepcopy(currentGameState)
-                o.teams = (o.teams[1], o.teams[0])
-                opponentAction = self.get_greedy_action(o)
+                opponentAction = greedy_damage(currentGameState, 1, 0.)
 
                 s, _, t, _, _ = currentGameState.step([i, opponentAction]) 
                 currentGameState = s[0]
-                
-                while not t :
-                    o: GameState = deepcopy(currentGameState)
-                    o.teams = (o.teams[1], o.teams[0])
-                    opponentAction = self.get_greedy_action(o)
 
-                    m: GameState = deepcopy(currentGameState)
-                    m.teams = (m.teams[0], m.teams[1])
-                    myaction =  self.get_greedy_action(m)
-
-                    s, _, t, _, _ = currentGameState.step([myaction, opponentAction]) 
-                    currentGameState = s[0]
+                #Rest of the battle played greedy by the engine, without building the states of every turn
+                winner = currentGameState.winner if t else currentGameState.rollout(greedy_damage, greedy_damage)[0]
 
-                if(self.getWinner(currentGameState) == 0):
+                if(winner == 0):
                     #print("I won the sim")
                     numberOfWins+=1
                 
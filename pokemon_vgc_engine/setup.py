@@ -19,6 +19,7 @@ setup(
                       'scipy~=1.12.0',
                       'setuptools~=69.1.1',
                       ],
+    extras_require={'numba': ['numba~=0.59.1']},
     classifiers=[
         'Development Status :: 2 - Development',
         'Intended Audience :: Science/Research',
@@ -0,0 +1,52 @@
+import unittest
+
+from vgc.competition.Adjudicator import Adjudicator, hp_evaluator
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, DEFAULT_PKM_N_MOVES
+from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.util.generator.PkmTeamGenerators import RandomTeamGenerator
+
+
+class TestAdjudicator(unittest.TestCase):
+
+    def setUp(self):
+        gen = RandomTeamGenerator()
+        self.env = PkmBattleEnv((gen.get_team().get_battle_team([0, 1, 2]),
+                                 gen.get_team().get_battle_team([0, 1, 2])))
+        self.env.reset()
+
+    def run_battle(self, adjudicator: Adjudicator, actions) -> int:
+        adjudicator.reset(self.env)
+        t = False
+        while not t:
+            _, _, t, _, _ = self.env.step(actions)
+            if not t and adjudicator.observe(self.env):
+                return adjudicator.turn
+        return -1
+
+    def test_no_progress(self):
+        # both trainers pass, nothing changes
+        n_turns = self.run_battle(Adjudicator(max_turns=None, no_progress_turns=5),
+                                  [DEFAULT_N_ACTIONS, DEFAULT_N_ACTIONS])
+        self.assertEqual(n_turns, 5)
+
+    def test_switch_stall(self):
+        # both trainers switch every turn, the team order changes but no hit points do, the turn cap ends the battle
+        # if the stall is not detected
+        adjudicator = Adjudicator(max_turns=50, no_progress_turns=5)
+        n_turns = self.run_battle(adjudicator, [DEFAULT_PKM_N_MOVES, DEFAULT_PKM_N_MOVES])
+        self.assertEqual(n_turns, 5)
+        self.assertEqual(adjudicator.reason, 'no_progress')
+
+    def test_max_turns(self):
+        adjudicator = Adjudicator(max_turns=1, no_progress_turns=None, evaluator=None)
+        self.assertEqual(self.run_battle(adjudicator, [0, 0]), 1)
+        self.assertEqual(adjudicator.reason, 'max_turns')
+        self.assertEqual(adjudicator.winner(self.env), -1)
+
+    def test_hp_evaluator(self):
+        self.env.teams[1].active.hp = 0.
+        self.assertEqual(hp_evaluator(self.env), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+import numpy as np
+
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+from vgc.datatypes.Objects import PkmFullTeam, PkmMove, Pkm, PkmTeam
+from vgc.datatypes.Types import PkmType
+from vgc.engine.BatchedPkmBattleEnv import BatchedPkmBattleEnv
+from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.engine.RandomStream import RandomStream
+from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
+
+
+class TestBatchedPkmBattleEnv(unittest.TestCase):
+    teams = None
+
+    @classmethod
+    def setUpClass(cls):
+        generator = RandomPkmRosterGenerator()
+        roster = generator.gen_roster()
+        cls.teams = []
+        for _ in range(8):
+            pkms = [roster[i].gen_pkm([0, 1, 2, 3]) for i in np.random.choice(len(roster), 6, replace=False)]
+            cls.teams.append((PkmFullTeam(pkms[0:3]).get_battle_team([0, 1, 2]),
+                              PkmFullTeam(pkms[3:6]).get_battle_team([0, 1, 2])))
+
+    def test_game_state(self):
+        env = BatchedPkmBattleEnv(self.teams)
+        env.reset()
+        for b, (team0, team1) in enumerate(self.teams):
+            state = env.get_game_state(b)
+            self.assertEqual(state.teams[0], team0)
+            self.assertEqual(state.teams[1], team1)
+            self.assertEqual(env.get_game_state(b, 1).teams[0], team1)
+
+    def test_battles_terminate(self):
+        env = BatchedPkmBattleEnv(self.teams, seed=0)
+        env.reset()
+        terminated = np.zeros(len(env), dtype=bool)
+        for _ in range(1000):
+            _, terminated = env.step(env.rng.integers(DEFAULT_N_ACTIONS, size=(len(env), 2)))
+            if np.all(terminated):
+                break
+        self.assertTrue(np.all(terminated))
+        self.assertTrue(np.all(env.winner >= 0))
+        # the loser team is fainted, winner is 1 on a draw as in PkmBattleEnv
+        self.assertTrue(np.all(np.where(env.winner == 0, env.team_fainted(1), env.team_fainted(0))))
+
+    def test_same_turn_as_pkm_battle_env(self):
+        move0 = PkmMove(power=30., move_type=PkmType.FIRE)
+        move1 = PkmMove(power=60., move_type=PkmType.WATER)
+
+        def team():
+            return PkmTeam([Pkm(p_type=PkmType.GRASS, max_hp=200., move0=move0, move1=move1, move2=PkmMove(),
+                                move3=PkmMove()), Pkm(p_type=PkmType.FIRE, move0=PkmMove(), move1=PkmMove(),
+                                                      move2=PkmMove(), move3=PkmMove())])
+
+        for actions in [(0, 1), (1, 4), (4, 4)]:
+            env = PkmBattleEnv((team(), team()), encode=(True, True))
+            env.reset()
+            _, expected_r, _, _, _ = env.step(actions)
+            batched_env = BatchedPkmBattleEnv([(team(), team())])
+            batched_env.reset()
+            r, _ = batched_env.step([actions])
+            state = batched_env.get_game_state(0)
+            for t in range(2):
+                self.assertEqual(state.teams[t].active.type, env.teams[t].active.type)
+                self.assertEqual(state.teams[t].active.hp, env.teams[t].active.hp)
+                self.assertEqual(state.teams[t].party[0].hp, env.teams[t].party[0].hp)
+                self.assertAlmostEqual(r[0, t], expected_r[t])
+
+    def test_same_battle_as_pkm_battle_env(self):
+        # battles with equally seeded streams roll the same dice in both engines
+        envs = [PkmBattleEnv((team0.clone(), team1.clone()), encode=(True, True), rng=RandomStream(b))
+                for b, (team0, team1) in enumerate(self.teams)]
+        batched_env = BatchedPkmBattleEnv(self.teams, streams=[RandomStream(b) for b in range(len(self.teams))])
+        batched_env.reset()
+        rng = np.random.default_rng(0)
+        for env in envs:
+            env.reset()
+        terminated = np.zeros(len(envs), dtype=bool)
+        for _ in range(1000):
+            actions = rng.integers(DEFAULT_N_ACTIONS, size=(len(envs), 2))
+            r, batched_terminated = batched_env.step(actions)
+            for b, env in enumerate(envs):
+                if terminated[b]:
+                    continue
+                _, expected_r, terminated[b], _, _ = env.step(actions[b].tolist())
+                self.assertTrue(np.allclose(r[b], expected_r))
+                self.assertEqual(batched_terminated[b], terminated[b])
+                state = batched_env.get_game_state(b)
+                for t in range(2):
+                    self.assertEqual([pkm.hp for pkm in state.teams[t].get_pkm_list()],
+                                     [pkm.hp for pkm in env.teams[t].get_pkm_list()])
+            if np.all(terminated):
+                break
+        self.assertTrue(np.all(terminated))
+        self.assertEqual(batched_env.winner.tolist(), [env.winner for env in envs])
+
+    def test_kernel_engine(self):
+        # the per battle kernel takes the same decisions as the vectorized engine, run here without compiling
+        envs = [BatchedPkmBattleEnv(self.teams, streams=[RandomStream(b) for b in range(len(self.teams))],
+                                    engine=engine) for engine in ('numpy', 'python')]
+        for env in envs:
+            env.reset()
+        rng = np.random.default_rng(1)
+        for _ in range(1000):
+            actions = rng.integers(DEFAULT_N_ACTIONS, size=(len(self.teams), 2))
+            (r0, terminated0), (r1, terminated1) = [env.step(actions) for env in envs]
+            self.assertTrue(np.array_equal(r0, r1))
+            self.assertTrue(np.array_equal(terminated0, terminated1))
+            for name in ('hp', 'status', 'members', 'pp', 'stage', 'confused', 'entry_hazard', 'weather', 'turn'):
+                self.assertTrue(np.array_equal(getattr(envs[0], name), getattr(envs[1], name)), name)
+            if np.all(terminated0):
+                break
+        self.assertTrue(np.all(envs[0].done))
+        self.assertTrue(np.array_equal(envs[0].winner, envs[1].winner))
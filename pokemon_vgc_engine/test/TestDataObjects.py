@@ -50,6 +50,15 @@ class TestEncodingMethods(unittest.TestCase):
             move_copy.reset()
             self.assertEqual(move.pp, move_copy.pp)
 
+    def test_PkmMove_clone(self):
+        moves = sample(STANDARD_MOVE_ROSTER, 10)
+        for move in moves:
+            move_copy = move.clone()
+            self.assertEqual(move, move_copy)
+            self.assertEqual(move.name, move_copy.name)
+            self.assertIsNone(move_copy.owner)
+            self.assertFalse(hasattr(move_copy, '__dict__'))
+
     def test_PkmMoveRoster_eq(self):
         moves = sample(STANDARD_MOVE_ROSTER, 10)
         move_roster = set(moves)
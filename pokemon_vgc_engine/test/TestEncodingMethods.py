@@ -3,12 +3,19 @@ import random
 import unittest
 from copy import deepcopy
 
+import numpy as np
+
+from vgc.balance import DeltaPkm, DeltaRoster
 from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
 from vgc.datatypes.Constants import BASE_HIT_POINTS, MAX_HIT_POINTS
-from vgc.datatypes.Objects import PkmTemplate, PkmTeam, GameState, Weather
+from vgc.datatypes.Objects import PkmTemplate, PkmTeam, PkmFullTeam, GameState, Weather
 from vgc.datatypes.Types import PkmType
 from vgc.util.Encoding import decode_move, encode_move, encode_pkm, decode_pkm, encode_team, decode_team, \
-    encode_game_state, decode_game_state
+    encode_game_state, decode_game_state, partial_encode_game_state, encode_game_state_array, \
+    partial_encode_game_state_array, GAME_STATE_ENCODE_LEN, encode_game_states, encode_pkm_array, PKM_ENCODE_LEN, \
+    EncodedGameStates, decode_game_states, encode_full_team, encode_full_teams, FULL_TEAM_ENCODE_LEN
+from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
+from vgc.util.generator.PkmTeamGenerators import RandomTeamGenerator
 
 
 class TestEncodingMethods(unittest.TestCase):
@@ -67,6 +74,102 @@ class TestEncodingMethods(unittest.TestCase):
             d = decode_game_state(e)
             self.assertEqual(game_state, d)
 
+    def test_encode_game_state_array(self):
+        gen = RandomTeamGenerator()
+        a = np.full(GAME_STATE_ENCODE_LEN + 2, np.nan, dtype=np.float32)
+        for _ in range(10):
+            teams = gen.get_team().get_battle_team([0, 1, 2]), gen.get_team().get_battle_team([0, 1, 2])
+            teams[1].active.hide()
+            teams[1].party[1].moves[0].hide()
+            game_state = GameState(teams, Weather())
+            e = []
+            encode_game_state(e, game_state)
+            encode_game_state_array(a, game_state, offset=1)
+            np.testing.assert_array_equal(a[1:-1], np.array(e, dtype=np.float32))
+            e = []
+            partial_encode_game_state(e, game_state)
+            partial_encode_game_state_array(a, game_state, offset=1)
+            np.testing.assert_array_equal(a[1:-1], np.array(e, dtype=np.float32))
+            self.assertTrue(np.isnan(a[0]) and np.isnan(a[-1]))
+
+    def test_encode_game_states(self):
+        gen = RandomTeamGenerator()
+        states = []
+        for _ in range(5):
+            teams = gen.get_team().get_battle_team([0, 1, 2]), gen.get_team().get_battle_team([0, 1, 2])
+            teams[1].party[0].hide()
+            states.append(GameState(teams, Weather()))
+        out = np.full((8, GAME_STATE_ENCODE_LEN), np.nan, dtype=np.float32)
+        a = encode_game_states(states, out, partial=True)
+        self.assertEqual(a.shape, (5, GAME_STATE_ENCODE_LEN))
+        self.assertTrue(np.shares_memory(a, out))
+        for i, game_state in enumerate(states):
+            e = []
+            partial_encode_game_state(e, game_state)
+            np.testing.assert_array_equal(a[i], np.array(e, dtype=np.float32))
+        e = []
+        encode_game_state(e, states[0])
+        np.testing.assert_array_equal(encode_game_states(states)[0], np.array(e, dtype=np.float32))
+        with self.assertRaises(ValueError):
+            encode_game_states(states, np.zeros((4, GAME_STATE_ENCODE_LEN), dtype=np.float32))
+
+    def test_encode_full_teams(self):
+        gen = RandomTeamGenerator()
+        teams = [gen.get_team() for _ in range(5)]
+        out = np.full((8, FULL_TEAM_ENCODE_LEN), np.nan, dtype=np.float32)
+        a = encode_full_teams(teams, out)
+        self.assertEqual(a.shape, (5, FULL_TEAM_ENCODE_LEN))
+        self.assertTrue(np.shares_memory(a, out))
+        for i, team in enumerate(teams):
+            np.testing.assert_array_equal(a[i], np.array(encode_full_team(team), dtype=np.float32))
+        battle_teams = [PkmFullTeam(team.pkm_list[:3]) for team in teams]
+        a = encode_full_teams(battle_teams)
+        self.assertEqual(a.shape, (5, FULL_TEAM_ENCODE_LEN // 2))
+        np.testing.assert_array_equal(a[0], np.array(encode_full_team(battle_teams[0]), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            encode_full_teams(teams + battle_teams)
+
+    def test_move_encoding_cache(self):
+        roster = RandomPkmRosterGenerator().gen_roster()
+        template = roster[0]
+        pkm = template.gen_pkm([0, 1, 2, 3])
+        pkm.moves[1].pp -= 1
+        a = encode_pkm_array(np.zeros(PKM_ENCODE_LEN, dtype=np.float32), pkm)
+        self.assertIsNotNone(pkm.moves[1].encoding)
+        self.assertIs(pkm.clone().moves[1].encoding, pkm.moves[1].encoding)
+        e = []
+        encode_pkm(e, pkm)
+        np.testing.assert_array_equal(a, np.array(e, dtype=np.float32))
+        # the balance changes of a delta roster are seen by the next encodings
+        move = deepcopy(pkm.moves[0])
+        move.power += 10.
+        DeltaRoster({template.pkm_id: DeltaPkm(template.max_hp, template.type, {0: move})}).apply(roster)
+        self.assertIsNone(pkm.moves[0].encoding)
+        encode_pkm_array(a, pkm)
+        e = []
+        encode_pkm(e, pkm)
+        np.testing.assert_array_equal(a, np.array(e, dtype=np.float32))
+
+    def test_decode_game_states(self):
+        gen = RandomTeamGenerator()
+        states = []
+        for _ in range(5):
+            teams = gen.get_team().get_battle_team([0, 1, 2]), gen.get_team().get_battle_team([0, 1, 2])
+            teams[0].stage[1] = -2
+            teams[1].entry_hazard[0] = 2
+            teams[1].active.moves[0].pp -= 3
+            states.append(GameState(teams, Weather()))
+        a = encode_game_states(states)
+        v = EncodedGameStates(a)
+        self.assertTrue(np.shares_memory(v.moves, a))
+        self.assertFalse(v.moves.flags.writeable)
+        self.assertEqual(v.pp.shape, (5, 2, 3, 4))
+        np.testing.assert_array_equal(v.pkm_type[:, 0, 0], [g.teams[0].active.type for g in states])
+        self.assertEqual(v.pp[0, 1, 0, 0], states[0].teams[1].active.moves[0].pp)
+        for i, game_state in enumerate(decode_game_states(v)):
+            self.assertEqual(game_state, decode_game_state(memoryview(a[i])))
+            np.testing.assert_array_equal(encode_game_states([game_state])[0], a[i])
+
 
 if __name__ == '__main__':
     unittest.main()
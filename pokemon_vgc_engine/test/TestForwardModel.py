@@ -1,9 +1,19 @@
+import pickle
 import unittest
+from copy import deepcopy
 
-from vgc.datatypes.Objects import PkmFullTeam
-from vgc.datatypes.Types import PkmType, PkmStatus
+import numpy as np
+
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, DEFAULT_N_ACTIONS
+from vgc.datatypes.Objects import PkmFullTeam, GameState, PkmMove, PkmTeam, Pkm
+from vgc.datatypes.Types import PkmType, PkmStatus, WeatherCondition
+from vgc.engine.Events import BattleEvent, EventBuffer
 from vgc.engine.HiddenInformation import null_pkm
-from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.engine.PkmBattleEnv import PkmBattleEnv, expected_step
+from vgc.engine.PkmBattleEnvPool import env_pool
+from vgc.engine.RandomStream import RandomStream
+from vgc.engine.Rollout import greedy_damage, random_move
+from vgc.util.Encoding import partial_encode_game_state, partial_encode_game_state_array, GAME_STATE_ENCODE_LEN
 from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
 
 
@@ -237,6 +247,352 @@ class TestForwardModel(unittest.TestCase):
             if opp_move_1.type != PkmType.NORMAL:
                 self.assertNotEqual(opp_move_1.type, null_pkm.moves[0].type)
 
+    def test_clone(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        env.reset()
+        clone = env.clone()
+        self.assertIs(type(clone), PkmBattleEnv)
+        self.assertEqual(clone, env)
+        self.assertIs(clone.teams[0].active.moves[0].owner, clone.teams[0].active)
+        for _ in range(3):
+            clone.step([0, 0])
+        self.assertEqual(env.teams[0].active.moves[0].pp, env.teams[0].active.moves[0].max_pp)
+        self.assertEqual(env.teams[0].active.hp, env.teams[0].active.max_hp)
+        self.assertEqual(env.teams[1].active.hp, env.teams[1].active.max_hp)
+        self.assertEqual(pickle.loads(pickle.dumps(clone)), clone)
+
+    def test_snapshot_restore(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        env.reset()
+        copy = env.clone()
+        snapshot = env.snapshot()
+        for _ in range(5):
+            env.step([4, 0])
+        env.restore(snapshot)
+        self.assertEqual(env, copy)
+        for team, team_copy in zip(env.teams, copy.teams):
+            for pkm, pkm_copy in zip(team.get_pkm_list(), team_copy.get_pkm_list()):
+                self.assertEqual(pkm.hp, pkm_copy.hp)
+                self.assertEqual(pkm.status, pkm_copy.status)
+                self.assertEqual([m.pp for m in pkm.moves], [m.pp for m in pkm_copy.moves])
+            self.assertEqual(team.entry_hazard, team_copy.entry_hazard)
+        self.assertEqual(env.switched, copy.switched)
+
+    def test_push_pop(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        env.reset()
+        copy = env.clone()
+        rewards = [env.push([i % 6, (i + 1) % 6])[0] for i in range(4)]
+        state = env.snapshot()
+        for _ in range(4):
+            env.pop()
+        self.assertEqual(env.snapshot(), copy.snapshot())
+        # the random number generators are also reverted, so the same turns are replayed
+        self.assertEqual([env.push([i % 6, (i + 1) % 6])[0] for i in range(4)], rewards)
+        self.assertEqual(env.snapshot(), state)
+
+    def test_events(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        env.reset()
+        self.assertIsNone(env.events)
+        self.assertEqual(env.log, '')
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False), debug=True)
+        env.reset()
+        self.assertTrue(env.log.startswith('Trainer 0'))
+        self.assertEqual(env.commands[0][0], 'init')
+        env.push([0, 0])
+        self.assertTrue(env.log.startswith('TURN 1'))
+        self.assertGreaterEqual(len(env.commands), env.events.seq)
+        env.pop()
+        self.assertTrue(env.log.startswith('Trainer 0'))
+        self.assertEqual(len(env.commands), 1)
+        # without a consumer the oldest events are overwritten
+        for _ in range(env.events.size):
+            env.step([0, 0])
+        self.assertLessEqual(len(env.events.since(0)), env.events.size)
+
+    def test_event_rewind(self):
+        events = EventBuffer(4)
+        for turn in range(3):
+            events.emit(BattleEvent.TURN, turn)
+        events.emit(BattleEvent.TURN, 3)
+        events.rewind(3)
+        self.assertEqual(events.since(0), [(BattleEvent.TURN, 0), (BattleEvent.TURN, 1), (BattleEvent.TURN, 2)])
+        # events discarded after overwriting the ones before the rewind point do not come back as them
+        for turn in range(10):
+            events.emit(BattleEvent.TURN, 100 + turn)
+        events.rewind(2)
+        self.assertEqual(events.since(0), [])
+        events.emit(BattleEvent.TURN, 2)
+        self.assertEqual(events.since(0), [(BattleEvent.TURN, 2)])
+
+    def test_common_random_numbers(self):
+        # equally seeded battles roll the same dice, whether the stream is given or seeded on reset
+        logs = []
+        for env in [PkmBattleEnv((self.team0.clone(), self.team1.clone()), debug=True, rng=RandomStream(7)),
+                    PkmBattleEnv((self.team0.clone(), self.team1.clone()), debug=True)]:
+            env.reset(seed=7)
+            log = []
+            for i in range(10):
+                env.step([i % 6, (i + 3) % 6])
+                log.append(env.log)
+            logs.append(log)
+        self.assertEqual(logs[0], logs[1])
+
+    def test_outcomes(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        env.reset()
+        state = env.snapshot()
+        for actions in [[0, 0], [1, 4], [3, 2]]:
+            outcomes = env.outcomes(actions)
+            self.assertEqual(env.snapshot(), state)
+            self.assertAlmostEqual(sum(p for p, _, _, _ in outcomes), 1.)
+            results = [(next_env.snapshot(), r) for _, next_env, r, _ in outcomes]
+            self.assertEqual(len(set((s, tuple(r)) for s, r in results)), len(outcomes))
+            # every sampled turn is one of the enumerated outcomes
+            for seed in range(20):
+                env.rng.seed(seed)
+                r, _ = env.push(actions)
+                self.assertIn((env.snapshot(), r), results)
+                env.pop()
+
+    def test_expected_step(self):
+        # turns with only damaging moves are exact, with speed ties, priority, misses, switches and knock outs
+        def team(p_type, hp, party_hp):
+            return PkmTeam([Pkm(p_type, hp, move0=PkmMove(90., .8, move_type=PkmType.FIRE),
+                                move1=PkmMove(40., 1., move_type=PkmType.NORMAL, priority=True),
+                                move2=PkmMove(150., .5, move_type=PkmType.WATER),
+                                move3=PkmMove(60., .9, move_type=PkmType.GRASS))] +
+                           [Pkm(PkmType.ROCK, party) for party in party_hp])
+
+        for teams in [(team(PkmType.FIRE, 120., [80.]), team(PkmType.GRASS, 60., [200.])),
+                      (team(PkmType.WATER, 100., []), team(PkmType.ELECTRIC, 70., []))]:
+            env = PkmBattleEnv(teams, encode=(False, False))
+            env.reset()
+            g = GameState(env.teams, env.weather)
+            state = env.snapshot()
+            for actions in [[0, 0], [1, 2], [2, 1], [3, 3], [0, 4], [DEFAULT_N_ACTIONS, 2]]:
+                outcomes = env.outcomes(actions)
+                for expected, r, p_terminated in [expected_step(g, actions), env.expected_step(actions)]:
+                    self.assertEqual(env.snapshot(), state)
+                    self.assertAlmostEqual(p_terminated, sum(p for p, _, _, t in outcomes if t))
+                    for i in range(2):
+                        self.assertAlmostEqual(r[i], sum(p * r_o[i] for p, _, r_o, _ in outcomes))
+                        hp = sum(sum(pkm.hp for pkm in e.teams[i].get_pkm_list()) * p for p, e, _, _ in outcomes)
+                        self.assertAlmostEqual(sum(pkm.hp for pkm in expected.teams[i].get_pkm_list()), hp)
+
+    def test_expected_step_effects(self):
+        # effects more likely than not are applied
+        sunny_day = PkmMove(0., 1., 5, PkmType.FIRE, weather=WeatherCondition.SUNNY, prob=1.)
+        spore = PkmMove(0., 1., 5, PkmType.GRASS, status=PkmStatus.SLEEP, prob=1.)
+        env = PkmBattleEnv((PkmTeam([Pkm(move0=sunny_day)]), PkmTeam([Pkm(move0=spore)])), encode=(False, False))
+        env.reset()
+        expected, _, _ = expected_step(env, [0, DEFAULT_N_ACTIONS])
+        self.assertEqual(expected.weather.condition, WeatherCondition.SUNNY)
+        self.assertEqual(expected.teams[0].active.status, PkmStatus.NONE)
+        expected, _, _ = expected_step(env, [DEFAULT_N_ACTIONS, 0])
+        self.assertEqual(expected.weather.condition, WeatherCondition.CLEAR)
+        self.assertEqual(expected.teams[0].active.status, PkmStatus.SLEEP)
+        self.assertEqual(env.weather.condition, WeatherCondition.CLEAR)
+        self.assertEqual(env.teams[0].active.status, PkmStatus.NONE)
+
+    def test_expand_all(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False), rng=RandomStream(5))
+        env.reset()
+        for i in range(3):
+            env.step([i % 4, (i + 2) % 4])
+        state = env.snapshot()
+        rng_state = env.rng.get_state()
+        successors, rewards, terminated, fainted = env.expand_all()
+        self.assertEqual(env.snapshot(), state)
+        self.assertEqual(len(successors), DEFAULT_N_ACTIONS ** 2)
+        self.assertEqual(rewards.shape, (DEFAULT_N_ACTIONS ** 2, 2))
+        # every pair ends like a turn applied alone with the same dice
+        for k, actions in enumerate([(i, j) for i in range(DEFAULT_N_ACTIONS) for j in range(DEFAULT_N_ACTIONS)]):
+            env.rng.set_state(rng_state)
+            r, t = env.push(actions)
+            self.assertEqual(successors[k].snapshot(), env.snapshot())
+            self.assertEqual(list(rewards[k]), r)
+            self.assertEqual(terminated[k], t)
+            self.assertEqual(list(fainted[k]), [sum(pkm.fainted() for pkm in team.get_pkm_list())
+                                                for team in env.teams])
+            env.pop()
+
+    def test_rollout(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False), rng=RandomStream(9))
+        env.reset()
+        state = env.snapshot()
+        winner, hp = env.rollout(greedy_damage, random_move)
+        self.assertEqual(env.snapshot(), state)
+        self.assertIn(winner, [0, 1])
+        self.assertEqual(hp[not winner], 0.)
+        self.assertGreater(hp[winner], 0.)
+        winners, hp = env.rollouts(10, max_turns=1)
+        self.assertEqual(env.snapshot(), state)
+        self.assertEqual(hp.shape, (10, 2))
+        self.assertTrue(all(winners == -1))
+        # rollouts on a debug env leave the battle log and UX commands of the last turn untouched
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False), debug=True,
+                           rng=RandomStream(9))
+        env.reset()
+        env.step([0, 0])
+        log, commands, seq = env.log, env.commands, env.events.seq
+        env.rollouts(50)
+        self.assertEqual(env.log, log)
+        self.assertEqual(env.commands, commands)
+        self.assertEqual(env.events.seq, seq)
+
+    def test_reset_teams(self):
+        def play(env, teams):
+            s, _ = env.reset(seed=4, teams=teams)
+            t = False
+            while not t:
+                s, _, t, _, _ = env.step([0, 0])
+            return np.stack(s).tolist(), env.snapshot()
+
+        fresh = PkmBattleEnv((self.team1.clone(), self.team0.clone()))
+        expected = play(fresh, fresh.teams)
+        with env_pool.env() as env:
+            play(env, (self.team0.clone(), self.team1.clone()))
+        with env_pool.env() as reused:
+            self.assertIs(reused, env)
+            self.assertEqual(play(reused, (self.team1.clone(), self.team0.clone())), expected)
+        # a battle left in the middle of a weather does not leak its weather counter into the next one
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        env.reset()
+        env.teams[0].active.moves[0] = PkmMove(0., 1., 5, PkmType.WATER, weather=WeatherCondition.RAIN, prob=1.)
+        env.step([0, DEFAULT_N_ACTIONS])
+        env.step([DEFAULT_N_ACTIONS, DEFAULT_N_ACTIONS])
+        self.assertEqual(env.n_turns_no_clear, 2)
+        env.reset(teams=(self.team0.clone(), self.team1.clone()))
+        fresh = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        fresh.reset()
+        self.assertEqual(env.state_key(), fresh.state_key())
+        self.assertEqual(env.snapshot()[1:], fresh.snapshot()[1:])
+        self.assertEqual(env.n_turns_no_clear, 0)
+
+    def test_profiling(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, True), rng=RandomStream(6))
+        profiler = env.enable_profiling()
+        env.reset()
+        for _ in range(3):
+            s, _, _, _, _ = env.step([0, 0])
+        list(s)
+        stats = profiler.stats()
+        self.assertEqual(stats['turn']['calls'], 3)
+        self.assertEqual(stats['switch']['calls'], 3)
+        # the observations of the first steps were never read, so never built
+        self.assertEqual(stats['observation']['calls'], 2)
+        self.assertGreater(stats['turn']['total_ms'], 0.)
+        self.assertIsNone(env.clone().profiler)
+        env.disable_profiling()
+        env.step([0, 0])
+        self.assertEqual(profiler.stats()['turn']['calls'], 3)
+
+    def test_lazy_observations(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), rng=RandomStream(2))
+        env.reset()
+        s, _, _, _, _ = env.step([0, 0])
+        expected = [[], []]
+        partial_encode_game_state(expected[0], env.game_state_view[0])
+        partial_encode_game_state(expected[1], env.game_state_view[1])
+        self.assertEqual(s[1].dtype, np.float32)
+        np.testing.assert_array_equal(s[1], np.array(expected[1], dtype=np.float32))
+        # the unread observation still shows the turn it was returned for
+        env.step([1, 1])
+        np.testing.assert_array_equal(np.stack(s), np.array(expected, dtype=np.float32))
+        self.assertIs(s[0], s[0])
+        # forward envs are copied from the turn they were returned for as well
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False), rng=RandomStream(2))
+        env.reset()
+        s, _, _, _, _ = env.step([0, 0])
+        expected = env.teams[0].snapshot()[1:], env.teams[1].active.hp, env.turn
+        env.step([1, 1])
+        self.assertEqual((s[0].teams[0].snapshot()[1:], s[0].teams[1].active.hp, s[0].turn), expected)
+
+    def test_lazy_observations_not_read(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(True, False), rng=RandomStream(5))
+        profiler = env.enable_profiling()
+        s, _ = env.reset()
+        for _ in range(5):
+            s[0]
+            s, _, _, _, _ = env.step([0, 0])
+        # the previous observations are still referenced during each step, only the ones read are built
+        self.assertEqual(profiler.stats()['observation']['calls'], 5)
+
+    def test_pickle(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), rng=RandomStream(7))
+        env.reset()
+        s, _, _, _, _ = env.step([0, 0])
+        copies = [pickle.loads(pickle.dumps(env)), deepcopy(env)]
+        for copy in copies:
+            # the teams and weather are GameState slots, outside the env __dict__
+            self.assertEqual(copy, env)
+            self.assertEqual(copy.state_key(), env.state_key())
+            self.assertIs(copy.game_state_view[0].teams[0], copy.teams[0])
+            self.assertIs(copy.game_state_view[1].weather, copy.weather)
+        s, _, _, _, _ = env.step([1, 1])
+        for copy in copies:
+            # the random stream is copied as well, so the copies play the same next turn
+            np.testing.assert_array_equal(np.stack(copy.step([1, 1])[0]), np.stack(s))
+
+    def test_incremental_observations(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), rng=RandomStream(3))
+        rng = RandomStream(4)
+        for _ in range(20):
+            s, _ = env.reset()
+            t = False
+            while not t:
+                for player in range(2):
+                    # observations skipped for a few turns are patched with all the changes since
+                    if rng.random() < 0.7:
+                        expected = partial_encode_game_state_array(np.empty(GAME_STATE_ENCODE_LEN, dtype=np.float32),
+                                                                   env.game_state_view[player])
+                        np.testing.assert_array_equal(s[player], expected)
+                if rng.random() < 0.1:
+                    env.push([0, 0])
+                    env.pop()
+                actions = [int(rng.random() * DEFAULT_N_ACTIONS) for _ in range(2)]
+                s, _, t, _, _ = env.step(actions)
+
+    def test_state_key(self):
+        env = PkmBattleEnv((self.team0.clone(), self.team1.clone()), encode=(False, False))
+        env.reset()
+        key = env.state_key()
+        self.assertEqual(env.clone().state_key(), key)
+        self.assertEqual(GameState((env.teams[0], env.teams[1]), env.weather).state_key(), key)
+        keys = {key}
+        for i in range(4):
+            env.push([i % 4, (i + 1) % 4])
+            keys.add(env.state_key())
+            self.assertEqual(env.clone().state_key(), env.state_key())
+        self.assertEqual(len(keys), 5)
+        for _ in range(4):
+            env.pop()
+        self.assertEqual(env.state_key(), key)
+        # the order of the team members is part of the state
+        env.push([DEFAULT_PKM_N_MOVES, DEFAULT_PKM_N_MOVES + 1])
+        self.assertNotEqual(env.state_key(), key)
+        # the engine advances the weather counter of the game state
+        env.reset()
+        env.teams[0].active.moves[0] = PkmMove(0., 1., 5, PkmType.FIRE, weather=WeatherCondition.SUNNY, prob=1.)
+        for actions in [[0, DEFAULT_N_ACTIONS]] + [[DEFAULT_N_ACTIONS, DEFAULT_N_ACTIONS]] * 2:
+            env.push(actions)
+            self.assertEqual(GameState((env.teams[0], env.teams[1]), env.weather).state_key(), env.state_key())
+        self.assertEqual(env.weather.condition, WeatherCondition.SUNNY)
+        self.assertEqual(env.weather.n_turns_no_clear, 3)
+        self.assertEqual(env.clone().state_key(), env.state_key())
+
+    def test_random_stream(self):
+        rng = RandomStream(3, block_size=8)
+        state = rng.get_state()
+        u = [rng.random() for _ in range(20)]
+        self.assertTrue(all(0. <= x < 1. for x in u))
+        rng.set_state(state)
+        self.assertEqual([rng.random() for _ in range(20)], u)
+        self.assertEqual(RandomStream(3).spawn().take(5), RandomStream(3).spawn().take(5))
+        self.assertNotEqual(RandomStream(3).take(5), RandomStream(3).spawn().take(5))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, DEFAULT_PKM_N_MOVES
+from vgc.engine.PkmBattleVectorEnv import PkmBattleVectorEnv
+from vgc.util.Encoding import GAME_STATE_ENCODE_LEN
+
+
+class TestPkmBattleVectorEnv(unittest.TestCase):
+
+    def run_env(self, n_workers: int):
+        env = PkmBattleVectorEnv(4, n_workers)
+        obs, info = env.reset(seed=0)
+        self.assertEqual(obs.shape, (4, GAME_STATE_ENCODE_LEN))
+        self.assertEqual(obs.dtype, np.float32)
+        rng = np.random.default_rng(0)
+        n_terminated = 0
+        for _ in range(100):
+            mask = info['action_mask']
+            self.assertEqual(mask.shape, (4, DEFAULT_N_ACTIONS))
+            self.assertTrue(np.all(mask[:, :DEFAULT_PKM_N_MOVES]))
+            obs, rewards, terminations, truncations, info = env.step([rng.choice(np.flatnonzero(m)) for m in mask])
+            self.assertTrue(env.observation_space.contains(obs))
+            self.assertEqual(rewards.shape, (4,))
+            n_terminated += terminations.sum()
+            # the ended battles are reported as gymnasium same step autoreset does
+            if terminations.any():
+                np.testing.assert_array_equal(info['_final_obs'], terminations)
+                np.testing.assert_array_equal(info['_final_info'], terminations)
+                for i in range(4):
+                    if terminations[i]:
+                        self.assertTrue(env.single_observation_space.contains(info['final_obs'][i]))
+                        self.assertTrue(info['final_info']['action_mask'][i, 0])
+                    else:
+                        self.assertIsNone(info['final_obs'][i])
+            else:
+                self.assertNotIn('final_obs', info)
+        env.close()
+        self.assertGreater(n_terminated, 0)
+
+    def test_in_process(self):
+        self.run_env(0)
+
+    def test_workers(self):
+        self.run_env(2)
+
+
+if __name__ == '__main__':
+    unittest.main()
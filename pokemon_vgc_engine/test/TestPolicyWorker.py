@@ -0,0 +1,61 @@
+import asyncio
+import time
+import unittest
+
+from vgc.behaviour import BattlePolicy
+from vgc.competition.PolicyWorker import PolicyWorker, select_actions, select_actions_async
+
+THINK_TIME = .2
+
+
+class SlowPolicy(BattlePolicy):
+
+    def get_action(self, s) -> int:
+        time.sleep(THINK_TIME)
+        return s[0]
+
+
+class FailingPolicy(BattlePolicy):
+
+    def get_action(self, s) -> int:
+        raise ValueError()
+
+
+class TestPolicyWorker(unittest.TestCase):
+
+    def test_get_action(self):
+        worker = PolicyWorker(SlowPolicy())
+        self.assertEqual(worker.get_action([3]), 3)
+        worker.close()
+        self.assertFalse(worker.process.is_alive())
+
+    def test_errors(self):
+        worker = PolicyWorker(FailingPolicy())
+        self.assertRaises(RuntimeError, worker.get_action, [0])
+        self.assertEqual(len(select_actions((worker, SlowPolicy()), ([0], [2]))), 2)
+        worker.close()
+
+    def test_parallel_turn(self):
+        workers = (PolicyWorker(SlowPolicy()), PolicyWorker(SlowPolicy()))
+        start = time.perf_counter()
+        self.assertEqual(select_actions(workers, ([1], [2])), [1, 2])
+        self.assertLess(time.perf_counter() - start, 2 * THINK_TIME)
+        for worker in workers:
+            worker.close()
+
+    def test_async_turn(self):
+        workers = (PolicyWorker(SlowPolicy()), PolicyWorker(FailingPolicy()))
+        start = time.perf_counter()
+
+        async def turns():
+            return await asyncio.gather(select_actions_async(workers, ([1], [2])), asyncio.sleep(THINK_TIME))
+
+        actions, _ = asyncio.run(turns())
+        self.assertLess(time.perf_counter() - start, 2 * THINK_TIME)
+        self.assertEqual(actions[0], 1)
+        for worker in workers:
+            worker.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,7 +17,9 @@ class DeltaPkm:
         for idx, move in enumerate(pkm.moves):
             if idx in self.dpm.keys():
                 dpm = self.dpm[idx]
-                move.__dict__.update(dpm.__dict__)
+                for attr in PkmMove.__slots__:
+                    setattr(move, attr, getattr(dpm, attr))
+                move.encoding = None
 
 
 class DeltaRoster:
@@ -1,5 +1,4 @@
 import tkinter
-from copy import deepcopy
 from threading import Thread, Event
 from tkinter import CENTER, DISABLED, NORMAL
 from types import CellType
@@ -152,13 +151,7 @@ class BFSNode:
 
 
 def n_fainted(t: PkmTeam):
-    fainted = 0
-    fainted += t.active.hp == 0
-    if len(t.party) > 0:
-        fainted += t.party[0].hp == 0
-    if len(t.party) > 1:
-        fainted += t.party[1].hp == 0
-    return fainted
+    return (t.active.hp == 0) + sum(pkm.hp == 0 for pkm in t.party)
 
 
 def game_state_eval(s: GameState, depth):
@@ -184,15 +177,15 @@ class BreadthFirstSearch(BattlePolicy):
         node_queue: List[BFSNode] = [root]
         while len(node_queue) > 0 and node_queue[0].depth < self.max_depth:
             current_parent = node_queue.pop(0)
-            # expand nodes of current parent
+            # expand nodes of current parent, opponent select an invalid switch action
+            successors, _, _, fainted = current_parent.g.expand_all([(i, 99) for i in range(DEFAULT_N_ACTIONS)])
+            parent_fainted = [n_fainted(t) for t in current_parent.g.teams]
             for i in range(DEFAULT_N_ACTIONS):
-                g = deepcopy(current_parent.g)
-                s, _, _, _, _ = g.step([i, 99])  # opponent select an invalid switch action
                 # our fainted increased, skip
-                if n_fainted(s[0].teams[0]) > n_fainted(current_parent.g.teams[0]):
+                if fainted[i, 0] > parent_fainted[0]:
                     continue
                 # our opponent fainted increased, follow this decision
-                if n_fainted(s[0].teams[1]) > n_fainted(current_parent.g.teams[1]):
+                if fainted[i, 1] > parent_fainted[1]:
                     a = i
                     while current_parent != root:
                         a = current_parent.a
@@ -203,7 +196,7 @@ class BreadthFirstSearch(BattlePolicy):
                 node.parent = current_parent
                 node.depth = node.parent.depth + 1
                 node.a = i
-                node.g = s[0]
+                node.g = successors[i]
                 node_queue.append(node)
         # no possible win outcomes, return arbitrary action
         if len(node_queue) == 0:
@@ -232,16 +225,17 @@ class Minimax(BattlePolicy):
         node_queue: List[BFSNode] = [root]
         while len(node_queue) > 0 and node_queue[0].depth < self.max_depth:
             current_parent = node_queue.pop(0)
-            # expand nodes of current parent
+            # expand nodes of current parent with all the joint actions
+            successors, _, _, fainted = current_parent.g.expand_all()
+            parent_fainted = [n_fainted(t) for t in current_parent.g.teams]
             for i in range(DEFAULT_N_ACTIONS):
                 for j in range(DEFAULT_N_ACTIONS):
-                    g = deepcopy(current_parent.g)
-                    s, _, _, _, _ = g.step([i, j])  # opponent select an invalid switch action
+                    k = i * DEFAULT_N_ACTIONS + j
                     # our fainted increased, skip
-                    if n_fainted(s[0].teams[0]) > n_fainted(current_parent.g.teams[0]):
+                    if fainted[k, 0] > parent_fainted[0]:
                         continue
                     # our opponent fainted increased, follow this decision
-                    if n_fainted(s[0].teams[1]) > n_fainted(current_parent.g.teams[1]):
+                    if fainted[k, 1] > parent_fainted[1]:
                         a = i
                         while current_parent != root:
                             a = current_parent.a
@@ -252,7 +246,7 @@ class Minimax(BattlePolicy):
                     node.parent = current_parent
                     node.depth = node.parent.depth + 1
                     node.a = i
-                    node.g = s[0]
+                    node.g = successors[k]
                     node_queue.append(node)
         # no possible win outcomes, return arbitrary action
         if len(node_queue) == 0:
@@ -285,13 +279,14 @@ class PrunedBFS(BattlePolicy):
         while len(node_queue) > 0 and node_queue[0].depth < self.max_depth:
             current_parent = node_queue.pop(0)
             # assume opponent follows just the OneTurnLookahead strategy, which is more greedy in damage
-            o: GameState = deepcopy(current_parent.g)
+            o: GameState = current_parent.g.clone()
             # opponent must see the teams swapped
             o.teams = (o.teams[1], o.teams[0])
             j = self.core_agent.get_action(o)
             # expand nodes
+            actions = []
             for i in range(DEFAULT_N_ACTIONS):
-                g = deepcopy(current_parent.g)
+                g = current_parent.g
                 my_team = g.teams[0]
                 my_active = my_team.active
                 opp_team = g.teams[1]
@@ -305,12 +300,15 @@ class PrunedBFS(BattlePolicy):
                     for move in opp_active.moves:
                         if move.power > 0.0 and TYPE_CHART_MULTIPLIER[move.type][my_team.party[p].type] > 1.0:
                             continue
-                s, _, _, _, _ = g.step([i, j])
+                actions.append(i)
+            successors, _, _, fainted = current_parent.g.expand_all([(i, j) for i in actions])
+            parent_fainted = [n_fainted(t) for t in current_parent.g.teams]
+            for k, i in enumerate(actions):
                 # our fainted increased, skip
-                if n_fainted(s[0].teams[0]) > n_fainted(current_parent.g.teams[0]):
+                if fainted[k, 0] > parent_fainted[0]:
                     continue
                 # our opponent fainted increased, follow this decision
-                if n_fainted(s[0].teams[1]) > n_fainted(current_parent.g.teams[1]):
+                if fainted[k, 1] > parent_fainted[1]:
                     a = i
                     while current_parent != root:
                         a = current_parent.a
@@ -321,7 +319,7 @@ class PrunedBFS(BattlePolicy):
                 node.parent = current_parent
                 node.depth = node.parent.depth + 1
                 node.a = i
-                node.g = s[0]
+                node.g = successors[k]
                 node_queue.append(node)
         # no possible win outcomes, return arbitrary action
         if len(node_queue) == 0:
@@ -351,20 +349,21 @@ class TunedTreeTraversal(BattlePolicy):
         while len(node_queue) > 0 and node_queue[0].depth < self.max_depth:
             current_parent = node_queue.pop(0)
             # assume opponent follows just the TypeSelector strategy, which is more greedy in damage
-            o: GameState = deepcopy(current_parent.g)
+            o: GameState = current_parent.g.clone()
             # opponent must see the teams swapped
             o.teams = (o.teams[1], o.teams[0])
             j = self.core_agent.get_action(o)
             # expand nodes with TypeSelector strategy plus non-damaging moves
-            for i in [self.core_agent.get_action(current_parent.g)] + [i for i, m in enumerate(
-                    current_parent.g.teams[0].active.moves) if m.power == 0.]:
-                g = deepcopy(current_parent.g)
-                s, _, _, _, _ = g.step([i, j])
+            actions = [self.core_agent.get_action(current_parent.g)] + [i for i, m in enumerate(
+                current_parent.g.teams[0].active.moves) if m.power == 0.]
+            successors, _, _, fainted = current_parent.g.expand_all([(i, j) for i in actions])
+            parent_fainted = [n_fainted(t) for t in current_parent.g.teams]
+            for k, i in enumerate(actions):
                 # our fainted increased, skip
-                if n_fainted(s[0].teams[0]) > n_fainted(current_parent.g.teams[0]):
+                if fainted[k, 0] > parent_fainted[0]:
                     continue
                 # our opponent fainted increased, follow this decision
-                if n_fainted(s[0].teams[1]) > n_fainted(current_parent.g.teams[1]):
+                if fainted[k, 1] > parent_fainted[1]:
                     a = i
                     while current_parent != root:
                         a = current_parent.a
@@ -375,7 +374,7 @@ class TunedTreeTraversal(BattlePolicy):
                 node.parent = current_parent
                 node.depth = node.parent.depth + 1
                 node.a = i
-                node.g = s[0]
+                node.g = successors[k]
                 node_queue.append(node)
         # no possible win outcomes, return arbitrary action
         if len(node_queue) == 0:
@@ -1,5 +1,5 @@
 from copy import deepcopy
-from typing import List, Optional, Tuple, Union
+from typing import List, Optional, Tuple
 
 import numpy as np
 import torch
@@ -11,11 +11,10 @@ from vgc.balance.meta import MetaData
 from vgc.behaviour import TeamBuildPolicy, BattlePolicy
 from vgc.behaviour.BattlePolicies import TypeSelector
 from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
-from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, MAX_HIT_POINTS
-from vgc.datatypes.Objects import Pkm, PkmTemplate, PkmFullTeam, PkmRoster, PkmTeam, PkmMove
-from vgc.datatypes.Types import N_TYPES, N_STATUS, N_ENTRY_HAZARD
-from vgc.engine.PkmBattleEnv import PkmBattleEnv
-from vgc.util.Encoding import one_hot
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES
+from vgc.datatypes.Objects import Pkm, PkmTemplate, PkmFullTeam, PkmRoster, PkmTeam
+from vgc.engine.PkmBattleEnvPool import env_pool
+from vgc.util.Encoding import FULL_TEAM_ENCODE_LEN, encode_full_teams
 
 
 class RandomTeamBuilder(TeamBuildPolicy):
@@ -63,15 +62,15 @@ def run_battles(pkm0, pkm1, agent0, agent1, n_battles):
     wins = [0, 0]
     t0 = PkmTeam([pkm0])
     t1 = PkmTeam([pkm1])
-    env = PkmBattleEnv((t0, t1), encode=(agent0.requires_encode(), agent1.requires_encode()))
-    for _ in range(n_battles):
-        s, _ = env.reset()
-        t = False
-        while not t:
-            a0 = agent0.get_action(s[0])
-            a1 = agent1.get_action(s[1])
-            s, _, t, _, _ = env.step([a0, a1])
-        wins[env.winner] += 1
+    with env_pool.env(encode=(agent0.requires_encode(), agent1.requires_encode())) as env:
+        for b in range(n_battles):
+            s, _ = env.reset(teams=(t0, t1)) if b == 0 else env.reset()
+            t = False
+            while not t:
+                a0 = agent0.get_action(s[0])
+                a1 = agent1.get_action(s[1])
+                s, _, t, _, _ = env.step([a0, a1])
+            wins[env.winner] += 1
     return wins
 
 
@@ -264,48 +263,19 @@ def qmapping(qnet, team, pkms, k=5) -> List[int]:
     return torch.topk(torch.from_numpy(qpkm), k)[1]
 
 
-def encode_move(e, move: PkmMove):
-    e += [(move.power / MAX_HIT_POINTS) * move.acc if move.fixed_damage == 0.0 else move.fixed_damage / MAX_HIT_POINTS,
-          move.priority,
-          move.prob,
-          move.target,
-          move.recover / MAX_HIT_POINTS,
-          move.stat.value,
-          move.stage / 2]
-    e += one_hot(move.type, N_TYPES)
-    e += one_hot(move.status, N_STATUS)
-    e += [move.weather != move.weather.CLEAR]
-    e += one_hot(move.hazard, N_ENTRY_HAZARD)
-
-
-def encode_pkm(e, pkm: Pkm):
-    e += [pkm.max_hp / MAX_HIT_POINTS]
-    e += one_hot(pkm.type, N_TYPES)
-    for move in pkm.moves:
-        encode_move(e, move)
-
-
-def encode_full_team(team: PkmFullTeam):
-    e = []
-    for pkm in team.pkm_list:
-        encode_pkm(e, pkm)
-    return e
-
-
-FULL_TEAM_ENCODE_LEN = len(encode_full_team(PkmFullTeam()))
-
 def get_counter(opponent_teams, usage, pkms: List[Pkm], mlp, conf: GAConfigs):
-    encoded_teams = []
-    for team in opponent_teams:
-        encoded_teams.append(encode_full_team(team))
+    # one row (my team, opponent team) per opponent team, the candidate team is written in place for each solution
+    encoded_teams = encode_full_teams(opponent_teams)
+    encode_len = encoded_teams.shape[1]
+    pairs = np.empty((len(opponent_teams), 2 * encode_len), dtype=np.float32)
+    pairs[:, encode_len:] = encoded_teams
+    batch = torch.from_numpy(pairs)
 
     def fitness_counter_team(sol, solution_idx):
         my_team = PkmFullTeam([pkms[sol[0]], pkms[sol[1]], pkms[sol[2]]])
-        em = encode_full_team(my_team)
-        fitness = torch.empty((len(encoded_teams)), dtype=torch.float)
+        pairs[:, :encode_len] = encode_full_teams([my_team])
         with torch.no_grad():
-            for i, e_opp_team in enumerate(encoded_teams):
-                fitness[i] = torch.sigmoid(mlp(torch.Tensor([em + e_opp_team])))[0][0].item()
+            fitness = torch.sigmoid(mlp(batch))[:, 0]
         return torch.dot(fitness, usage).item()
 
     conf.init_range_high = len(pkms) - 1
@@ -403,6 +373,20 @@ def get_winrate_pred(mlp: PredictorMLP, team0: np.ndarray, team1: np.ndarray):
     return torch.sigmoid(mlp(torch.Tensor([team0 + team1])))[0][0].item()
 
 
+def get_winrates_pred(mlp: PredictorMLP, teams: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """
+    Predict the win rates of many matchups with a single forward pass.
+
+    :param mlp: win rate predictor
+    :param teams: encoded teams from encode_full_teams
+    :param rows: first team of each matchup
+    :param cols: second team of each matchup
+    :return: win rate of the first team of each matchup
+    """
+    with torch.no_grad():
+        return torch.sigmoid(mlp(torch.from_numpy(np.concatenate((teams[rows], teams[cols]), axis=1))))[:, 0].numpy()
+
+
 class MaxTeamCoverage(IndividualPkmCounter):
     """
     We find optimal teams against individual opponent teams and maximize coverage assuming our opponent is also, and
@@ -433,26 +417,16 @@ class MaxTeamCoverage(IndividualPkmCounter):
             usage = torch.ones(1)
             ids, _ = get_counter([team], usage, self.pkms, self.mlp, self.conf)
             counter_teams.append(PkmFullTeam([self.pkms[ids[0]], self.pkms[ids[1]], self.pkms[ids[2]]]))
-        encoded_teams: List[Union[PkmFullTeam, np.ndarray]] = []
         all_teams = meta_teams + counter_teams
+        n_teams = len(all_teams)
+        team_matchup_table = np.full((n_teams, n_teams), 0.5)
+        rows, cols = np.triu_indices(n_teams, 1)
         if self.must_encode:
-            for team in all_teams:
-                encoded_teams.append(np.array(encode_full_team(team)))
+            winrates = get_winrates_pred(self.mlp, encode_full_teams(all_teams), rows, cols)
         else:
-            encoded_teams = all_teams
-        n_teams = len(encoded_teams)
-        team_matchup_table = np.zeros((n_teams, n_teams))
-        for i, team0 in enumerate(encoded_teams):
-            for j, team1 in enumerate(encoded_teams[i:]):
-                if j == 0:  # t0 == t1
-                    team_matchup_table[i][i] = 0.5
-                else:
-                    if self.must_encode:
-                        winrate = get_winrate_pred(self.mlp, team0, team1)
-                    else:
-                        winrate = get_winrate_sim(team0, team1)
-                    team_matchup_table[i][i + j] = winrate
-                    team_matchup_table[i + j][i] = 1.0 - winrate
+            winrates = np.array([get_winrate_sim(all_teams[i], all_teams[j]) for i, j in zip(rows, cols)])
+        team_matchup_table[rows, cols] = winrates
+        team_matchup_table[cols, rows] = 1.0 - winrates
         policy = get_policy(team_matchup_table, n_teams)
         policy /= sum(policy)
         p: int = np.random.choice(n_teams, 1, p=policy)
@@ -26,6 +26,13 @@ class BattlePolicy(Behaviour):
     def get_action(self, s: Union[List[float], GameState]) -> int:
         pass
 
+    async def get_action_async(self, s: Union[List[float], GameState]) -> int:
+        """
+        Awaitable get_action, used by AsyncBattleMatch. Policies that wait on other processes or the network
+        override it to release the event loop while waiting, by default it is get_action.
+        """
+        return self.get_action(s)
+
 
 class TeamSelectionPolicy(Behaviour):
 
@@ -0,0 +1,89 @@
+from typing import Callable, Optional, Tuple
+
+from vgc.datatypes.Constants import DEFAULT_BATTLE_MAX_TURNS, DEFAULT_BATTLE_NO_PROGRESS_TURNS
+from vgc.datatypes.Objects import GameState, Pkm
+
+# Evaluators declare the winner of an adjudicated battle from its state, -1 for a draw.
+BattleEvaluator = Callable[[GameState], int]
+
+
+def hp_evaluator(g: GameState) -> int:
+    """
+    Declare the winner the trainer with the highest fraction of remaining hit points.
+
+    :param g: battle state
+    :return: winner, -1 on a tie
+    """
+    hp = [sum(pkm.hp / pkm.max_hp for pkm in team.get_pkm_list()) for team in g.teams]
+    if hp[0] > hp[1]:
+        return 0
+    elif hp[1] > hp[0]:
+        return 1
+    return -1
+
+
+class Adjudicator:
+
+    def __init__(self, max_turns: Optional[int] = DEFAULT_BATTLE_MAX_TURNS,
+                 no_progress_turns: Optional[int] = DEFAULT_BATTLE_NO_PROGRESS_TURNS,
+                 evaluator: Optional[BattleEvaluator] = hp_evaluator):
+        """
+        Stop battles that run too long, which bounds the duration of a battle loop. A battle is adjudicated after
+        max_turns turns, or after no_progress_turns turns in a row without any hit points change (fainting included),
+        switching alone is no progress. The evaluator then declares the winner.
+
+        :param max_turns: turn cap, None for no cap
+        :param no_progress_turns: turns without progress, None to not detect it
+        :param evaluator: declares the winner of an adjudicated battle, None to declare a draw
+        """
+        self.max_turns = max_turns
+        self.no_progress_turns = no_progress_turns
+        self.evaluator = evaluator
+        self.turn = 0
+        self.reason: Optional[str] = None
+        self.__roster: Tuple[Pkm, ...] = ()
+        self.__hp: Tuple[float, ...] = ()
+        self.__no_progress = 0
+
+    def reset(self, g: GameState):
+        """
+        Start watching a battle.
+
+        :param g: initial battle state
+        """
+        self.turn = 0
+        self.reason = None
+        # fixed roster order, the team order changes on every switch
+        self.__roster = tuple(pkm for team in g.teams for pkm in team.get_pkm_list())
+        self.__hp = self.__get_hp()
+        self.__no_progress = 0
+
+    def observe(self, g: GameState) -> bool:
+        """
+        Register a played turn of a battle that did not end.
+
+        :param g: battle state after the turn
+        :return: True if the battle must be adjudicated
+        """
+        self.turn += 1
+        hp = self.__get_hp()
+        if hp == self.__hp:
+            self.__no_progress += 1
+        else:
+            self.__hp = hp
+            self.__no_progress = 0
+        if self.max_turns is not None and self.turn >= self.max_turns:
+            self.reason = 'max_turns'
+        elif self.no_progress_turns is not None and self.__no_progress >= self.no_progress_turns:
+            self.reason = 'no_progress'
+        return self.reason is not None
+
+    def winner(self, g: GameState) -> int:
+        """
+        :param g: battle state
+        :return: declared winner of an adjudicated battle, -1 for a draw
+        """
+        return -1 if self.evaluator is None else self.evaluator(g)
+
+    def __get_hp(self) -> Tuple[float, ...]:
+        return tuple(pkm.hp for pkm in self.__roster)
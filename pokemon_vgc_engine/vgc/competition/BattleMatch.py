@@ -1,14 +1,17 @@
-import random
+import asyncio
 from random import sample
 from typing import Tuple, List, Optional
 
 from vgc.balance.meta import MetaData
 from vgc.behaviour import BattlePolicy
+from vgc.competition.Adjudicator import Adjudicator
 from vgc.competition.Competitor import Competitor, CompetitorManager
-from vgc.datatypes.Constants import DEFAULT_MATCH_N_BATTLES, DEFAULT_TEAM_SIZE, DEFAULT_N_ACTIONS
+from vgc.competition.PolicyWorker import PolicyWorker, select_actions, select_actions_async
+from vgc.datatypes.Constants import DEFAULT_MATCH_N_BATTLES, DEFAULT_TEAM_SIZE
 from vgc.datatypes.Objects import PkmFullTeam, PkmTeam
 from vgc.engine.HiddenInformation import hide_team
 from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.engine.PkmBattleEnvPool import env_pool
 from vgc.util.generator.PkmTeamGenerators import PkmTeamGenerator
 
 
@@ -27,29 +30,53 @@ class BattleMatch:
 
     def __init__(self, competitor0: CompetitorManager, competitor1: CompetitorManager,
                  n_battles: int = DEFAULT_MATCH_N_BATTLES, debug: bool = False, render: bool = False,
-                 meta_data: Optional[MetaData] = None, random_teams=False, update_meta=False):
+                 meta_data: Optional[MetaData] = None, random_teams=False, update_meta=False,
+                 adjudicator: Optional[Adjudicator] = None, concurrent: bool = False):
         self.n_battles: int = n_battles
         self.cms: Tuple[CompetitorManager, CompetitorManager] = (competitor0, competitor1)
         self.wins: List[int] = [0, 0]
+        self.adjudicator = Adjudicator() if adjudicator is None else adjudicator
+        self.adjudications = 0
         self.debug = debug
         self.render_mode = 'ux' if render else 'console'
         self.finished = False
         self.meta_data = meta_data
         self.random_teams = random_teams
         self.update_meta = update_meta
+        self.concurrent = concurrent
+
+    def _battle_policies(self) -> Tuple[BattlePolicy, BattlePolicy]:
+        """
+        Battle policies of the competitors, each one run by a PolicyWorker in concurrent mode so both players decide
+        each turn at the same time.
+        """
+        a0 = self.cms[0].competitor.battle_policy
+        a1 = self.cms[1].competitor.battle_policy
+        if self.concurrent:
+            return PolicyWorker(a0), PolicyWorker(a1)
+        return a0, a1
 
     def run(self):
+        a0, a1 = self._battle_policies()
+        for battle in self._battles():
+            self._count(self._run_battle(a0, a1, *battle))
+        self._finish(a0, a1)
+
+    def _battles(self):
+        """
+        Team selection of each battle of the match, until the match is decided.
+
+        :return: generator of the battle teams and predicted opponent teams
+        """
         c0 = self.cms[0].competitor
         c1 = self.cms[1].competitor
         team0 = self.cms[0].team
         team1 = self.cms[1].team
-        a0 = c0.battle_policy
-        a1 = c1.battle_policy
         # fully hide team information
         team0.hide()
         team1.hide()
         b = 0
-        while b < self.n_battles:
+        while b < self.n_battles and max(self.wins) <= self.n_battles // 2:
             # reveal pkm identities
             team0.reveal_pkm()
             team1.reveal_pkm()
@@ -70,17 +97,20 @@ class BattleMatch:
             b += 1
             if self.debug:
                 print('BATTLE ' + str(b) + '\n')
-            winner = self._run_battle(a0, a1, battle_team0, battle_team1, battle_team1_p, battle_team0_p)
+            yield battle_team0, battle_team1, battle_team1_p, battle_team0_p
+
+    def _count(self, winner: int):
+        if winner != -1:
             self.wins[winner] += 1
-            if self.wins[winner] > self.n_battles // 2:
-                break
+
+    def _finish(self, a0: BattlePolicy, a1: BattlePolicy):
         if self.debug:
             print('MATCH RESULTS ' + str(self.wins) + '\n')
         a0.close()
         a1.close()
         if self.update_meta:
-            self.meta_data.update_with_team(team0)
-            self.meta_data.update_with_team(team1)
+            self.meta_data.update_with_team(self.cms[0].team)
+            self.meta_data.update_with_team(self.cms[1].team)
         self.finished = True
 
     def __team_prediction(self, c: Competitor, opp_team_view: PkmFullTeam) -> PkmFullTeam:
@@ -94,29 +124,36 @@ class BattleMatch:
 
     def _run_battle(self, a0: BattlePolicy, a1: BattlePolicy, team0: PkmTeam, team1: PkmTeam,
                     team1_p: Optional[PkmTeam] = None, team0_p: Optional[PkmTeam] = None) -> int:
-        env = PkmBattleEnv((team0, team1), debug=self.debug, encode=(a0.requires_encode(), a1.requires_encode()))
+        with env_pool.env(self.debug, (a0.requires_encode(), a1.requires_encode())) as env:
+            s = self._start_battle(env, team0, team1, team1_p, team0_p)
+            t = False
+            while not t:
+                s, _, t, _, _ = env.step(select_actions((a0, a1), s))
+                if self.debug:
+                    env.render(self.render_mode)
+                if not t and self.adjudicator.observe(env):
+                    return self._adjudicate(env)
+            return env.winner
+
+    def _start_battle(self, env: PkmBattleEnv, team0: PkmTeam, team1: PkmTeam, team1_p: Optional[PkmTeam],
+                      team0_p: Optional[PkmTeam]):
+        predictions = None
         if team1_p is not None and team0_p is not None:
             team1_p.reset()
             team0_p.reset()
-            env.set_predictions(team1_p, team0_p)
-        s, _ = env.reset()
+            predictions = (team1_p, team0_p)
+        s, _ = env.reset(teams=(team0, team1), predictions=predictions)
+        self.adjudicator.reset(env)
         if self.debug:
             env.render(self.render_mode)
-        t = False
-        while not t:
-            try:
-                act0 = a0.get_action(s[0])
-            except:
-                act0 = random.randint(0, DEFAULT_N_ACTIONS - 1)
-            try:
-                act1 = a1.get_action(s[1])
-            except:
-                act1 = random.randint(0, DEFAULT_N_ACTIONS - 1)
-            a = [act0, act1]
-            s, _, t, _, _ = env.step(a)
-            if self.debug:
-                env.render(self.render_mode)
-        return env.winner
+        return s
+
+    def _adjudicate(self, env: PkmBattleEnv) -> int:
+        self.adjudications += 1
+        winner = self.adjudicator.winner(env)
+        if self.debug:
+            print('ADJUDICATED (' + self.adjudicator.reason + ') WINNER ' + str(winner) + '\n')
+        return winner
 
     def winner(self) -> int:
         """
@@ -129,13 +166,14 @@ class RandomTeamsBattleMatch(BattleMatch):
 
     def __init__(self, gen: PkmTeamGenerator, competitor0: CompetitorManager, competitor1: CompetitorManager,
                  n_battles: int = DEFAULT_MATCH_N_BATTLES, debug: bool = False, render: bool = False,
-                 meta_data: Optional[MetaData] = None, random_teams=False):
-        super().__init__(competitor0, competitor1, n_battles, debug, render, meta_data, random_teams)
+                 meta_data: Optional[MetaData] = None, random_teams=False, adjudicator: Optional[Adjudicator] = None,
+                 concurrent: bool = False):
+        super().__init__(competitor0, competitor1, n_battles, debug, render, meta_data, random_teams,
+                         adjudicator=adjudicator, concurrent=concurrent)
         self.gen: PkmTeamGenerator = gen
 
     def run(self):
-        a0 = self.cms[0].competitor.battle_policy
-        a1 = self.cms[1].competitor.battle_policy
+        a0, a1 = self._battle_policies()
         tie = True
         n_runs = 0
         while tie or n_runs < 10:
@@ -143,14 +181,38 @@ class RandomTeamsBattleMatch(BattleMatch):
             team1 = self.gen.get_team().get_battle_team([0, 1, 2])
             if self.debug:
                 print('BATTLE\n')
-            winner0 = self._run_battle(a0, a1, team0, team1)
-            self.wins[winner0] += 1
-            winner1 = self._run_battle(a0, a1, team1, team0)
-            self.wins[winner1] += 1
+            self._count(self._run_battle(a0, a1, team0, team1))
+            self._count(self._run_battle(a0, a1, team1, team0))
             tie = self.wins[0] == self.wins[1]
             n_runs += 1
-        if self.debug:
-            print('MATCH RESULTS ' + str(self.wins) + '\n')
-        a0.close()
-        a1.close()
-        self.finished = True
+        self._finish(a0, a1)
+
+
+class AsyncBattleMatch(BattleMatch):
+    """
+    Match whose battles are coroutines awaiting the actions of the policies with BattlePolicy.get_action_async, so
+    an event loop can interleave many matches and overlap the latency of remote or worker policies. Team selection
+    and prediction are still called synchronously.
+    """
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        a0, a1 = self._battle_policies()
+        for battle in self._battles():
+            self._count(await self._run_battle_async(a0, a1, *battle))
+        self._finish(a0, a1)
+
+    async def _run_battle_async(self, a0: BattlePolicy, a1: BattlePolicy, team0: PkmTeam, team1: PkmTeam,
+                                team1_p: Optional[PkmTeam] = None, team0_p: Optional[PkmTeam] = None) -> int:
+        with env_pool.env(self.debug, (a0.requires_encode(), a1.requires_encode())) as env:
+            s = self._start_battle(env, team0, team1, team1_p, team0_p)
+            t = False
+            while not t:
+                s, _, t, _, _ = env.step(await select_actions_async((a0, a1), s))
+                if self.debug:
+                    env.render(self.render_mode)
+                if not t and self.adjudicator.observe(env):
+                    return self._adjudicate(env)
+            return env.winner
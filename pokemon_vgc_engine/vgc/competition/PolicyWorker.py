@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing as mp
+import random
+from multiprocessing.connection import Connection
+from typing import List, Optional, Sequence
+
+from vgc.behaviour import BattlePolicy
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+from vgc.util.Networking import wait_readable
+
+
+def _policy_worker_loop(conn: Connection, policy: BattlePolicy):
+    try:
+        while True:
+            command, s = conn.recv()
+            if command == 'get_action':
+                try:
+                    action = policy.get_action(s)
+                except Exception as e:
+                    action = RuntimeError(repr(e))
+                conn.send(action)
+            elif command == 'close':
+                break
+    finally:
+        policy.close()
+        conn.close()
+
+
+class PolicyWorker(BattlePolicy):
+
+    def __init__(self, policy: BattlePolicy, context: Optional[str] = None):
+        """
+        Battle policy run by a worker process, so both players of a turn can decide at the same time, see
+        select_actions. The worker owns the policy from now on, its state stays in the worker between turns and
+        battles, and it is closed with the worker.
+
+        :param policy: battle policy
+        :param context: multiprocessing start method, the platform default if None
+        """
+        self.__encode = policy.requires_encode()
+        ctx = mp.get_context(context)
+        self.conn, worker_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_policy_worker_loop, args=(worker_conn, policy), daemon=True)
+        self.process.start()
+        worker_conn.close()
+
+    def submit(self, s):
+        """
+        Ask the worker for the action of a state without waiting for it.
+
+        :param s: state
+        """
+        self.conn.send(('get_action', s))
+
+    def result(self) -> int:
+        """
+        Wait for the action of the last submitted state.
+
+        :return: action
+        """
+        action = self.conn.recv()
+        if isinstance(action, Exception):
+            raise action
+        return action
+
+    def get_action(self, s) -> int:
+        self.submit(s)
+        return self.result()
+
+    async def get_action_async(self, s) -> int:
+        self.submit(s)
+        await wait_readable(self.conn)
+        return self.result()
+
+    def requires_encode(self) -> bool:
+        return self.__encode
+
+    def close(self):
+        if self.process.is_alive():
+            self.conn.send(('close', None))
+            self.process.join()
+        self.conn.close()
+
+
+def select_actions(policies: Sequence[BattlePolicy], states) -> List[int]:
+    """
+    Get the action of each player for a turn. The states are first submitted to all the policies run by a
+    PolicyWorker, so they decide in parallel while the other policies are called in this process. A policy that
+    fails plays a random action.
+
+    :param policies: battle policy of each player
+    :param states: state of each player
+    :return: action of each player
+    """
+    actions: List[Optional[int]] = [None] * len(policies)
+    for i, policy in enumerate(policies):
+        if isinstance(policy, PolicyWorker):
+            try:
+                policy.submit(states[i])
+            except Exception:
+                actions[i] = random.randint(0, DEFAULT_N_ACTIONS - 1)
+    for i, policy in enumerate(policies):
+        if actions[i] is None:
+            try:
+                actions[i] = policy.result() if isinstance(policy, PolicyWorker) else policy.get_action(states[i])
+            except Exception:
+                actions[i] = random.randint(0, DEFAULT_N_ACTIONS - 1)
+    return actions
+
+
+async def select_actions_async(policies: Sequence[BattlePolicy], states) -> List[int]:
+    """
+    Await the actions of all the players of a turn at the same time with BattlePolicy.get_action_async. A policy
+    that fails plays a random action.
+
+    :param policies: battle policy of each player
+    :param states: state of each player
+    :return: action of each player
+    """
+    actions = await asyncio.gather(*(policy.get_action_async(states[i]) for i, policy in enumerate(policies)),
+                                   return_exceptions=True)
+    return [random.randint(0, DEFAULT_N_ACTIONS - 1) if isinstance(action, BaseException) else action
+            for action in actions]
@@ -1,5 +1,7 @@
 # Competition
 DEFAULT_MATCH_N_BATTLES = 3
+DEFAULT_BATTLE_MAX_TURNS = 200
+DEFAULT_BATTLE_NO_PROGRESS_TURNS = 20
 
 # Roster
 DEFAULT_ROSTER_SIZE = 100
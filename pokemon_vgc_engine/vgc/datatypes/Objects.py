@@ -8,9 +8,12 @@ import numpy as np
 from vgc.datatypes.Constants import MOVE_MED_PP, MAX_HIT_POINTS
 from vgc.datatypes.Types import PkmType, PkmStatus, N_STATS, N_ENTRY_HAZARD, PkmStat, WeatherCondition, \
     PkmEntryHazard
+from vgc.util.Hashing import game_state_key
 
 
 class PkmMove:
+    __slots__ = ('power', 'acc', 'max_pp', 'pp', 'type', 'name', 'priority', 'prob', 'target', 'recover', 'status',
+                 'stat', 'stage', 'fixed_damage', 'weather', 'hazard', 'public', 'owner', 'move_id', 'encoding')
 
     def __init__(self, power: float = 30., acc: float = 1., max_pp: int = MOVE_MED_PP,
                  move_type: PkmType = PkmType.NORMAL, name: str = None, priority: bool = False,
@@ -54,8 +57,12 @@ class PkmMove:
         self.public = False
         self.owner = None
         self.move_id = -1
+        # static part of the move encoding, cached by vgc.util.Encoding and cleared when the move data changes
+        self.encoding = None
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if self.power != other.power:
             return False
         if self.acc != other.acc:
@@ -123,9 +130,44 @@ class PkmMove:
     def reset(self):
         self.pp = self.max_pp
 
-    def effect(self, v):
+    def clone(self):
+        """
+        Copy move. Move data is immutable, so only the attribute values are copied.
+
+        :return: move copy, without owner
+        """
+        move = PkmMove.__new__(PkmMove)
+        move.power = self.power
+        move.acc = self.acc
+        move.max_pp = self.max_pp
+        move.pp = self.pp
+        move.type = self.type
+        move.name = self.name
+        move.priority = self.priority
+        move.prob = self.prob
+        move.target = self.target
+        move.recover = self.recover
+        move.status = self.status
+        move.stat = self.stat
+        move.stage = self.stage
+        move.fixed_damage = self.fixed_damage
+        move.weather = self.weather
+        move.hazard = self.hazard
+        move.public = self.public
+        move.owner = None
+        move.move_id = self.move_id
+        move.encoding = self.encoding
+        return move
+
+    def effect(self, v, u: float = None):
+        """
+        Reveal the move and apply its effects with probability prob.
+
+        :param v: battle move view
+        :param u: uniform random number in [0, 1), drawn from the global generator if None
+        """
         self.reveal()
-        if random.random() < self.prob:
+        if (random.random() if u is None else u) < self.prob:
             v.set_recover(self.recover)
             v.set_fixed_damage(self.fixed_damage)
             if self.stage != 0:
@@ -154,6 +196,7 @@ PkmMoveRoster = List[PkmMove]
 
 
 class Pkm:
+    __slots__ = ('type', 'max_hp', 'hp', 'status', 'n_turns_asleep', 'moves', 'public', 'pkm_id')
 
     def __init__(self, p_type: PkmType = PkmType.NORMAL, max_hp: float = MAX_HIT_POINTS,
                  status: PkmStatus = PkmStatus.NONE, move0: PkmMove = PkmMove(), move1: PkmMove = PkmMove(),
@@ -181,7 +224,10 @@ class Pkm:
         self.pkm_id = pkm_id
 
     def __eq__(self, other):
-        return self.type == other.type and isclose(self.max_hp, other.max_hp) and set(self.moves) == set(other.moves)
+        if self is other:
+            return True
+        return self.type == other.type and isclose(self.max_hp, other.max_hp) and (
+                self.moves == other.moves or set(self.moves) == set(other.moves))
 
     def __hash__(self):
         return hash((self.type, self.max_hp) + tuple(self.moves))
@@ -207,6 +253,44 @@ class Pkm:
         for move in self.moves:
             move.reset()
 
+    def clone(self):
+        """
+        Copy pkm and its moves.
+
+        :return: pkm copy
+        """
+        pkm = Pkm.__new__(Pkm)
+        pkm.type = self.type
+        pkm.max_hp = self.max_hp
+        pkm.hp = self.hp
+        pkm.status = self.status
+        pkm.n_turns_asleep = self.n_turns_asleep
+        pkm.moves = [move.clone() for move in self.moves]
+        pkm.public = self.public
+        pkm.pkm_id = self.pkm_id
+        for move in pkm.moves:
+            move.owner = pkm
+        return pkm
+
+    def snapshot(self) -> Tuple:
+        """
+        Get the mutable battle state of the pkm.
+
+        :return: hit points, status, turns asleep, public flag and power points and public flag of each move
+        """
+        return self.hp, self.status, self.n_turns_asleep, self.public, tuple((m.pp, m.public) for m in self.moves)
+
+    def restore(self, snapshot: Tuple):
+        """
+        Restore the mutable battle state of the pkm.
+
+        :param snapshot: snapshot from Pkm.snapshot
+        """
+        self.hp, self.status, self.n_turns_asleep, self.public, moves = snapshot
+        for move, (pp, public) in zip(self.moves, moves):
+            move.pp = pp
+            move.public = public
+
     def fainted(self) -> bool:
         """
         Check if pkm is fainted (hp == 0).
@@ -215,13 +299,14 @@ class Pkm:
         """
         return self.hp == 0
 
-    def paralyzed(self) -> bool:
+    def paralyzed(self, u: float = None) -> bool:
         """
         Check if pkm is paralyzed this turn and cannot move.
 
+        :param u: uniform random number in [0, 1), drawn from the global generator if None
         :return: true if pkm is paralyzed and cannot move
         """
-        return self.status == PkmStatus.PARALYZED and np.random.uniform(0, 1) <= 0.25
+        return self.status == PkmStatus.PARALYZED and (np.random.uniform(0, 1) if u is None else u) <= 0.25
 
     def asleep(self) -> bool:
         """
@@ -316,6 +401,7 @@ PkmRoster = List[PkmTemplate]
 
 
 class PkmTeam:
+    __slots__ = ('active', 'party', 'stage', 'confused', 'n_turns_confused', 'entry_hazard')
 
     def __init__(self, pkms: List[Pkm] = None):
         """
@@ -333,6 +419,8 @@ class PkmTeam:
         self.entry_hazard: List[int] = [0] * N_ENTRY_HAZARD
 
     def __eq__(self, other):
+        if self is other:
+            return True
         eq = self.active == other.active and self.stage == other.stage and self.confused == other.confused and \
              self.n_turns_confused == other.n_turns_confused
         if not eq:
@@ -365,6 +453,48 @@ class PkmTeam:
         for i in range(len(self.entry_hazard)):
             self.entry_hazard[i] = 0
 
+    def clone(self):
+        """
+        Copy team, its members and conditions.
+
+        :return: team copy
+        """
+        team = self.__class__.__new__(self.__class__)
+        if self.__class__ is not PkmTeam:
+            # subclasses such as RandomPkmTeam carry extra attributes in a __dict__
+            team.__dict__.update(self.__dict__)
+        team.active = self.active.clone()
+        team.party = [pkm.clone() for pkm in self.party]
+        team.stage = self.stage.copy()
+        team.confused = self.confused
+        team.n_turns_confused = self.n_turns_confused
+        team.entry_hazard = self.entry_hazard.copy()
+        return team
+
+    def snapshot(self) -> Tuple:
+        """
+        Get the mutable battle state of the team, including the order of its members.
+
+        :return: team snapshot
+        """
+        pkms = [self.active] + self.party
+        return tuple(pkms), tuple(pkm.snapshot() for pkm in pkms), tuple(self.stage), self.confused, \
+            self.n_turns_confused, tuple(self.entry_hazard)
+
+    def restore(self, snapshot: Tuple):
+        """
+        Restore the mutable battle state of the team.
+
+        :param snapshot: snapshot from PkmTeam.snapshot
+        """
+        pkms, pkm_snapshots, stage, self.confused, self.n_turns_confused, entry_hazard = snapshot
+        self.active = pkms[0]
+        self.party = list(pkms[1:])
+        for pkm, pkm_snapshot in zip(pkms, pkm_snapshots):
+            pkm.restore(pkm_snapshot)
+        self.stage = list(stage)
+        self.entry_hazard = list(entry_hazard)
+
     def reset_team_members(self, pkms: List[Pkm] = None):
         """
         Reset team members
@@ -408,12 +538,13 @@ class PkmTeam:
                 not_fainted.append(i)
         return not_fainted
 
-    def switch(self, pos: int) -> Tuple[Pkm, Pkm, int]:
+    def switch(self, pos: int, u: float = None) -> Tuple[Pkm, Pkm, int]:
         """
         Switch active pkm with party pkm on pos.
         Random party pkm if s_pos = -1
 
         :param pos: to be switch pokemon party position
+        :param u: uniform random number in [0, 1) choosing the random party pkm, global generator if None
         :returns: new active pkm, old active pkm, pos
         """
         if len(self.party) == 0:
@@ -427,9 +558,11 @@ class PkmTeam:
         if not all_fainted:
             # select random party pkm to switch if needed
             if not all_party_fainted:
-                if pos == -1:
+                if pos == -1 and u is None:
                     np.random.shuffle(not_fainted_pkm)
                     pos = not_fainted_pkm[0]
+                elif pos == -1:
+                    pos = not_fainted_pkm[int(u * len(not_fainted_pkm))]
 
                 # switch party and bench pkm
                 active = self.active
@@ -488,13 +621,21 @@ class PkmFullTeam:
 
 
 class Weather:
+    __slots__ = ('condition', 'n_turns_no_clear')
 
     def __init__(self):
         self.condition: WeatherCondition = WeatherCondition.CLEAR
         self.n_turns_no_clear: int = 0
 
+    def clone(self):
+        weather = Weather()
+        weather.condition = self.condition
+        weather.n_turns_no_clear = self.n_turns_no_clear
+        return weather
+
 
 class GameState:
+    __slots__ = ('teams', 'weather')
 
     def __init__(self, teams: Tuple[PkmTeam, PkmTeam], weather: Weather):
         if teams is None:
@@ -504,7 +645,46 @@ class GameState:
         self.weather = weather
 
     def __eq__(self, other):
+        if self is other:
+            return True
         for i, team in enumerate(self.teams):
             if team != other.teams[i]:
                 return False
         return self.weather.condition == other.weather.condition and self.weather.n_turns_no_clear == other.weather.n_turns_no_clear
+
+    def clone(self):
+        """
+        Copy the game state. Only the mutable battle state is copied, move and type data is shared.
+
+        :return: game state copy
+        """
+        return GameState((self.teams[0].clone(), self.teams[1].clone()), self.weather.clone())
+
+    def state_key(self) -> int:
+        """
+        Zobrist key of the battle state (hit points, status, power points, stages, hazards, weather and team order),
+        usable as a transposition table or cache key.
+
+        :return: 64 bit key
+        """
+        return game_state_key(self)
+
+    def snapshot(self) -> Tuple:
+        """
+        Get the mutable battle state (hit points, status, power points, stages, hazards and weather) so it can be later
+        restored in place.
+
+        :return: game state snapshot
+        """
+        return self.teams[0].snapshot(), self.teams[1].snapshot(), self.weather.condition, \
+            self.weather.n_turns_no_clear
+
+    def restore(self, snapshot: Tuple):
+        """
+        Restore the mutable battle state.
+
+        :param snapshot: snapshot from GameState.snapshot
+        """
+        team0, team1, self.weather.condition, self.weather.n_turns_no_clear = snapshot
+        self.teams[0].restore(team0)
+        self.teams[1].restore(team1)
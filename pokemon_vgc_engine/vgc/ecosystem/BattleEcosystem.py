@@ -1,9 +1,12 @@
+import asyncio
+from copy import copy
 from enum import Enum
 from random import shuffle
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 
 from vgc.balance.meta import MetaData
-from vgc.competition.BattleMatch import BattleMatch
+from vgc.competition.Adjudicator import Adjudicator
+from vgc.competition.BattleMatch import BattleMatch, AsyncBattleMatch
 from vgc.competition.Competitor import CompetitorManager
 from vgc.competition.Elo import elo_rating
 from vgc.datatypes.Constants import DEFAULT_MATCH_N_BATTLES
@@ -17,7 +20,8 @@ class Strategy(Enum):
 class BattleEcosystem:
 
     def __init__(self, meta_data: MetaData, debug=False, render=False, n_battles=DEFAULT_MATCH_N_BATTLES,
-                 pairings_strategy: Strategy = Strategy.RANDOM_PAIRING, update_meta=False):
+                 pairings_strategy: Strategy = Strategy.RANDOM_PAIRING, update_meta=False,
+                 adjudicator: Optional[Adjudicator] = None):
         self.meta_data = meta_data
         self.competitors: List[CompetitorManager] = []
         self.debug = debug
@@ -25,6 +29,8 @@ class BattleEcosystem:
         self.n_battles = n_battles
         self.pairings_strategy = pairings_strategy
         self.update_meta = update_meta
+        self.adjudicator = adjudicator
+        self.adjudications = 0
 
     def register(self, cm: CompetitorManager):
         if cm not in self.competitors:
@@ -36,10 +42,10 @@ class BattleEcosystem:
     def run(self, n_epochs: int):
         epoch = 0
         while epoch < n_epochs:
-            self.__run_matches(self.__schedule_matches())
+            self.__run_matches(self._schedule_matches())
             epoch += 1
 
-    def __schedule_matches(self) -> List[Tuple[CompetitorManager, CompetitorManager]]:
+    def _schedule_matches(self) -> List[Tuple[CompetitorManager, CompetitorManager]]:
         n_matches = len(self.competitors) // 2
         matches: List[Tuple[CompetitorManager, CompetitorManager]] = []
         if self.pairings_strategy == Strategy.RANDOM_PAIRING:
@@ -54,6 +60,34 @@ class BattleEcosystem:
         for pair in pairs:
             cm0, cm1 = pair
             match = BattleMatch(cm0, cm1, self.n_battles, self.debug, self.render, meta_data=self.meta_data,
-                                update_meta=self.update_meta)
+                                update_meta=self.update_meta, adjudicator=self.adjudicator)
             match.run()
+            self.adjudications += match.adjudications
+            cm0.elo, cm1.elo = elo_rating(cm0.elo, cm1.elo, 1 if match.winner() == 0 else 0)
+
+
+class AsyncBattleEcosystem(BattleEcosystem):
+    """
+    Battle ecosystem that plays all the matches of an epoch at the same time as AsyncBattleMatch coroutines, so one
+    process can drive a large league of remote competitors.
+    """
+
+    def run(self, n_epochs: int):
+        asyncio.run(self.run_async(n_epochs))
+
+    async def run_async(self, n_epochs: int):
+        epoch = 0
+        while epoch < n_epochs:
+            await self.__run_matches(self._schedule_matches())
+            epoch += 1
+
+    async def __run_matches(self, pairs: List[Tuple[CompetitorManager, CompetitorManager]]):
+        # each match watches its own battles
+        matches = [AsyncBattleMatch(cm0, cm1, self.n_battles, self.debug, self.render, meta_data=self.meta_data,
+                                    update_meta=self.update_meta,
+                                    adjudicator=None if self.adjudicator is None else copy(self.adjudicator))
+                   for cm0, cm1 in pairs]
+        await asyncio.gather(*(match.run_async() for match in matches))
+        for (cm0, cm1), match in zip(pairs, matches):
+            self.adjudications += match.adjudications
             cm0.elo, cm1.elo = elo_rating(cm0.elo, cm1.elo, 1 if match.winner() == 0 else 0)
@@ -0,0 +1,576 @@
+import warnings
+from typing import List, Tuple, Optional, Sequence
+
+import numpy as np
+
+from vgc.competition.StandardPkmMoves import Struggle
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, MAX_HIT_POINTS, STATE_DAMAGE, SPIKES_2, SPIKES_3, \
+    TYPE_CHART_MULTIPLIER
+from vgc.datatypes.Objects import PkmTeam, Pkm, PkmMove, GameState, Weather
+from vgc.datatypes.Types import WeatherCondition, PkmEntryHazard, PkmType, PkmStatus, PkmStat, N_STATS, \
+    N_ENTRY_HAZARD, N_HAZARD_STAGES, MIN_STAGE, MAX_STAGE
+from vgc.engine.DamageCalculation import DAMAGE_MULTIPLIER, STRUGGLE_MOVE_TYPE, STAGE_LEVEL_OFFSET
+from vgc.engine.RandomStream import RandomStream, N_RANDOM_COLUMNS, COL_ORDER, COL_CONFUSION_END, COL_ASLEEP_END, \
+    COL_FROZEN_END, COL_CONFUSION_DAMAGE, COL_PARALYSIS, COL_ACCURACY, COL_EFFECT, COL_FAINTED_SWITCH, \
+    MAX_FAINTED_SWITCH_ITERATIONS
+from vgc.engine.TurnKernel import NUMBA_AVAILABLE, resolve_turns
+
+# numpy: vectorized over the battles, numba: compiled per battle kernel, python: the kernel without compiling
+ENGINES = ('numpy', 'numba', 'python')
+
+TYPE_CHART = np.array(TYPE_CHART_MULTIPLIER)
+
+# Columns of the packed move table
+MOVE_POWER = 0
+MOVE_ACC = 1
+MOVE_MAX_PP = 2
+MOVE_TYPE = 3
+MOVE_PRIORITY = 4
+MOVE_PROB = 5
+MOVE_TARGET = 6
+MOVE_RECOVER = 7
+MOVE_STATUS = 8
+MOVE_STAT = 9
+MOVE_STAGE = 10
+MOVE_FIXED_DAMAGE = 11
+MOVE_WEATHER = 12
+MOVE_HAZARD = 13
+MOVE_STRUGGLE = 14
+N_MOVE_FIELDS = 15
+
+
+def pack_move(move: PkmMove) -> Tuple:
+    """
+    Pack the static data of a move into a row of the move table.
+
+    :param move: move to pack
+    :return: tuple ordered by the MOVE_* columns
+    """
+    return (move.power, move.acc, move.max_pp, int(move.type), float(move.priority), move.prob, move.target,
+            move.recover, int(move.status), int(move.stat), move.stage, move.fixed_damage, int(move.weather),
+            int(move.hazard), float(move == Struggle))
+
+
+STRUGGLE_ROW = np.array(pack_move(Struggle))
+STRUGGLE_ROW[MOVE_STRUGGLE] = 1.
+
+
+class BatchedPkmBattleEnv:
+
+    def __init__(self, teams: Sequence[Tuple[PkmTeam, PkmTeam]], weather: Optional[Sequence[Weather]] = None,
+                 seed: Optional[int] = None, streams: Optional[Sequence[RandomStream]] = None, engine: str = 'numpy'):
+        """
+        Battle engine that keeps N battles as struct-of-arrays and advances all of them with a single vectorized step.
+        The rules are the same as PkmBattleEnv.step. Battles are loaded with the current state of the given teams.
+
+        :param teams: list with the pair of teams of each battle
+        :param weather: optional list with the weather of each battle
+        :param seed: seed of the random generator
+        :param streams: optional random stream of each battle, a battle then rolls the same dice as a PkmBattleEnv
+            with an equally seeded stream
+        :param engine: turn resolution backend, one of ENGINES, numba falls back to numpy if it is not installed
+        """
+        if engine not in ENGINES:
+            raise ValueError(f'unknown engine {engine}, expected one of {ENGINES}')
+        if engine == 'numba' and not NUMBA_AVAILABLE:
+            warnings.warn('numba is not installed, using the numpy engine')
+            engine = 'numpy'
+        self.engine = engine
+        self.n_battles = len(teams)
+        self.team_size = max(max(t0.size(), t1.size()) for t0, t1 in teams)
+        self.rng = np.random.default_rng(seed)
+        self.streams = streams
+        n, s, m = self.n_battles, self.team_size, DEFAULT_PKM_N_MOVES
+        # per pkm data, indexed by battle, team and member (position in the team when loaded)
+        self.hp = np.zeros((n, 2, s))
+        self.max_hp = np.zeros((n, 2, s))
+        self.pkm_type = np.zeros((n, 2, s), dtype=np.int64)
+        self.status = np.zeros((n, 2, s), dtype=np.int64)
+        self.n_turns_asleep = np.zeros((n, 2, s), dtype=np.int64)
+        self.pkm_public = np.zeros((n, 2, s), dtype=bool)
+        self.pkm_id = np.full((n, 2, s), -1, dtype=np.int64)
+        self.exists = np.zeros((n, 2, s), dtype=bool)
+        # per move data
+        self.moves = np.zeros((n, 2, s, m, N_MOVE_FIELDS))
+        self.pp = np.zeros((n, 2, s, m), dtype=np.int64)
+        self.move_public = np.zeros((n, 2, s, m), dtype=bool)
+        self.move_id = np.full((n, 2, s, m), -1, dtype=np.int64)
+        self.move_name = np.full((n, 2, s, m), None, dtype=object)
+        # team members ordered by slot, slot 0 holds the active pkm
+        self.members = np.tile(np.arange(s), (n, 2, 1))
+        # per team data
+        self.stage = np.zeros((n, 2, N_STATS), dtype=np.int64)
+        self.confused = np.zeros((n, 2), dtype=bool)
+        self.n_turns_confused = np.zeros((n, 2), dtype=np.int64)
+        self.entry_hazard = np.zeros((n, 2, N_ENTRY_HAZARD), dtype=np.int64)
+        self.switched = np.zeros((n, 2), dtype=bool)
+        # per battle data
+        self.weather = np.zeros(n, dtype=np.int64)
+        self.n_turns_no_clear = np.zeros(n, dtype=np.int64)
+        self.pending_recover = np.zeros(n)
+        self.pending_fixed_damage = np.zeros(n)
+        self.turn = np.zeros(n, dtype=np.int64)
+        self.winner = np.full(n, -1, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.__rows = np.arange(n)
+        self.__load(teams, weather)
+        self.__initial_members = self.members.copy()
+
+    def __len__(self):
+        return self.n_battles
+
+    def __load(self, teams: Sequence[Tuple[PkmTeam, PkmTeam]], weather: Optional[Sequence[Weather]]):
+        move_rows = []
+        for b, pair in enumerate(teams):
+            for t, team in enumerate(pair):
+                self.stage[b, t] = team.stage
+                self.confused[b, t] = team.confused
+                self.n_turns_confused[b, t] = team.n_turns_confused
+                self.entry_hazard[b, t] = team.entry_hazard
+                for k, pkm in enumerate(team.get_pkm_list()):
+                    self.exists[b, t, k] = True
+                    self.hp[b, t, k] = pkm.hp
+                    self.max_hp[b, t, k] = pkm.max_hp
+                    self.pkm_type[b, t, k] = pkm.type
+                    self.status[b, t, k] = pkm.status
+                    self.n_turns_asleep[b, t, k] = pkm.n_turns_asleep
+                    self.pkm_public[b, t, k] = pkm.public
+                    self.pkm_id[b, t, k] = pkm.pkm_id
+                    for i, move in enumerate(pkm.moves):
+                        move_rows.append(pack_move(move))
+                        self.pp[b, t, k, i] = move.pp
+                        self.move_public[b, t, k, i] = move.public
+                        self.move_id[b, t, k, i] = move.move_id
+                        self.move_name[b, t, k, i] = move.name
+                for k in range(team.size(), self.team_size):
+                    move_rows.extend([pack_move(Struggle)] * DEFAULT_PKM_N_MOVES)
+            if weather is not None:
+                self.weather[b] = weather[b].condition
+                self.n_turns_no_clear[b] = weather[b].n_turns_no_clear
+        self.moves[:] = np.array(move_rows).reshape(self.moves.shape)
+
+    def reset(self):
+        """
+        Reset all battles, restoring the loaded teams to full health.
+        """
+        self.hp[:] = np.where(self.exists, self.max_hp, 0.)
+        self.status[:] = PkmStatus.NONE
+        self.n_turns_asleep[:] = 0
+        self.pp[:] = self.moves[..., MOVE_MAX_PP]
+        self.members[:] = self.__initial_members
+        self.stage[:] = 0
+        self.confused[:] = False
+        self.n_turns_confused[:] = 0
+        self.entry_hazard[:] = 0
+        self.switched[:] = False
+        self.weather[:] = WeatherCondition.CLEAR
+        self.n_turns_no_clear[:] = 0
+        self.pending_recover[:] = 0.
+        self.pending_fixed_damage[:] = 0.
+        self.turn[:] = 0
+        self.winner[:] = -1
+        self.done[:] = False
+        r = self.__rows
+        self.pkm_public[r, 0, self.members[:, 0, 0]] = True
+        self.pkm_public[r, 1, self.members[:, 1, 0]] = True
+
+    def active(self, t_id: int) -> np.ndarray:
+        """
+        Get the member index of the active pkm of a team in every battle.
+
+        :param t_id: trainer
+        :return: array with the active member indexes
+        """
+        return self.members[:, t_id, 0]
+
+    def team_fainted(self, t_id: int) -> np.ndarray:
+        """
+        Check which battles have the entire team of a trainer fainted.
+
+        :param t_id: trainer
+        :return: boolean array
+        """
+        return ~np.any(self.hp[:, t_id] != 0., axis=1)
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Advance one turn of every battle that has not terminated.
+
+        :param actions: integer array with shape (N, 2) with the action of each trainer
+        :return: rewards with shape (N, 2) and terminated flags with shape (N,)
+        """
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.n_battles, 2)
+        if self.streams is None:
+            u = self.rng.random((self.n_battles, N_RANDOM_COLUMNS))
+        else:
+            u = np.array([stream.take(N_RANDOM_COLUMNS) for stream in self.streams])
+        r = np.zeros((self.n_battles, 2))
+        if self.engine != 'numpy':
+            kernel = resolve_turns if self.engine == 'numba' else getattr(resolve_turns, 'py_func', resolve_turns)
+            kernel(actions, u, r, self.hp, self.pkm_type, self.status, self.n_turns_asleep, self.pkm_public,
+                   self.members, self.moves, self.pp, self.move_public, self.stage, self.confused,
+                   self.n_turns_confused, self.entry_hazard, self.switched, self.weather, self.n_turns_no_clear,
+                   self.pending_recover, self.pending_fixed_damage, self.turn, self.winner, self.done,
+                   DAMAGE_MULTIPLIER, TYPE_CHART, STRUGGLE_ROW)
+            return r, self.done.copy()
+        live = ~self.done
+        self.turn[live] += 1
+
+        # switch pkm
+        for t in range(2):
+            self.__process_switch_pkms(live, t, actions[:, t])
+
+        # set trainer attack order
+        first = self.__get_attack_order(actions, u)
+        second = 1 - first
+
+        # get entry hazard damage
+        dmg = [self.__get_entry_hazard_damage(live, t) for t in range(2)]
+        r[:, 0] += (dmg[1] - dmg[0]) / MAX_HIT_POINTS
+        r[:, 1] += (dmg[0] - dmg[1]) / MAX_HIT_POINTS
+
+        # process all pre battle effects
+        for t in range(2):
+            self.__process_pre_battle_effects(live, t, u)
+
+        # confusion state damage
+        active_not_fainted = live & (self.__active_hp(0) != 0.) & (self.__active_hp(1) != 0.)
+        dmg = [np.where(active_not_fainted & self.confused[:, t] & (u[:, COL_CONFUSION_DAMAGE + t] <= 0.33),
+                        STATE_DAMAGE, 0.) for t in range(2)]
+        confusion_damage = np.stack(dmg, axis=1) > 0.
+        r[:, 0] += (dmg[1] - dmg[0]) / MAX_HIT_POINTS
+        r[:, 1] += (dmg[0] - dmg[1]) / MAX_HIT_POINTS
+
+        # battle
+        can_attack = np.zeros((self.n_battles, 2), dtype=bool)
+        dealt = np.zeros((self.n_battles, 2))
+        recovered = np.zeros((self.n_battles, 2))
+        for att in (first, second):
+            active_not_fainted = live & (self.__active_hp(0) != 0.) & (self.__active_hp(1) != 0.)
+            status = self.status[self.__rows, att, self.members[self.__rows, att, 0]]
+            paralyzed = (status == PkmStatus.PARALYZED) & (u[self.__rows, COL_PARALYSIS + att] <= 0.25)
+            can = active_not_fainted & ~paralyzed & (status != PkmStatus.SLEEP) & (status != PkmStatus.FROZEN) & \
+                ~confusion_damage[self.__rows, att]
+            can_attack[self.__rows, att] = can
+            d, h = self.__perform_pkm_attack(can, att, actions[self.__rows, att], u)
+            dealt[self.__rows, att] = d
+            recovered[self.__rows, att] = h
+
+        for t in range(2):
+            r[:, t] += (dealt[:, t] + recovered[:, t] - dealt[:, 1 - t]) / MAX_HIT_POINTS + \
+                (live & (self.__active_hp(1 - t) == 0.))
+
+        # get post battle effects damage
+        dmg = [self.__get_post_battle_damage(can_attack[:, t], t) for t in range(2)]
+        r[:, 0] += (dmg[1] - dmg[0]) / MAX_HIT_POINTS
+        r[:, 1] += (dmg[0] - dmg[1]) / MAX_HIT_POINTS
+
+        # process all post battle effects
+        self.__process_post_battle_effects(live)
+
+        # switch fainted pkm
+        dmg = self.__switch_fainted_pkm(live, u)
+        # as in PkmBattleEnv this damage is rewarded by attack order and not by trainer
+        sign = np.where(first == 0, 1., -1.)
+        r[:, 0] += sign * (dmg[1] - dmg[0]) / MAX_HIT_POINTS
+        r[:, 1] += sign * (dmg[0] - dmg[1]) / MAX_HIT_POINTS
+
+        # check if battle ended
+        t0 = live & self.team_fainted(0)
+        t1 = live & self.team_fainted(1)
+        r[:, 0] += t0
+        r[:, 1] += t1
+        terminated = t0 | t1
+        self.winner[terminated] = np.where(t0[terminated], 1, 0)
+        self.done |= terminated
+
+        return r, self.done.copy()
+
+    def __active_hp(self, t_id: int) -> np.ndarray:
+        return self.hp[self.__rows, t_id, self.members[:, t_id, 0]]
+
+    def __switch(self, mask: np.ndarray, t_id: int, slot: np.ndarray):
+        """
+        Switch active pkm with the pkm on a party slot.
+
+        :param mask: battles where the switch happens
+        :param t_id: trainer
+        :param slot: team slot of the pkm entering the battle
+        """
+        rows = self.__rows[mask]
+        slot = slot[mask]
+        entering = self.members[rows, t_id, slot]
+        self.members[rows, t_id, slot] = self.members[rows, t_id, 0]
+        self.members[rows, t_id, 0] = entering
+        self.stage[rows, t_id] = 0
+        self.confused[rows, t_id] = False
+        self.pkm_public[rows, t_id, entering] = True
+
+    def __process_switch_pkms(self, live: np.ndarray, t_id: int, action: np.ndarray):
+        pos = action - DEFAULT_PKM_N_MOVES
+        slot = np.clip(pos, 0, self.team_size - 2) + 1
+        valid = live & (pos >= 0) & (pos < self.team_size - 1)
+        # missing members have zero hit points, so switching to them fails as switching to a fainted pkm
+        ok = valid & (self.hp[self.__rows, t_id, self.members[self.__rows, t_id, slot]] != 0.)
+        self.__switch(ok, t_id, slot)
+        self.switched[ok, t_id] = True
+
+    def __get_attack_order(self, actions: np.ndarray, u: np.ndarray) -> np.ndarray:
+        speed = []
+        for t in range(2):
+            action = actions[:, t]
+            priority = self.moves[self.__rows, t, self.members[:, t, 0], np.clip(action, 0, DEFAULT_PKM_N_MOVES - 1),
+                                  MOVE_PRIORITY]
+            speed.append(self.stage[:, t, PkmStat.SPEED] + np.where(action < DEFAULT_PKM_N_MOVES, priority, 0.))
+        tie = np.where(u[:, COL_ORDER] < 0.5, 0, 1)
+        return np.where(speed[0] > speed[1], 0, np.where(speed[1] > speed[0], 1, tie))
+
+    def __get_entry_hazard_damage(self, mask: np.ndarray, t_id: int) -> np.ndarray:
+        active = self.members[:, t_id, 0]
+        spikes = self.entry_hazard[:, t_id, PkmEntryHazard.SPIKES]
+        apply = mask & (spikes > 0) & (self.pkm_type[self.__rows, t_id, active] != PkmType.FLYING) & \
+            self.switched[:, t_id]
+        before_hp = self.hp[self.__rows, t_id, active]
+        damage = np.where(spikes <= 1, STATE_DAMAGE, np.where(spikes == 2, SPIKES_2, SPIKES_3))
+        after_hp = np.maximum(before_hp - damage, 0.)
+        self.hp[self.__rows, t_id, active] = np.where(apply, after_hp, before_hp)
+        self.switched[apply, t_id] = False
+        return np.where(apply, before_hp - after_hp, 0.)
+
+    def __process_pre_battle_effects(self, live: np.ndarray, t_id: int, u: np.ndarray):
+        # check if active pkm should be no more confused
+        confused = live & self.confused[:, t_id]
+        self.n_turns_confused[confused, t_id] += 1
+        end = confused & ((u[:, COL_CONFUSION_END + t_id] <= 0.5) | (self.n_turns_confused[:, t_id] == 4))
+        self.confused[end, t_id] = False
+        self.n_turns_confused[end, t_id] = 0
+
+        # check if active pkm should be no longer asleep
+        active = self.members[:, t_id, 0]
+        asleep = live & (self.status[self.__rows, t_id, active] == PkmStatus.SLEEP)
+        self.n_turns_asleep[self.__rows[asleep], t_id, active[asleep]] += 1
+        n_turns_asleep = self.n_turns_asleep[self.__rows, t_id, active]
+        end = asleep & ((u[:, COL_ASLEEP_END + t_id] <= 0.5) | (n_turns_asleep == 4))
+        self.status[self.__rows[end], t_id, active[end]] = PkmStatus.NONE
+        self.n_turns_asleep[self.__rows[end], t_id, active[end]] = 0
+
+        # check if active pkm should be no longer frozen
+        frozen = live & (self.status[self.__rows, t_id, active] == PkmStatus.FROZEN)
+        end = frozen & (u[:, COL_FROZEN_END + t_id] <= 0.2)
+        self.status[self.__rows[end], t_id, active[end]] = PkmStatus.NONE
+
+    def __process_post_battle_effects(self, live: np.ndarray):
+        not_clear = live & (self.weather != WeatherCondition.CLEAR)
+        self.n_turns_no_clear[not_clear] += 1
+        clear = not_clear & (self.n_turns_no_clear > 5)
+        self.weather[clear] = WeatherCondition.CLEAR
+        self.n_turns_no_clear[clear] = 0
+
+    def __get_post_battle_damage(self, mask: np.ndarray, t_id: int) -> np.ndarray:
+        active = self.members[:, t_id, 0]
+        pkm_type = self.pkm_type[self.__rows, t_id, active]
+        sandstorm = (self.weather == WeatherCondition.SANDSTORM) & (pkm_type != PkmType.ROCK) & \
+            (pkm_type != PkmType.GROUND) & (pkm_type != PkmType.STEEL)
+        hail = (self.weather == WeatherCondition.HAIL) & (pkm_type != PkmType.ICE)
+        before_hp = self.hp[self.__rows, t_id, active]
+        # hit points are clipped even without weather damage, so recoil below zero faints the pkm here
+        after_hp = np.where(mask, np.maximum(before_hp - np.where(sandstorm | hail, STATE_DAMAGE, 0.), 0.), before_hp)
+        damage = before_hp - after_hp
+        status = self.status[self.__rows, t_id, active]
+        state = mask & ((status == PkmStatus.POISONED) | (status == PkmStatus.BURNED))
+        before_hp = after_hp
+        after_hp = np.where(state, np.maximum(before_hp - STATE_DAMAGE, 0.), before_hp)
+        damage = np.where(state, before_hp - after_hp, damage)
+        self.hp[self.__rows, t_id, active] = after_hp
+        return damage
+
+    def __perform_pkm_attack(self, mask: np.ndarray, att: np.ndarray, action: np.ndarray,
+                             u: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Perform the attack of the active pkm of trainers att.
+
+        :param mask: battles where the trainer can attack
+        :param att: attacking trainer of each battle
+        :param action: action of the attacking trainer
+        :return: damage dealt, hit points recovered
+        """
+        rows = self.__rows
+        opp = 1 - att
+        use = mask & (action < DEFAULT_PKM_N_MOVES)
+        m_id = np.clip(action, 0, DEFAULT_PKM_N_MOVES - 1)
+        active = self.members[rows, att, 0]
+        opp_active = self.members[rows, opp, 0]
+
+        # spend power points or struggle
+        pp = self.pp[rows, att, active, m_id]
+        has_pp = pp > 0
+        self.pp[rows, att, active, m_id] = np.where(use & has_pp, pp - 1, pp)
+        move = np.where(has_pp[:, None], self.moves[rows, att, active, m_id], STRUGGLE_ROW)
+
+        hit = use & (u[rows, COL_ACCURACY + att] < move[:, MOVE_ACC])
+
+        # set recover and fixed damage pending from previous effects
+        recover = np.where(hit, self.pending_recover, 0.)
+        fixed_damage = np.where(hit, self.pending_fixed_damage, 0.)
+        self.pending_recover[hit] = 0.
+        self.pending_fixed_damage[hit] = 0.
+
+        # calculate damage
+        move_type = move[:, MOVE_TYPE].astype(np.int64)
+        opp_type = self.pkm_type[rows, opp, opp_active]
+        type_multiplier = TYPE_CHART[move_type, opp_type]
+        stage_level = self.stage[rows, att, PkmStat.ATTACK] - self.stage[rows, opp, PkmStat.DEFENSE]
+        multiplier = DAMAGE_MULTIPLIER[np.where(move[:, MOVE_STRUGGLE] > 0., STRUGGLE_MOVE_TYPE, move_type),
+                                       self.pkm_type[rows, att, active], opp_type, self.weather,
+                                       stage_level + STAGE_LEVEL_OFFSET]
+        damage = multiplier * move[:, MOVE_POWER]
+        damage = np.where((fixed_damage > 0.) & (type_multiplier > 0.), fixed_damage, damage)
+
+        # effects are only applied after damage calculation
+        self.move_public[rows[hit & has_pp], att[hit & has_pp], active[hit & has_pp], m_id[hit & has_pp]] = True
+        self.__apply_effects(hit & (u[rows, COL_EFFECT + att] < move[:, MOVE_PROB]), att, move)
+
+        damage = np.where(hit, np.round(damage), 0.)
+        recover = np.round(recover)
+
+        # perform recover
+        before_hp = self.hp[rows, att, active]
+        after_hp = np.where(use, np.minimum(before_hp + recover, MAX_HIT_POINTS), before_hp)
+        self.hp[rows, att, active] = after_hp
+
+        # perform damage
+        before_opp_hp = self.hp[rows, opp, opp_active]
+        after_opp_hp = np.where(use, np.maximum(before_opp_hp - damage, 0.), before_opp_hp)
+        self.hp[rows, opp, opp_active] = after_opp_hp
+
+        return before_opp_hp - after_opp_hp, after_hp - before_hp
+
+    def __apply_effects(self, mask: np.ndarray, att: np.ndarray, move: np.ndarray):
+        rows = self.__rows
+        self.pending_recover[mask] = move[mask, MOVE_RECOVER]
+        self.pending_fixed_damage[mask] = move[mask, MOVE_FIXED_DAMAGE]
+        # stage and status effects target the attacker (target 0) or the opponent (target 1)
+        target = np.where(move[:, MOVE_TARGET] == 0, att, 1 - att)
+
+        # stage effect
+        delta_stage = move[:, MOVE_STAGE].astype(np.int64)
+        stat = move[:, MOVE_STAT].astype(np.int64)
+        stage = self.stage[rows, target, stat]
+        apply = mask & (delta_stage != 0) & (MIN_STAGE < stage) & (stage < MAX_STAGE)
+        self.stage[rows, target, stat] = np.where(apply, np.clip(stage + delta_stage, MIN_STAGE, MAX_STAGE), stage)
+
+        # status effect
+        new_status = move[:, MOVE_STATUS].astype(np.int64)
+        target_active = self.members[rows, target, 0]
+        status = self.status[rows, target, target_active]
+        pkm_type = self.pkm_type[rows, target, target_active]
+        set_status = mask & (new_status != PkmStatus.NONE)
+        applied = ((new_status == PkmStatus.PARALYZED) & (pkm_type != PkmType.ELECTRIC) &
+                   (pkm_type != PkmType.GROUND) & (status != PkmStatus.PARALYZED)) | \
+                  ((new_status == PkmStatus.POISONED) & (pkm_type != PkmType.POISON) & (pkm_type != PkmType.STEEL) &
+                   (status != PkmStatus.POISONED)) | \
+                  ((new_status == PkmStatus.BURNED) & (pkm_type != PkmType.FIRE) & (status != PkmStatus.BURNED)) | \
+                  ((new_status == PkmStatus.SLEEP) & (status != PkmStatus.SLEEP)) | \
+                  ((new_status == PkmStatus.FROZEN) & (pkm_type != PkmType.ICE) & (status != PkmStatus.FROZEN))
+        apply = set_status & applied
+        self.status[rows[apply], target[apply], target_active[apply]] = new_status[apply]
+        asleep = apply & (new_status == PkmStatus.SLEEP)
+        self.n_turns_asleep[rows[asleep], target[asleep], target_active[asleep]] = 0
+        # any other status falls back to confusion
+        confuse = set_status & ~applied
+        self.confused[rows[confuse], target[confuse]] = True
+
+        # weather effect
+        weather = move[:, MOVE_WEATHER].astype(np.int64)
+        apply = mask & (weather != WeatherCondition.CLEAR) & (weather != self.weather)
+        self.weather[apply] = weather[apply]
+        self.n_turns_no_clear[apply] = 0
+
+        # entry hazard effect, the target is the trainer index
+        hazard = move[:, MOVE_HAZARD].astype(np.int64)
+        apply = mask & (hazard != PkmEntryHazard.NONE)
+        target = move[:, MOVE_TARGET].astype(np.int64)
+        entry_hazard = self.entry_hazard[rows, target, hazard] + 1
+        self.entry_hazard[rows[apply], target[apply], hazard[apply]] = np.minimum(entry_hazard[apply],
+                                                                                  N_HAZARD_STAGES - 1)
+
+    def __switch_fainted_pkm(self, live: np.ndarray, u: np.ndarray) -> List[np.ndarray]:
+        """
+        Switch fainted active pkm with random party pkm until no active pkm is fainted, while dealing entry hazard
+        damage to the pkm entering the battle.
+
+        :return: damage to pkm 0, damage to pkm 1
+        """
+        damage = [np.zeros(self.n_battles), np.zeros(self.n_battles)]
+        pending = live.copy()
+        iteration = 0
+        while np.any(pending):
+            self.switched[pending] = False
+            fainted = [pending & (self.__active_hp(t) == 0.) for t in range(2)]
+            col = COL_FAINTED_SWITCH + 2 * min(iteration, MAX_FAINTED_SWITCH_ITERATIONS - 1)
+            for t in range(2):
+                self.__switch_random(fainted[t], t, u[:, col + t])
+                self.switched[fainted[t], t] = True
+                damage[t] += self.__get_entry_hazard_damage(fainted[t], t)
+            pending = (fainted[0] | fainted[1]) & ~self.team_fainted(0) & ~self.team_fainted(1)
+            iteration += 1
+        return damage
+
+    def __switch_random(self, mask: np.ndarray, t_id: int, u: np.ndarray):
+        party_hp = np.take_along_axis(self.hp[:, t_id], self.members[:, t_id, 1:], axis=1)
+        candidates = party_hp != 0.
+        n_candidates = candidates.sum(axis=1)
+        mask = mask & (n_candidates > 0)
+        # select the floor(u * n)-th not fainted party pkm
+        choice = np.minimum((u * n_candidates).astype(np.int64), np.maximum(n_candidates - 1, 0))
+        slot = np.argmax(np.cumsum(candidates, axis=1) > choice[:, None], axis=1) + 1
+        self.__switch(mask, t_id, slot)
+
+    def get_game_state(self, b: int, player: int = 0) -> GameState:
+        """
+        Convert a battle to a GameState view from the perspective of a player, so regular policies can be used.
+
+        :param b: battle index
+        :param player: trainer whose team is placed first
+        :return: the full information game state of the battle
+        """
+        teams = []
+        for t in (player, 1 - player):
+            pkms = []
+            for k in self.members[b, t]:
+                if self.exists[b, t, k]:
+                    pkms.append(self.__get_pkm(b, t, k))
+            team = PkmTeam(pkms)
+            team.stage = self.stage[b, t].tolist()
+            team.confused = bool(self.confused[b, t])
+            team.n_turns_confused = int(self.n_turns_confused[b, t])
+            team.entry_hazard = self.entry_hazard[b, t].tolist()
+            teams.append(team)
+        weather = Weather()
+        weather.condition = WeatherCondition(self.weather[b])
+        weather.n_turns_no_clear = int(self.n_turns_no_clear[b])
+        return GameState((teams[0], teams[1]), weather)
+
+    def __get_pkm(self, b: int, t: int, k: int) -> Pkm:
+        moves = []
+        for i in range(DEFAULT_PKM_N_MOVES):
+            data = self.moves[b, t, k, i]
+            move = PkmMove(power=float(data[MOVE_POWER]), acc=float(data[MOVE_ACC]), max_pp=int(data[MOVE_MAX_PP]),
+                           move_type=PkmType(int(data[MOVE_TYPE])), name=self.move_name[b, t, k, i],
+                           priority=bool(data[MOVE_PRIORITY]), prob=float(data[MOVE_PROB]),
+                           target=int(data[MOVE_TARGET]), recover=float(data[MOVE_RECOVER]),
+                           status=PkmStatus(int(data[MOVE_STATUS])), stat=PkmStat(int(data[MOVE_STAT])),
+                           stage=int(data[MOVE_STAGE]), fixed_damage=float(data[MOVE_FIXED_DAMAGE]),
+                           weather=WeatherCondition(int(data[MOVE_WEATHER])),
+                           hazard=PkmEntryHazard(int(data[MOVE_HAZARD])))
+            move.pp = int(self.pp[b, t, k, i])
+            move.public = bool(self.move_public[b, t, k, i])
+            move.move_id = int(self.move_id[b, t, k, i])
+            moves.append(move)
+        pkm = Pkm(p_type=PkmType(int(self.pkm_type[b, t, k])), max_hp=float(self.max_hp[b, t, k]),
+                  status=PkmStatus(int(self.status[b, t, k])), move0=moves[0], move1=moves[1], move2=moves[2],
+                  move3=moves[3], pkm_id=int(self.pkm_id[b, t, k]))
+        pkm.hp = float(self.hp[b, t, k])
+        pkm.n_turns_asleep = int(self.n_turns_asleep[b, t, k])
+        pkm.public = bool(self.pkm_public[b, t, k])
+        return pkm
@@ -0,0 +1,92 @@
+from typing import List, Tuple, Any
+
+from vgc.engine.RandomStream import N_RANDOM_COLUMNS
+
+
+class Chance(float):
+    """
+    Stand-in for a uniform random number in [0, 1). Instead of having a value it asks the enumerator which side of a
+    comparison to take (or which index of int(u * n) to return), and the enumerator tracks the probability of that
+    choice. Each column of the turn random vector is read once per turn, so every comparison is an independent event.
+    """
+
+    def __new__(cls, enumerator: 'ChanceEnumerator'):
+        chance = super().__new__(cls, float('nan'))
+        chance.enumerator = enumerator
+        return chance
+
+    def __lt__(self, x):
+        p = min(max(x, 0.), 1.)
+        return self.enumerator.decide(((p, True), (1. - p, False)))
+
+    __le__ = __lt__
+
+    def __gt__(self, x):
+        p = min(max(x, 0.), 1.)
+        return self.enumerator.decide(((1. - p, True), (p, False)))
+
+    __ge__ = __gt__
+
+    def __mul__(self, n):
+        # int(u * n) picks one of n items uniformly
+        return self.enumerator.decide(tuple((1. / n, i + .5) for i in range(n)))
+
+    __rmul__ = __mul__
+
+
+class ChanceEnumerator:
+    """
+    Depth first enumeration of the chance events of a turn. The turn is replayed once per branch with a vector of
+    Chance numbers, the events of a branch are decided by a script that is extended with the first outcome of every
+    new event and then advanced to the next unexplored outcome, like an odometer.
+    """
+
+    def __init__(self):
+        self.__script: List[List] = []
+        self.__pos = 0
+
+    def vector(self) -> List[Chance]:
+        """
+        Start a new branch.
+
+        :return: turn random vector for the branch
+        """
+        self.__pos = 0
+        return [Chance(self) for _ in range(N_RANDOM_COLUMNS)]
+
+    def decide(self, outcomes: Tuple[Tuple[float, Any], ...]) -> Any:
+        """
+        Take the current outcome of the next chance event of the branch.
+
+        :param outcomes: probability and result of each outcome
+        :return: result of the outcome followed by this branch
+        """
+        if self.__pos == len(self.__script):
+            self.__script.append([0, [outcome for outcome in outcomes if outcome[0] > 0.]])
+        entry = self.__script[self.__pos]
+        self.__pos += 1
+        return entry[1][entry[0]][1]
+
+    def probability(self) -> float:
+        """
+        :return: probability of the current branch
+        """
+        p = 1.
+        for i, outcomes in self.__script[:self.__pos]:
+            p *= outcomes[i][0]
+        return p
+
+    def next_branch(self) -> bool:
+        """
+        Advance to the next unexplored branch.
+
+        :return: false if all branches were explored
+        """
+        # events after the last one read were not reached in this branch
+        del self.__script[self.__pos:]
+        while self.__script and self.__script[-1][0] + 1 == len(self.__script[-1][1]):
+            self.__script.pop()
+        if not self.__script:
+            return False
+        self.__script[-1][0] += 1
+        return True
@@ -0,0 +1,137 @@
+import numpy as np
+
+from vgc.competition.StandardPkmMoves import Struggle
+from vgc.datatypes.Constants import TYPE_CHART_MULTIPLIER, STATE_DAMAGE, SPIKES_2, SPIKES_3
+from vgc.datatypes.Objects import PkmMove
+from vgc.datatypes.Types import PkmType, WeatherCondition, PkmStatus, N_TYPES, N_WEATHER, MIN_STAGE, MAX_STAGE
+
+# Struggle ignores the type chart, so it gets its own move type row after the real types.
+STRUGGLE_MOVE_TYPE = N_TYPES
+N_MOVE_TYPES = N_TYPES + 1
+
+# attack stage minus defense stage ranges over [MIN_STAGE - MAX_STAGE, MAX_STAGE - MIN_STAGE]
+STAGE_LEVEL_OFFSET = MAX_STAGE - MIN_STAGE
+N_STAGE_LEVELS = 2 * STAGE_LEVEL_OFFSET + 1
+
+
+def stab_modifier(move_type: PkmType, pkm_type: PkmType) -> float:
+    """
+    Same type attack bonus.
+
+    :param move_type: type of the move
+    :param pkm_type: type of the attacking pkm
+    :return: stab modifier
+    """
+    return 1.5 if move_type == pkm_type else 1.
+
+
+def weather_modifier(move_type: PkmType, condition: WeatherCondition) -> float:
+    """
+    Weather modifier of a move type.
+
+    :param move_type: type of the move
+    :param condition: current weather condition
+    :return: weather modifier
+    """
+    if (move_type == PkmType.WATER and condition == WeatherCondition.RAIN) or (
+            move_type == PkmType.FIRE and condition == WeatherCondition.SUNNY):
+        return 1.5
+    if (move_type == PkmType.WATER and condition == WeatherCondition.SUNNY) or (
+            move_type == PkmType.FIRE and condition == WeatherCondition.RAIN):
+        return .5
+    return 1.
+
+
+def stage_modifier(stage_level: int) -> float:
+    """
+    Modifier of the difference between the attack stage of the attacker and the defense stage of the defender.
+
+    :param stage_level: attack stage minus defense stage
+    :return: stage modifier
+    """
+    return (stage_level + 2.) / 2 if stage_level >= 0. else 2. / (abs(stage_level) + 2.)
+
+
+def _build_damage_multiplier() -> np.ndarray:
+    table = np.empty((N_MOVE_TYPES, N_TYPES, N_TYPES, N_WEATHER, N_STAGE_LEVELS))
+    for move_type in range(N_MOVE_TYPES):
+        struggle = move_type == STRUGGLE_MOVE_TYPE
+        real_type = Struggle.type if struggle else PkmType(move_type)
+        for pkm_type in range(N_TYPES):
+            stab = stab_modifier(real_type, PkmType(pkm_type))
+            for opp_type in range(N_TYPES):
+                multiplier = 1. if struggle else TYPE_CHART_MULTIPLIER[move_type][opp_type]
+                for condition in range(N_WEATHER):
+                    weather = weather_modifier(real_type, WeatherCondition(condition))
+                    for stage_level in range(MIN_STAGE - MAX_STAGE, MAX_STAGE - MIN_STAGE + 1):
+                        # same association order as the per attack formula so the products are bit identical
+                        table[move_type, pkm_type, opp_type, condition, stage_level + STAGE_LEVEL_OFFSET] = \
+                            multiplier * stab * weather * stage_modifier(stage_level)
+    table.setflags(write=False)
+    return table
+
+
+# DAMAGE_MULTIPLIER[move type, attacker type, defender type, weather, stage level + STAGE_LEVEL_OFFSET] is the full
+# type chart * stab * weather * stage multiplier of an attack, damage is the multiplier times the move power.
+DAMAGE_MULTIPLIER = _build_damage_multiplier()
+# nested list copy, indexing python lists is faster than indexing numpy scalars in the single battle engine
+DAMAGE_MULTIPLIER_LIST = DAMAGE_MULTIPLIER.tolist()
+
+
+def attack_damage(move: PkmMove, pkm_type: PkmType, opp_type: PkmType, stage_level: int,
+                  condition: WeatherCondition, fixed_damage: float = 0.) -> float:
+    """
+    Damage of an attack that hits, before rounding.
+
+    :param move: move used, Struggle when out of power points
+    :param pkm_type: type of the attacking pkm
+    :param opp_type: type of the defending pkm
+    :param stage_level: attack stage of the attacker minus defense stage of the defender
+    :param condition: current weather condition
+    :param fixed_damage: pending fixed damage, used instead if the defender is not immune to the move type
+    :return: damage
+    """
+    if fixed_damage > 0. and TYPE_CHART_MULTIPLIER[move.type][opp_type] > 0.:
+        return fixed_damage
+    move_type = STRUGGLE_MOVE_TYPE if move is Struggle else move.type
+    return DAMAGE_MULTIPLIER_LIST[move_type][pkm_type][opp_type][condition][stage_level + STAGE_LEVEL_OFFSET] * \
+        move.power
+
+
+def spikes_damage(spikes: int, pkm_type: PkmType) -> float:
+    """
+    Damage of the spikes to a pkm that switches in.
+
+    :param spikes: spikes level of its side
+    :param pkm_type: type of the pkm
+    :return: damage
+    """
+    if spikes and pkm_type != PkmType.FLYING:
+        return STATE_DAMAGE if spikes <= 1 else SPIKES_2 if spikes == 2 else SPIKES_3
+    return 0.
+
+
+def weather_damage(pkm_type: PkmType, condition: WeatherCondition) -> float:
+    """
+    Damage of the weather to a pkm at the end of the turn.
+
+    :param pkm_type: type of the pkm
+    :param condition: current weather condition
+    :return: damage
+    """
+    if condition == WeatherCondition.SANDSTORM and (
+            pkm_type != PkmType.ROCK and pkm_type != PkmType.GROUND and pkm_type != PkmType.STEEL):
+        return STATE_DAMAGE
+    if condition == WeatherCondition.HAIL and pkm_type != PkmType.ICE:
+        return STATE_DAMAGE
+    return 0.
+
+
+def status_damage(status: PkmStatus) -> float:
+    """
+    Damage of a status to a pkm at the end of the turn.
+
+    :param status: status of the pkm
+    :return: damage
+    """
+    return STATE_DAMAGE if status == PkmStatus.POISONED or status == PkmStatus.BURNED else 0.
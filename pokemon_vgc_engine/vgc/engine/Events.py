@@ -0,0 +1,214 @@
+from enum import IntEnum
+from typing import List, Tuple, Optional, Sequence
+
+from vgc.datatypes.Objects import Pkm
+from vgc.datatypes.Types import PkmStatus, PkmStat, WeatherCondition
+
+DEFAULT_EVENT_BUFFER_SIZE = 1024
+
+
+class BattleEvent(IntEnum):
+    INIT = 0  # team 0 members, team 1 members
+    TURN = 1  # turn
+    OUTCOME = 2  # team 0 fainted, team 1 fainted
+    SWITCH = 3  # trainer, party position, new active, new active hp, old active, old active hp
+    SWITCH_FAILED = 4  # trainer
+    INVALID_SWITCH = 5  # trainer
+    ENTRY_HAZARD_DAMAGE = 6  # trainer, pkm, damage, hp before, hp
+    NO_LONGER_CONFUSED = 7  # trainer, pkm, hp
+    NO_LONGER_ASLEEP = 8  # trainer, pkm, hp
+    NO_LONGER_FROZEN = 9  # trainer, pkm, hp
+    WEATHER_CLEAR = 10  #
+    WEATHER_DAMAGE = 11  # trainer, pkm, damage, hp before, hp
+    STATE_DAMAGE = 12  # trainer, pkm, damage, hp before, hp, status
+    CANNOT_MOVE = 13  # trainer
+    MOVE_FAILS = 14  # trainer, pkm, hp, move
+    MOVE = 15  # trainer, pkm, hp, move
+    RECOVER = 16  # trainer, recover, hp
+    RECOIL = 17  # trainer, recoil damage, hp
+    DAMAGE = 18  # damaged trainer, pkm, damage, hp before, hp
+    FAINTED = 19  # trainer, pkm
+    FAINTED_SWITCH = 20  # trainer, party position, new active, hp
+    WEATHER = 21  # weather
+    STATUS = 22  # trainer, pkm, hp, status
+    CONFUSED = 23  # trainer, pkm, hp
+    STAGE = 24  # trainer, pkm, hp, stat, delta stage, stage
+    ENTRY_HAZARD = 25  # trainer
+
+
+Event = Tuple
+
+
+class EventBuffer:
+
+    def __init__(self, size: int = DEFAULT_EVENT_BUFFER_SIZE):
+        """
+        Fixed size ring buffer of battle events. Each event is a tuple with a BattleEvent code followed by its payload.
+        Events are only rendered to text or UX commands when requested, and the oldest events are overwritten when
+        nobody consumes them.
+
+        :param size: maximum number of stored events
+        """
+        self.size = size
+        self.events: List[Optional[Event]] = [None] * size
+        self.seq = 0
+        # first sequence number whose event can still be stored, the ones before were overwritten
+        self.low = 0
+
+    def emit(self, *event):
+        self.events[self.seq % self.size] = event
+        self.seq += 1
+
+    def since(self, seq: int) -> List[Event]:
+        """
+        Get the events from a sequence number onwards, skipping the ones already overwritten.
+
+        :param seq: sequence number of the first event
+        :return: list of events
+        """
+        return [self.events[i % self.size] for i in range(max(seq, self.seq - self.size, self.low), self.seq)]
+
+    def rewind(self, seq: int):
+        """
+        Discard the events from a sequence number onwards. The events before seq that were overwritten by the
+        discarded ones stay lost, since no longer returns them.
+
+        :param seq: sequence number of the first discarded event
+        """
+        if seq < self.seq:
+            self.low = min(max(self.low, self.seq - self.size), seq)
+            self.seq = seq
+
+
+def pkm_str(pkm: Pkm, hp: float) -> str:
+    """
+    Describe a pkm as Pkm.__str__, with the hit points it had when the event happened.
+    """
+    return 'Pkm(Type=%s, HP=%d, Moves={%s})' % (pkm.type.name, hp, ''.join(str(move) + ', ' for move in pkm.moves))
+
+
+def team_str(members: Sequence[Pkm]) -> str:
+    party = ''.join(pkm_str(pkm, pkm.max_hp) + '\n' for pkm in members[1:])
+    return 'Active:\n%s\nParty:\n%s' % (pkm_str(members[0], members[0].max_hp), party)
+
+
+def outcome_str(fainted: bool) -> str:
+    return 'Lost' if fainted else 'Won'
+
+
+STATUS_LOG = {PkmStatus.PARALYZED: 'was paralyzed', PkmStatus.POISONED: 'was poisoned',
+              PkmStatus.BURNED: 'was burned', PkmStatus.SLEEP: 'is now asleep', PkmStatus.FROZEN: 'was frozen'}
+STATUS_COMMAND = {PkmStatus.PARALYZED: 'paralyzed', PkmStatus.POISONED: 'poisoned', PkmStatus.BURNED: 'burned',
+                  PkmStatus.SLEEP: 'asleep', PkmStatus.FROZEN: 'frozen'}
+
+LOG = {
+    BattleEvent.INIT: lambda t0, t1: 'Trainer 0\n' + team_str(t0) + '\nTrainer 1\n' + team_str(t1),
+    BattleEvent.TURN: lambda turn: f'TURN {turn}\n\n',
+    BattleEvent.OUTCOME: lambda f0, f1: f'\nTrainer 0 {outcome_str(f0)}\nTrainer 1 {outcome_str(f1)}\n',
+    BattleEvent.SWITCH: lambda t, pos, new, new_hp, old, old_hp:
+    f'SWITCH: Trainer {t} switches {pkm_str(old, old_hp)} with {pkm_str(new, new_hp)} in party\n',
+    BattleEvent.SWITCH_FAILED: lambda t: f'SWITCH FAILED: Trainer {t} fails to switch\n',
+    BattleEvent.INVALID_SWITCH: lambda t: f'INVALID SWITCH: Trainer {t} fails to switch\n',
+    BattleEvent.ENTRY_HAZARD_DAMAGE: lambda t, pkm, damage, before_hp, hp:
+    f'ENTRY HAZARD DAMAGE: {pkm_str(pkm, hp)} takes {damage} entry hazard damage from spikes, hp reduces from '
+    f'{before_hp} to {hp}\n ',
+    BattleEvent.NO_LONGER_CONFUSED: lambda t, pkm, hp: f'STATUS: Trainer {t}\'s {pkm_str(pkm, hp)} is no longer '
+                                                       f'confused\n',
+    BattleEvent.NO_LONGER_ASLEEP: lambda t, pkm, hp: f'STATUS: Trainer {t}\'s {pkm_str(pkm, hp)} is no longer asleep\n',
+    BattleEvent.NO_LONGER_FROZEN: lambda t, pkm, hp: f'STATUS: Trainer {t}\'s {pkm_str(pkm, hp)} is no longer frozen\n',
+    BattleEvent.WEATHER_CLEAR: lambda: 'STATE: The weather is clear\n',
+    BattleEvent.WEATHER_DAMAGE: lambda t, pkm, damage, before_hp, hp:
+    'STATE DAMAGE: %s takes %s weather damage from sandstorm/hail hp reduces from %s to %s\n' % (
+        pkm_str(pkm, hp), damage, before_hp, hp),
+    BattleEvent.STATE_DAMAGE: lambda t, pkm, damage, before_hp, hp, status:
+    'STATE DAMAGE: %s takes %s state damage from %s, hp reduces from %s to %s\n' % (
+        pkm_str(pkm, hp), damage, 'poison' if status == PkmStatus.POISONED else 'burn', before_hp, hp),
+    BattleEvent.CANNOT_MOVE: lambda t: f'CANNOT MOVE: Trainer {t} cannot move\n',
+    BattleEvent.MOVE_FAILS: lambda t, pkm, hp, move: 'MOVE FAILS: Trainer %s with %s fails %s\n' % (
+        t, pkm_str(pkm, hp), str(move)),
+    BattleEvent.MOVE: lambda t, pkm, hp, move: 'MOVE: Trainer %s with %s uses %s\n' % (t, pkm_str(pkm, hp), str(move)),
+    BattleEvent.RECOVER: lambda t, recover, hp: f'RECOVER: recovers {recover}\n',
+    BattleEvent.RECOIL: lambda t, recoil, hp: f'RECOIL DAMAGE: gets {recoil} recoil damage\n',
+    BattleEvent.DAMAGE: lambda t, pkm, damage, before_hp, hp: 'DAMAGE: deals %s damage, hp reduces from %s to %s for '
+                                                              '%s\n' % (damage, before_hp, hp, pkm_str(pkm, hp)),
+    BattleEvent.FAINTED: lambda t, pkm: 'FAINTED: %s\n' % pkm_str(pkm, 0.),
+    BattleEvent.FAINTED_SWITCH: lambda t, pos, pkm, hp: '',
+    BattleEvent.WEATHER: lambda weather: f'STATE: The weather is now {WeatherCondition(weather).name}\n',
+    BattleEvent.STATUS: lambda t, pkm, hp, status: f'STATUS: {pkm_str(pkm, hp)} {STATUS_LOG[status]}\n',
+    BattleEvent.CONFUSED: lambda t, pkm, hp: f'STATUS: {pkm_str(pkm, hp)} is now confused\n',
+    BattleEvent.STAGE: lambda t, pkm, hp, stat, delta, stage: 'STAGE: %s %s %s\n' % (
+        pkm_str(pkm, hp), PkmStat(stat).name, 'increased' if delta > 0 else 'decreased'),
+    BattleEvent.ENTRY_HAZARD: lambda t: f'ENTRY HAZARD: Trainer {t} gets spikes\n',
+}
+
+
+def log_command(text: str) -> Tuple:
+    return 'event', ['log', text]
+
+
+def hp_command(t: int, hp: float) -> Tuple:
+    return 'event', ['hp', t, hp]
+
+
+def powers(pkm: Pkm) -> List[float]:
+    return [move.power for move in pkm.moves]
+
+
+COMMANDS = {
+    BattleEvent.INIT: lambda t0, t1: [('init', [t0[0].type.value, t0[1].type.value, t0[2].type.value, t0[0].max_hp] +
+                                       powers(t0[0]) + [t1[0].type.value, t1[1].type.value, t1[2].type.value,
+                                                        t1[0].max_hp])],
+    BattleEvent.TURN: lambda turn: [log_command(f'Turn {turn}.')],
+    BattleEvent.OUTCOME: lambda f0, f1: [log_command(f'Trainer 0 {outcome_str(f0)}.')],
+    BattleEvent.SWITCH: lambda t, pos, new, new_hp, old, old_hp: [('switch', [t, pos, new_hp] + powers(new))],
+    BattleEvent.SWITCH_FAILED: lambda t: [log_command(f'Trainer {t} fails to switch.')],
+    BattleEvent.INVALID_SWITCH: lambda t: [log_command(f'Trainer {t} fails to switch.')],
+    BattleEvent.ENTRY_HAZARD_DAMAGE: lambda t, pkm, damage, before_hp, hp: [
+        log_command(f'Trainer {t} takes {damage} damage from spikes.'), hp_command(t, hp)],
+    BattleEvent.NO_LONGER_CONFUSED: lambda t, pkm, hp: [log_command(f'Trainer {t} active is no longer confused.')],
+    BattleEvent.NO_LONGER_ASLEEP: lambda t, pkm, hp: [log_command(f'Trainer {t} active is no longer asleep.')],
+    BattleEvent.NO_LONGER_FROZEN: lambda t, pkm, hp: [log_command(f'Trainer {t} active is no longer frozen.')],
+    BattleEvent.WEATHER_CLEAR: lambda: [log_command('The weather is clear.')],
+    BattleEvent.WEATHER_DAMAGE: lambda t, pkm, damage, before_hp, hp: [
+        log_command(f'Trainer {t} takes {damage} damage from sandstorm/hail.'), hp_command(t, hp)],
+    BattleEvent.STATE_DAMAGE: lambda t, pkm, damage, before_hp, hp, status: [
+        log_command(f'Trainer {t} takes {damage} damage from poison/burn.'), hp_command(t, hp)],
+    BattleEvent.CANNOT_MOVE: lambda t: [log_command(f'Trainer {t} cannot move.')],
+    BattleEvent.MOVE_FAILS: lambda t, pkm, hp, move: [log_command(f'Trainer {t} active fails its move.')],
+    BattleEvent.MOVE: lambda t, pkm, hp, move: [('attack', [t, move.type.value, move.power > 0.])],
+    BattleEvent.RECOVER: lambda t, recover, hp: [log_command(f'Trainer {t} active recovers.'), hp_command(t, hp)],
+    BattleEvent.RECOIL: lambda t, recoil, hp: [log_command(f'Trainer {t} active takes recoil damage.'),
+                                               hp_command(t, hp)],
+    BattleEvent.DAMAGE: lambda t, pkm, damage, before_hp, hp: [log_command(f'Trainer {t} active takes damage.'),
+                                                               hp_command(t, hp)],
+    BattleEvent.FAINTED: lambda t, pkm: [log_command(f'Trainer {t} active fainted.')],
+    BattleEvent.FAINTED_SWITCH: lambda t, pos, pkm, hp: [('switch', [t, pos, hp] + (powers(pkm) if t == 0 else []))],
+    BattleEvent.WEATHER: lambda weather: [log_command(f'The weather is now {WeatherCondition(weather).name}.')],
+    BattleEvent.STATUS: lambda t, pkm, hp, status: [log_command(f'Trainer {t} is now {STATUS_COMMAND[status]}.')],
+    BattleEvent.CONFUSED: lambda t, pkm, hp: [log_command(f'Trainer {t} is now confused.')],
+    BattleEvent.STAGE: lambda t, pkm, hp, stat, delta, stage: [('event', [PkmStat(stat).name, t, stage])],
+    BattleEvent.ENTRY_HAZARD: lambda t: [log_command(f'Trainer {t} gets spikes.')],
+}
+
+
+def render_log(events: Sequence[Event]) -> str:
+    """
+    Render events to the human-readable battle log.
+
+    :param events: list of events
+    :return: log text
+    """
+    return ''.join(LOG[event[0]](*event[1:]) for event in events)
+
+
+def render_commands(events: Sequence[Event]) -> List[Tuple]:
+    """
+    Render events to the commands consumed by the battle UX.
+
+    :param events: list of events
+    :return: list of UX commands
+    """
+    commands = []
+    for event in events:
+        commands.extend(COMMANDS[event[0]](*event[1:]))
+    return commands
@@ -0,0 +1,68 @@
+from time import perf_counter_ns
+from typing import Callable, Dict
+
+
+class PhaseProfiler:
+
+    def __init__(self):
+        """
+        Wall time and call counts of the phases of battle turns. An env only pays for it while profiling is enabled
+        with PkmBattleEnv.enable_profiling, and one profiler can be shared by several envs to aggregate them. Phase
+        times are inclusive, damage contains the move effects and a phase called inside itself (the fainted switch
+        recursion) is only timed once.
+        """
+        self.time_ns: Dict[str, int] = {}
+        self.calls: Dict[str, int] = {}
+
+    def timed(self, phase: str, method: Callable) -> Callable:
+        """
+        Wrap a method so its calls are accumulated under phase.
+
+        :param phase: phase name
+        :param method: bound method
+        :return: timed method
+        """
+        self.time_ns.setdefault(phase, 0)
+        self.calls.setdefault(phase, 0)
+        time_ns = self.time_ns
+        calls = self.calls
+        depth = [0]
+
+        def timed_method(*args):
+            calls[phase] += 1
+            if depth[0]:
+                return method(*args)
+            depth[0] += 1
+            start = perf_counter_ns()
+            try:
+                return method(*args)
+            finally:
+                time_ns[phase] += perf_counter_ns() - start
+                depth[0] -= 1
+
+        return timed_method
+
+    def reset(self):
+        """
+        Clear the accumulated times and counts.
+        """
+        for phase in self.time_ns:
+            self.time_ns[phase] = 0
+            self.calls[phase] = 0
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: for each phase the number of calls, total time in ms and mean time per call in us
+        """
+        return {phase: {'calls': self.calls[phase], 'total_ms': t / 1e6,
+                        'mean_us': t / 1e3 / self.calls[phase] if self.calls[phase] else 0.}
+                for phase, t in self.time_ns.items()}
+
+    def report(self) -> str:
+        """
+        :return: table of the phases sorted by total time
+        """
+        lines = ['%-20s %10s %12s %10s' % ('phase', 'calls', 'total ms', 'mean us')]
+        for phase, s in sorted(self.stats().items(), key=lambda item: -item[1]['total_ms']):
+            lines.append('%-20s %10d %12.3f %10.2f' % (phase, s['calls'], s['total_ms'], s['mean_us']))
+        return '\n'.join(lines)
@@ -1,50 +1,318 @@
-import random
-from copy import deepcopy
+import weakref
+from collections.abc import Sequence
+from functools import partial
 from multiprocessing.connection import Client
-from typing import List, Tuple
+from typing import List, Tuple, Callable, Any, Optional
 
 import numpy as np
 from gymnasium import Env, spaces
 
 from vgc.competition.StandardPkmMoves import Struggle
-from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, MAX_HIT_POINTS, STATE_DAMAGE, SPIKES_2, SPIKES_3, \
-    TYPE_CHART_MULTIPLIER, DEFAULT_N_ACTIONS
-from vgc.datatypes.Objects import PkmTeam, Pkm, GameState, Weather
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, MAX_HIT_POINTS, STATE_DAMAGE, DEFAULT_N_ACTIONS
+from vgc.datatypes.Objects import PkmTeam, Pkm, GameState, Weather, PkmMove
 from vgc.datatypes.Types import WeatherCondition, PkmEntryHazard, PkmType, PkmStatus, PkmStat, N_HAZARD_STAGES, \
     MIN_STAGE, MAX_STAGE
+from vgc.engine.ChanceEnumerator import ChanceEnumerator
+from vgc.engine.DamageCalculation import attack_damage, spikes_damage, weather_damage, status_damage
+from vgc.engine.Events import BattleEvent, EventBuffer, render_log, render_commands
 from vgc.engine.HiddenInformation import set_pkm
-from vgc.util.Encoding import GAME_STATE_ENCODE_LEN, partial_encode_game_state
+from vgc.engine.PhaseProfiler import PhaseProfiler
+from vgc.engine.RandomStream import RandomStream, N_RANDOM_COLUMNS, COL_ORDER, COL_CONFUSION_END, COL_ASLEEP_END, \
+    COL_FROZEN_END, COL_CONFUSION_DAMAGE, COL_PARALYSIS, COL_ACCURACY, COL_EFFECT, COL_FAINTED_SWITCH, \
+    MAX_FAINTED_SWITCH_ITERATIONS
+from vgc.engine.Rollout import RolloutPolicy, random_move, DEFAULT_ROLLOUT_MAX_TURNS
+from vgc.util.Encoding import GAME_STATE_ENCODE_LEN, ObservationEncoder
+from vgc.util.Hashing import team_key, weather_key, Z_SWITCHED, MAX_TURNS_ASLEEP, MAX_TURNS_CONFUSED
+
+# turn phases timed by PkmBattleEnv.enable_profiling and the engine method of each one
+PROFILED_PHASES = {
+    'turn': '_PkmBattleEnv__resolve_turn',
+    'switch': '_PkmBattleEnv__process_switch_pkms',
+    'attack_order': '_PkmBattleEnv__get_attack_order',
+    'entry_hazard': '_PkmBattleEnv__get_entry_hazard_damage',
+    'pre_battle_effects': '_PkmBattleEnv__process_pre_battle_effects',
+    'confusion': '_PkmBattleEnv__get_pre_combat_damage',
+    'attack': '_PkmBattleEnv__perform_pkm_attack',
+    'damage': '_PkmBattleEnv__get_attack_dmg_rcvr',
+    'post_battle_damage': '_PkmBattleEnv__get_post_battle_damage',
+    'post_battle_effects': '_PkmBattleEnv__process_post_battle_effects',
+    'fainted_switch': '_PkmBattleEnv__switch_fainted_pkm',
+    'observation': '_PkmBattleEnv__get_state',
+}
+
+# chances of the random events of a turn
+ORDER_CHANCE = .5  # player 0 attacks first on a speed tie
+CONFUSION_END_CHANCE = .5
+ASLEEP_END_CHANCE = .5
+FROZEN_END_CHANCE = .2
+CONFUSION_DAMAGE_CHANCE = .33
+PARALYSIS_CHANCE = .25  # see Pkm.paralyzed
+
+
+def _attack_speed(team: PkmTeam, action: int) -> int:
+    """
+    Speed of the active pkm of a team in the attack order, its speed stage plus the priority of the move used.
+
+    :param team: team
+    :param action: team action
+    :return: speed
+    """
+    return team.stage[PkmStat.SPEED] + (team.active.moves[action].priority if action < DEFAULT_PKM_N_MOVES else 0)
+
+
+def _status_applies(status: PkmStatus, pkm_type: PkmType, pkm_status: PkmStatus) -> bool:
+    """
+    Check if a move effect sets a status, otherwise the pkm gets confused.
+
+    :param status: status of the move effect
+    :param pkm_type: type of the target pkm
+    :param pkm_status: current status of the target pkm
+    :return: if the status is set
+    """
+    if status == pkm_status:
+        return False
+    if status == PkmStatus.PARALYZED:
+        return pkm_type != PkmType.ELECTRIC and pkm_type != PkmType.GROUND
+    if status == PkmStatus.POISONED:
+        return pkm_type != PkmType.POISON and pkm_type != PkmType.STEEL
+    if status == PkmStatus.BURNED:
+        return pkm_type != PkmType.FIRE
+    if status == PkmStatus.FROZEN:
+        return pkm_type != PkmType.ICE
+    return status == PkmStatus.SLEEP
+
+
+def _advance_weather(weather: Weather) -> bool:
+    """
+    Count a turn of weather at the end of a turn, clearing it after five turns.
+
+    :param weather: weather
+    :return: if the weather was cleared
+    """
+    if weather.condition != WeatherCondition.CLEAR:
+        weather.n_turns_no_clear += 1
+        if weather.n_turns_no_clear > 5:
+            weather.condition = WeatherCondition.CLEAR
+            weather.n_turns_no_clear = 0
+            return True
+    return False
+
+
+class LazyObservations(Sequence):
+    """
+    Observations of both players returned by PkmBattleEnv step and reset. Each one is only encoded (or copied into a
+    forward env) when it is first read, and then cached. Before the env changes it binds the unread ones to a snapshot
+    of the battle, so they always show the state of the turn they were returned for and are still only built if read.
+    """
+    __slots__ = ('__get_state', '__observations', '__weakref__')
+
+    def __init__(self, get_state: Callable[[int], Any]):
+        """
+        :param get_state: builds the observation of a player
+        """
+        self.__get_state = get_state
+        self.__observations = [None, None]
+
+    def __len__(self) -> int:
+        return 2
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self)[i]
+        observation = self.__observations[i]
+        if observation is None:
+            observation = self.__observations[i] = self.__get_state(i % 2)
+        return observation
+
+    def __repr__(self) -> str:
+        return repr(tuple(self))
+
+    def unread(self) -> bool:
+        """
+        :return: if an observation was not read yet
+        """
+        return self.__observations[0] is None or self.__observations[1] is None
+
+    def detach(self, get_state: Callable[[int], Any]):
+        """
+        Build the observations not read yet with another function, once the env moved on from their turn.
+
+        :param get_state: builds the observation of a player
+        """
+        self.__get_state = get_state
 
 
 class PkmBattleEnv(Env, GameState):
 
-    def __init__(self, teams: Tuple[PkmTeam, PkmTeam], weather=Weather(), debug: bool = False, conn: Client = None,
-                 encode: Tuple[bool, bool] = (True, True)):
+    def __init__(self, teams: Tuple[PkmTeam, PkmTeam], weather: Weather = None, debug: bool = False,
+                 conn: Client = None, encode: Tuple[bool, bool] = (True, True), rng: RandomStream = None):
         # random active pokemon
-        super().__init__(teams, weather)
-        self.n_turns_no_clear = None
+        super().__init__(teams, Weather() if weather is None else weather)
         self.switched = [False, False]
         self.turn = 0
         self.move_view = self.__create_pkm_move_view()
         self.debug = debug
-        self.log = ''
-        self.commands = []
+        self.events = EventBuffer() if debug else None
+        self.turn_seq = 0
+        self.ux_seq = 0
         self.conn = conn
         self.game_state_view = [GameState((self.teams[0], self.teams[1]), self.weather),
                                 GameState((self.teams[1], self.teams[0]), self.weather)]
         self.requires_encode = encode
         self.predictions = [PkmTeam(), PkmTeam()]
         self.action_space = spaces.Discrete(DEFAULT_N_ACTIONS)
-        self.observation_space = spaces.Discrete(GAME_STATE_ENCODE_LEN)
+        # encoded values are normalized to [-1, 1] except entry hazard levels
+        self.observation_space = spaces.Box(-1., float(N_HAZARD_STAGES), (GAME_STATE_ENCODE_LEN,), np.float32)
         self.winner = -1
+        self.journal = []
+        self.__state_key = None
+        self.__observations = None
+        # incremental encoders of the observations, valid while the battle only advances by turns
+        self.__encoders: List[Optional[ObservationEncoder]] = [None, None]
+        self.rng = RandomStream() if rng is None else rng
+        self.profiler = None
+
+    @property
+    def n_turns_no_clear(self) -> int:
+        """
+        Turns since the weather is not clear. The counter is kept in the weather, so the env and its game state views
+        always agree on it.
+        """
+        return self.weather.n_turns_no_clear
+
+    @n_turns_no_clear.setter
+    def n_turns_no_clear(self, n_turns_no_clear: int):
+        self.weather.n_turns_no_clear = n_turns_no_clear
+
+    @property
+    def log(self) -> str:
+        """
+        Human-readable log of the last turn, rendered from the event buffer.
+        """
+        if self.events is None:
+            return ''
+        return render_log(self.events.since(self.turn_seq))
+
+    @property
+    def commands(self) -> List[Tuple]:
+        """
+        UX commands not yet sent by render, rendered from the event buffer.
+        """
+        if self.events is None:
+            return []
+        return render_commands(self.events.since(self.ux_seq))
+
+    def enable_profiling(self, profiler: PhaseProfiler = None) -> PhaseProfiler:
+        """
+        Time the turn phases. The engine methods of the phases are shadowed by timed wrappers on this env only, so a
+        disabled env runs without any profiling cost. Clones and forward envs are not profiled.
+
+        :param profiler: profiler to accumulate into, a new one if None
+        :return: profiler
+        """
+        self.disable_profiling()
+        self.profiler = PhaseProfiler() if profiler is None else profiler
+        for phase, method in PROFILED_PHASES.items():
+            setattr(self, method, self.profiler.timed(phase, getattr(self, method)))
+        return self.profiler
+
+    def disable_profiling(self):
+        """
+        Stop timing the turn phases.
+        """
+        for method in PROFILED_PHASES.values():
+            self.__dict__.pop(method, None)
+        self.profiler = None
 
     def set_predictions(self, team1_p: PkmTeam, team0_p: PkmTeam):
+        self.__detach_observations()
         self.predictions = [team1_p, team0_p]
 
+    def action_mask(self, player: int = 0) -> np.ndarray:
+        """
+        Legal actions of a player. Moves are always legal (Struggle is used without power points), switching is only
+        legal to a party member that exists and is not fainted.
+
+        :param player: trainer
+        :return: boolean array with shape (DEFAULT_N_ACTIONS,)
+        """
+        mask = np.ones(DEFAULT_N_ACTIONS, dtype=bool)
+        party = self.teams[player].party
+        for pos in range(DEFAULT_N_ACTIONS - DEFAULT_PKM_N_MOVES):
+            mask[DEFAULT_PKM_N_MOVES + pos] = pos < len(party) and not party[pos].fainted()
+        return mask
+
+    def clone(self):
+        """
+        Copy the battle. Only the mutable battle state is copied, move and type data is shared, and the copy is not
+        connected to the UX.
+
+        :return: battle copy
+        """
+        env = PkmBattleEnv.__new__(PkmBattleEnv)
+        env.__dict__.update(self.__dict__)
+        env.teams = (self.teams[0].clone(), self.teams[1].clone())
+        env.weather = self.weather.clone()
+        env.switched = self.switched.copy()
+        env.move_view = env.__create_pkm_move_view()
+        env.move_view._damage = self.move_view._damage
+        env.move_view._recover = self.move_view._recover
+        env.events = None
+        env.rng = self.rng.spawn()
+        env.journal = []
+        env.conn = None
+        env.__observations = None
+        env.__encoders = [None, None]
+        if self.profiler is not None:
+            env.disable_profiling()
+        if self.game_state_view:
+            env.game_state_view = [GameState((env.teams[0], env.teams[1]), env.weather),
+                                   GameState((env.teams[1], env.teams[0]), env.weather)]
+        return env
+
+    def snapshot(self) -> Tuple:
+        """
+        Get the mutable battle state, including the engine turn counters and pending move effects.
+
+        :return: battle snapshot
+        """
+        return super().snapshot(), self.turn, self.winner, tuple(self.switched), self.move_view._damage, \
+            self.move_view._recover
+
+    def restore(self, snapshot: Tuple):
+        """
+        Restore the mutable battle state.
+
+        :param snapshot: snapshot from PkmBattleEnv.snapshot
+        """
+        self.__detach_observations()
+        game_state, self.turn, self.winner, switched, self.move_view._damage, self.move_view._recover = snapshot
+        super().restore(game_state)
+        self.switched = list(switched)
+        self.__state_key = None
+        self.__reset_encoders()
+
+    def state_key(self) -> int:
+        """
+        Zobrist key of the battle state, usable as a transposition table or evaluation cache key. It is computed once
+        and cached until the next turn, reset or restore, changes made directly to the teams are not tracked.
+
+        :return: 64 bit key
+        """
+        if self.__state_key is None:
+            key = team_key(self.teams[0], 0) ^ team_key(self.teams[1], 1) ^ \
+                weather_key(self.weather.condition, self.weather.n_turns_no_clear)
+            for i, switched in enumerate(self.switched):
+                if switched:
+                    key ^= Z_SWITCHED[i]
+            if self.move_view._damage or self.move_view._recover:
+                key ^= hash((self.move_view._damage, self.move_view._recover))
+            self.__state_key = key
+        return self.__state_key
+
     def __get_forward_env(self, player: int):
-        env = PkmBattleEnv((deepcopy(self.teams[player]), deepcopy(self.teams[not player])), deepcopy(self.weather),
-                           encode=self.requires_encode)
-        env.n_turns_no_clear = self.n_turns_no_clear
+        env = PkmBattleEnv((self.teams[player].clone(), self.teams[not player].clone()), self.weather.clone(),
+                           encode=self.requires_encode, rng=self.rng.spawn())
         env.turn = self.turn
         env.winner = self.winner
         # hidde information and replace with prediction information
@@ -56,38 +324,296 @@ class PkmBattleEnv(Env, GameState):
         env.game_state_view = []
         return env
 
-    def __get_states(self):
-        if self.requires_encode[0]:
-            s0 = []
-            partial_encode_game_state(s0, self.game_state_view[0])
-        else:
-            s0 = self.__get_forward_env(0)
-        if self.requires_encode[1]:
-            s1 = []
-            partial_encode_game_state(s1, self.game_state_view[1])
-        else:
-            s1 = self.__get_forward_env(1)
-        return s0, s1
+    def __get_state(self, player: int):
+        if self.requires_encode[player]:
+            encoder = self.__encoders[player]
+            if encoder is None:
+                encoder = self.__encoders[player] = ObservationEncoder()
+            return encoder.encode(self.game_state_view[player]).copy()
+        return self.__get_forward_env(player)
+
+    def __touch_actives(self):
+        """
+        Mark the active pkm for the observation encoders, every pkm active during a turn can change.
+        """
+        for encoder in self.__encoders:
+            if encoder is not None:
+                encoder.touch(self.teams[0].active)
+                encoder.touch(self.teams[1].active)
+
+    def __reset_encoders(self):
+        """
+        Encode the next observations from scratch, after the battle state was changed other than by a turn.
+        """
+        for encoder in self.__encoders:
+            if encoder is not None:
+                encoder.reset()
+
+    def __get_states(self) -> LazyObservations:
+        observations = LazyObservations(self.__get_state)
+        self.__observations = weakref.ref(observations)
+        return observations
+
+    def __detach_observations(self):
+        """
+        Bind the observations of the last step or reset still referenced and not read to a snapshot of the battle,
+        before the battle changes. Taking the snapshot is cheaper than building them, which only happens if they are
+        read.
+        """
+        if self.__observations is not None:
+            observations = self.__observations()
+            if observations is not None and observations.unread():
+                observations.detach(partial(self.__get_snapshot_state, self.snapshot(), self.predictions.copy()))
+            self.__observations = None
+
+    def __get_snapshot_state(self, snapshot: Tuple, predictions: List[PkmTeam], player: int):
+        """
+        Build the observation of a player on a copy of the battle restored from a snapshot.
+
+        :param snapshot: snapshot from PkmBattleEnv.snapshot
+        :param predictions: predictions when the snapshot was taken
+        :param player: trainer
+        :return: observation
+        """
+        env = self.clone()
+        game_state, env.turn, env.winner, switched, env.move_view._damage, env.move_view._recover = snapshot
+        team0, team1, env.weather.condition, env.weather.n_turns_no_clear = game_state
+        for team, (pkms, *team_snapshot) in zip(env.teams, (team0, team1)):
+            # the members of the snapshot may be in the battle again, they are restored on copies
+            team.restore((tuple(pkm.clone() for pkm in pkms), *team_snapshot))
+        env.switched = list(switched)
+        env.predictions = predictions
+        return env.__get_state(player)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_PkmBattleEnv__observations'] = None
+        state['_PkmBattleEnv__encoders'] = [None, None]
+        if self.profiler is not None:
+            for method in PROFILED_PHASES.values():
+                state.pop(method, None)
+            state['profiler'] = None
+        # teams and weather are GameState slots outside __dict__, pickle and deepcopy restore them from this dict
+        return state, {'teams': self.teams, 'weather': self.weather}
 
     def step(self, actions):
+        r, terminated = self.__resolve_turn(actions, self.rng.take(N_RANDOM_COLUMNS))
+        return self.__get_states(), r, terminated, False, {}
+
+    def push(self, actions) -> Tuple[List[float], bool]:
+        """
+        Apply a turn, recording an undo entry so it can be reverted with pop. Unlike step no observations are built,
+        so a search can walk the game tree on a single env.
+
+        :param actions: players actions
+        :return: rewards, terminated
+        """
+        self.__record()
+        return self.__resolve_turn(actions, self.rng.take(N_RANDOM_COLUMNS))
+
+    def pop(self):
+        """
+        Revert the last turn applied with push, including the random stream position.
+        """
+        snapshot, rng_state, seq, self.turn_seq = self.journal.pop()
+        self.restore(snapshot)
+        self.rng.set_state(rng_state)
+        if self.events is not None:
+            self.events.rewind(seq)
+
+    def outcomes(self, actions) -> List[Tuple[float, 'PkmBattleEnv', List[float], bool]]:
+        """
+        Enumerate the possible results of a turn with their exact probabilities, instead of sampling step. Branches
+        that end in the same state with the same rewards are merged. The env is left unchanged and its random stream
+        is not used.
+
+        :param actions: players actions
+        :return: list of probability, successor env, rewards and terminated of each distinct result
+        """
+        enumerator = ChanceEnumerator()
+        results = {}
+        branch = True
+        while branch:
+            self.__record()
+            r, terminated = self.__resolve_turn(actions, enumerator.vector())
+            key = (self.snapshot(), tuple(r), terminated)
+            if key in results:
+                results[key][0] += enumerator.probability()
+            else:
+                results[key] = [enumerator.probability(), self.clone(), r, terminated]
+            self.pop()
+            branch = enumerator.next_branch()
+        return [(p, env, r, terminated) for p, env, r, terminated in results.values()]
+
+    def expected_step(self, actions) -> Tuple[GameState, List[float], float]:
+        """
+        Apply the mean result of a turn, with the engine rules and without random numbers, for agents that plan on
+        a GameState. The hit points of every pkm and the rewards are computed directly as expectations over the
+        accuracy, effect, status and attack order chances, while the active pkm, status, stages, hazards and weather
+        change only when the change is more likely than not. Turns of damaging moves without effects are exact. The
+        env is left unchanged.
+
+        :param actions: players actions, an action of DEFAULT_N_ACTIONS or more is a pass
+        :return: expected game state, expected rewards and probability that the battle ends
+        """
+        return _ExpectedTurn(self, self.switched, self.move_view.damage, self.move_view.recover).run(actions)
+
+    def expand_all(self, joint_actions=None) -> Tuple[List['PkmBattleEnv'], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Apply every joint action to the current state in a single call, for searches that expand a node with all the
+        action pairs. The switches, entry hazards, pre battle effects and confusion are resolved once for all the
+        pairs with the same switch choices, only the attacks and the end of the turn are resolved per pair. One turn
+        random vector is drawn from the env stream and shared by all the pairs, the env is otherwise left unchanged.
+
+        :param joint_actions: sequence of (action of player 0, action of player 1), all DEFAULT_N_ACTIONS ** 2 pairs
+            if None
+        :return: successor env, rewards with shape (n, 2), terminated with shape (n,) and number of fainted pkm of
+            each team with shape (n, 2) of each pair
+        """
+        if joint_actions is None:
+            joint_actions = [(i, j) for i in range(DEFAULT_N_ACTIONS) for j in range(DEFAULT_N_ACTIONS)]
+        n = len(joint_actions)
+        successors: List[PkmBattleEnv] = [None] * n
+        rewards = np.zeros((n, 2))
+        terminated = np.zeros(n, dtype=bool)
+        fainted = np.zeros((n, 2), dtype=np.int64)
+        # all the moves leave the teams as they are, each switch action may change the active pkm
+        groups = {}
+        for k, actions in enumerate(joint_actions):
+            key = tuple(a if a >= DEFAULT_PKM_N_MOVES else -1 for a in actions)
+            groups.setdefault(key, []).append(k)
+        u = self.rng.take(N_RANDOM_COLUMNS)
+        for pairs in groups.values():
+            self.__record()
+            self.__begin_turn(joint_actions[pairs[0]])
+            r_pre, confusion_damage = self.__resolve_pre_battle(0, 1, u)
+            for k in pairs:
+                actions = joint_actions[k]
+                self.__record()
+                first, second = self.__get_attack_order(actions, u)
+                r, terminated[k] = self.__resolve_battle(actions, u, first, second, r_pre.copy(), confusion_damage)
+                rewards[k] = r
+                for t, team in enumerate(self.teams):
+                    fainted[k, t] = team.active.fainted() + sum(pkm.fainted() for pkm in team.party)
+                successors[k] = self.clone()
+                self.pop()
+            self.pop()
+        # children spawned between record and pop would share their streams
+        for env in successors:
+            env.rng = self.rng.spawn()
+        return successors, rewards, terminated, fainted
+
+    def rollout(self, policy0: RolloutPolicy = random_move, policy1: RolloutPolicy = random_move,
+                max_turns: int = DEFAULT_ROLLOUT_MAX_TURNS,
+                rng: RandomStream = None) -> Tuple[int, Tuple[float, float]]:
+        """
+        Play the battle to the end with two rollout policies, without building views or encodings for the turns. The
+        env is left unchanged, the battle dice are drawn from its random stream.
+
+        :param policy0: rollout policy of player 0
+        :param policy1: rollout policy of player 1
+        :param max_turns: maximum number of turns to play
+        :param rng: stream of the policies random numbers, a child of the env stream if None
+        :return: winner (-1 if the battle did not end in max_turns) and hit points left of each team
+        """
+        winners, hp = self.rollouts(1, policy0, policy1, max_turns, rng)
+        return int(winners[0]), (float(hp[0, 0]), float(hp[0, 1]))
+
+    def rollouts(self, n: int, policy0: RolloutPolicy = random_move, policy1: RolloutPolicy = random_move,
+                 max_turns: int = DEFAULT_ROLLOUT_MAX_TURNS, rng: RandomStream = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Play n independent rollouts from the current state, see rollout.
+
+        :param n: number of rollouts
+        :param policy0: rollout policy of player 0
+        :param policy1: rollout policy of player 1
+        :param max_turns: maximum number of turns to play
+        :param rng: stream of the policies random numbers, a child of the env stream if None
+        :return: winners with shape (n,) and hit points left of each team with shape (n, 2)
+        """
+        if rng is None:
+            rng = self.rng.spawn()
+        winners = np.empty(n, dtype=np.int64)
+        hp = np.empty((n, 2))
+        self.__record()
+        snapshot = self.journal[-1][0]
+        # rollout turns emit no events, they would overwrite the ones of the battle turns
+        events = self.events
+        self.events = None
+        try:
+            for k in range(n):
+                turn = 0
+                while self.winner == -1 and turn < max_turns:
+                    actions = [policy0(self, 0, rng.random()), policy1(self, 1, rng.random())]
+                    self.__resolve_turn(actions, self.rng.take(N_RANDOM_COLUMNS))
+                    turn += 1
+                winners[k] = self.winner
+                for t, team in enumerate(self.teams):
+                    hp[k, t] = team.active.hp + sum(pkm.hp for pkm in team.party)
+                self.restore(snapshot)
+        finally:
+            self.events = events
+        # unlike pop the random stream is not moved back, so the next rollouts roll new dice
+        self.journal.pop()
+        return winners, hp
+
+    def __record(self):
+        """
+        Append an undo entry to the journal.
+        """
+        seq = self.events.seq if self.events is not None else 0
+        self.journal.append((self.snapshot(), self.rng.get_state(), seq, self.turn_seq))
 
+    def __resolve_turn(self, actions, u: List[float]) -> Tuple[List[float], bool]:
+        """
+        Resolve a battle turn.
+
+        :param actions: players actions
+        :param u: turn random vector
+        :return: rewards, terminated
+        """
+        self.__begin_turn(actions)
+
+        # set trainer attack order
+        first, second = self.__get_attack_order(actions, u)
+
+        r, confusion_damage = self.__resolve_pre_battle(first, second, u)
+        return self.__resolve_battle(actions, u, first, second, r, confusion_damage)
+
+    def __begin_turn(self, actions):
+        """
+        Start a turn and process the switches, the only part of the turn that depends on the actions before the
+        attacks.
+
+        :param actions: players actions
+        """
         # Reset variables
-        r = [0., 0.]
-        t = [False, False]
+        self.__detach_observations()
+        self.__state_key = None
         if self.debug:
             self.turn += 1
-            self.log = f'TURN {self.turn}\n\n'
-            self.commands.append(('event', ['log', f'Turn {self.turn}.']))
+        if self.events is not None:
+            self.turn_seq = self.events.seq
+            self.events.emit(BattleEvent.TURN, self.turn)
 
         # switch pkm
+        self.__touch_actives()
         self.__process_switch_pkms(actions)
+        self.__touch_actives()
 
-        # set trainer attack order
-        first, second = self.__get_attack_order(actions)
-        first_team = self.teams[first]
-        first_pkm = first_team.active
-        second_team = self.teams[second]
-        second_pkm = second_team.active
+    def __resolve_pre_battle(self, first: int, second: int, u: List[float]) -> Tuple[List[float], List[bool]]:
+        """
+        Entry hazard damage, pre battle effects and confusion damage. The result does not depend on the attack order,
+        which only sets the order of the events.
+
+        :param first: first trainer to attack
+        :param second: second trainer to attack
+        :param u: turn random vector
+        :return: rewards and if each trainer took confusion damage
+        """
+        r = [0., 0.]
+        first_pkm = self.teams[first].active
+        second_pkm = self.teams[second].active
 
         # get entry hazard damage
         dmg_2_first = self.__get_entry_hazard_damage(first)
@@ -99,36 +625,59 @@ class PkmBattleEnv(Env, GameState):
         active_not_fainted = not (first_pkm.fainted() or second_pkm.fainted())
 
         # process all pre battle effects
-        self.__process_pre_battle_effects()
+        self.__process_pre_battle_effects(u)
 
         # confusion state damage
-        dmg_2_first = self.__get_pre_combat_damage(first) if active_not_fainted else 0.
-        dmg_2_second = self.__get_pre_combat_damage(second) if active_not_fainted else 0.
+        dmg_2_first = self.__get_pre_combat_damage(first, u) if active_not_fainted else 0.
+        dmg_2_second = self.__get_pre_combat_damage(second, u) if active_not_fainted else 0.
 
-        first_confusion_damage = dmg_2_first > 0.
-        second_confusion_damage = dmg_2_second > 0.
+        confusion_damage = [False, False]
+        confusion_damage[first] = dmg_2_first > 0.
+        confusion_damage[second] = dmg_2_second > 0.
 
         r[first] += (dmg_2_second - dmg_2_first) / MAX_HIT_POINTS
         r[second] += (dmg_2_first - dmg_2_second) / MAX_HIT_POINTS
 
+        return r, confusion_damage
+
+    def __resolve_battle(self, actions, u: List[float], first: int, second: int, r: List[float],
+                         confusion_damage: List[bool]) -> Tuple[List[float], bool]:
+        """
+        Attacks, post battle effects and fainted switches, the rest of the turn after __resolve_pre_battle.
+
+        :param actions: players actions
+        :param u: turn random vector
+        :param first: first trainer to attack
+        :param second: second trainer to attack
+        :param r: rewards of the pre battle
+        :param confusion_damage: if each trainer took confusion damage
+        :return: rewards, terminated
+        """
+        t = [False, False]
+        first_team = self.teams[first]
+        first_pkm = first_team.active
+        second_team = self.teams[second]
+        second_pkm = second_team.active
+        first_confusion_damage = confusion_damage[first]
+        second_confusion_damage = confusion_damage[second]
+
         active_not_fainted = not (first_pkm.fainted() or second_pkm.fainted())
 
         # battle
-        first_can_attack = active_not_fainted and not first_pkm.paralyzed() and not first_pkm.asleep() and not \
-            first_pkm.frozen() and not first_confusion_damage
-        if self.debug and not first_can_attack:
-            self.log += f'CANNOT MOVE: Trainer {first} cannot move\n'
-            self.commands.append(('event', ['log', f'Trainer {first} cannot move.']))
-        dmg_2_second, hp_2_first = self.__perform_pkm_attack(first, actions[first]) if first_can_attack else (0., 0.)
+        first_can_attack = active_not_fainted and not first_pkm.paralyzed(u[COL_PARALYSIS + first]) and \
+            not first_pkm.asleep() and not first_pkm.frozen() and not first_confusion_damage
+        if self.events is not None and not first_can_attack:
+            self.events.emit(BattleEvent.CANNOT_MOVE, first)
+        dmg_2_second, hp_2_first = self.__perform_pkm_attack(first, actions[first], u) if first_can_attack else (0., 0.)
 
         active_not_fainted = not (first_pkm.fainted() or second_pkm.fainted())
 
-        second_can_attack = active_not_fainted and not second_pkm.paralyzed() and not second_pkm.asleep() and not \
-            second_pkm.frozen() and not second_confusion_damage
-        if self.debug and not second_can_attack:
-            self.log += f'CANNOT MOVE: Trainer {second} cannot move\n'
-            self.commands.append(('event', ['log', f'Trainer {second} cannot move.']))
-        dmg_2_first, hp_2_second = self.__perform_pkm_attack(second, actions[second]) if second_can_attack else (0., 0.)
+        second_can_attack = active_not_fainted and not second_pkm.paralyzed(u[COL_PARALYSIS + second]) and \
+            not second_pkm.asleep() and not second_pkm.frozen() and not second_confusion_damage
+        if self.events is not None and not second_can_attack:
+            self.events.emit(BattleEvent.CANNOT_MOVE, second)
+        dmg_2_first, hp_2_second = self.__perform_pkm_attack(second, actions[second], u) if second_can_attack else \
+            (0., 0.)
 
         r[first] += (dmg_2_second + hp_2_first - dmg_2_first) / MAX_HIT_POINTS + float(second_pkm.fainted())
         r[second] += (dmg_2_first + hp_2_second - dmg_2_second) / MAX_HIT_POINTS + float(first_pkm.fainted())
@@ -144,7 +693,7 @@ class PkmBattleEnv(Env, GameState):
         self.__process_post_battle_effects()
 
         # switch fainted pkm
-        dmg_2_first, dmg_2_second = self.__switch_fainted_pkm()
+        dmg_2_first, dmg_2_second = self.__switch_fainted_pkm(u)
 
         r[first] += (dmg_2_second - dmg_2_first) / MAX_HIT_POINTS
         r[second] += (dmg_2_first - dmg_2_second) / MAX_HIT_POINTS
@@ -161,16 +710,38 @@ class PkmBattleEnv(Env, GameState):
         if terminated:
             self.winner = 1 if t[0] else 0
 
-            if self.debug:
-                outcome0 = 'Lost' if self.teams[0].fainted() else 'Won'
-                outcome1 = 'Lost' if self.teams[1].fainted() else 'Won'
-                self.log += f'\nTrainer 0 {outcome0}\n'
-                self.log += f'Trainer 1 {outcome1}\n'
-                self.commands.append(('event', ['log', f'Trainer 0 {outcome0}.']))
+            if self.events is not None:
+                self.events.emit(BattleEvent.OUTCOME, self.teams[0].fainted(), self.teams[1].fainted())
 
-        return self.__get_states(), r, terminated, False, {}
+        return r, terminated
+
+    def reset(self, seed: int = None, teams: Tuple[PkmTeam, PkmTeam] = None,
+              predictions: Tuple[PkmTeam, PkmTeam] = None):
+        """
+        Reset the battle. Passing new teams reuses the env for another battle without constructing a new one, the
+        predictions then default to none.
 
-    def reset(self):
+        :param seed: restart the random stream from this seed if not None
+        :param teams: teams of the next battle, keep the current teams if None
+        :param predictions: predicted opponent teams (team1_p, team0_p) as in set_predictions
+        """
+        if seed is not None:
+            self.rng.seed(seed)
+        self.__detach_observations()
+        if teams is not None:
+            self.teams = teams
+            self.journal = []
+            if self.game_state_view:
+                self.game_state_view[0].teams = (teams[0], teams[1])
+                self.game_state_view[1].teams = (teams[1], teams[0])
+            if predictions is None:
+                self.predictions = [PkmTeam(), PkmTeam()]
+        if predictions is not None:
+            self.predictions = [predictions[0], predictions[1]]
+        self.move_view._damage = 0.
+        self.move_view._recover = 0.
+        self.__state_key = None
+        self.__reset_encoders()
         self.weather.condition = WeatherCondition.CLEAR
         self.weather.n_turns_no_clear = 0
         self.turn = 0
@@ -181,31 +752,21 @@ class PkmBattleEnv(Env, GameState):
             team.reset()
             team.active.reveal_pkm()
 
-        if self.debug:
-            self.log = 'Trainer 0\n' + str(self.teams[0])
-            self.log += '\nTrainer 1\n' + str(self.teams[1])
-            del self.commands[:]
-            self.commands.append(('init', [self.teams[0].active.type.value,
-                                           self.teams[0].party[0].type.value,
-                                           self.teams[0].party[1].type.value,
-                                           self.teams[0].active.hp,
-                                           self.teams[0].active.moves[0].power,
-                                           self.teams[0].active.moves[1].power,
-                                           self.teams[0].active.moves[2].power,
-                                           self.teams[0].active.moves[3].power,
-                                           self.teams[1].active.type.value,
-                                           self.teams[1].party[0].type.value,
-                                           self.teams[1].party[1].type.value,
-                                           self.teams[1].active.hp]))
+        if self.events is not None:
+            # pending UX commands are discarded
+            self.turn_seq = self.ux_seq = self.events.seq
+            self.events.emit(BattleEvent.INIT, tuple(self.teams[0].get_pkm_list()),
+                             tuple(self.teams[1].get_pkm_list()))
 
         return self.__get_states(), {}
 
     def render(self, mode='console'):
         if mode == 'console':
             print(self.log)
-        elif mode == 'ux' and self.conn is not None:
-            while len(self.commands) > 0:
-                self.conn.send(self.commands.pop(0))
+        elif mode == 'ux' and self.conn is not None and self.events is not None:
+            for command in self.commands:
+                self.conn.send(command)
+            self.ux_seq = self.events.seq
 
     def __process_switch_pkms(self, actions: List[int]):
         """
@@ -220,19 +781,13 @@ class PkmBattleEnv(Env, GameState):
                 if not team.party[pos].fainted():
                     new_active, old_active, _ = team.switch(pos)
                     self.switched[i] = True
-                    if self.debug:
-                        self.log += f'SWITCH: Trainer {i} switches {old_active} with {new_active} in party\n'
-                        self.commands.append(('switch', [i, pos, new_active.hp,
-                                                         new_active.moves[0].power,
-                                                         new_active.moves[1].power,
-                                                         new_active.moves[2].power,
-                                                         new_active.moves[3].power]))
-                elif self.debug:
-                    self.log += f'SWITCH FAILED: Trainer {i} fails to switch\n'
-                    self.commands.append(('event', ['log', f'Trainer {i} fails to switch.']))
-            elif self.debug and pos >= (team.size() - 1):
-                self.log += f'INVALID SWITCH: Trainer {i} fails to switch\n'
-                self.commands.append(('event', ['log', f'Trainer {i} fails to switch.']))
+                    if self.events is not None:
+                        self.events.emit(BattleEvent.SWITCH, i, pos, new_active, new_active.hp, old_active,
+                                         old_active.hp)
+                elif self.events is not None:
+                    self.events.emit(BattleEvent.SWITCH_FAILED, i)
+            elif self.events is not None and pos >= (team.size() - 1):
+                self.events.emit(BattleEvent.INVALID_SWITCH, i)
 
     def __get_entry_hazard_damage(self, t_id: int) -> float:
         """
@@ -244,27 +799,26 @@ class PkmBattleEnv(Env, GameState):
         damage = 0.
         team = self.teams[t_id]
         pkm = team.active
-        spikes = team.entry_hazard[PkmEntryHazard.SPIKES]
+        spikes = spikes_damage(team.entry_hazard[PkmEntryHazard.SPIKES], pkm.type)
 
         # Spikes damage
-        if spikes and pkm.type != PkmType.FLYING and self.switched[t_id]:
+        if spikes and self.switched[t_id]:
             before_hp = pkm.hp
-            pkm.hp -= STATE_DAMAGE if spikes <= 1 else SPIKES_2 if spikes == 2 else SPIKES_3
+            pkm.hp -= spikes
             pkm.hp = 0. if pkm.hp < 0. else pkm.hp
             damage = before_hp - pkm.hp
             self.switched[t_id] = False
-            if self.debug and damage > 0.:
-                self.log += f'ENTRY HAZARD DAMAGE: {str(pkm)} takes {damage} entry hazard damage from spikes, ' \
-                            f'hp reduces from {before_hp} to {pkm.hp}\n '
-                self.commands.append(('event', ['log', f'Trainer {team} takes {damage} damage from spikes.']))
-                self.commands.append(('event', ['hp', team, pkm.hp]))
+            if self.events is not None and damage > 0.:
+                self.events.emit(BattleEvent.ENTRY_HAZARD_DAMAGE, t_id, pkm, damage, before_hp, pkm.hp)
 
         return damage
 
-    def __process_pre_battle_effects(self):
+    def __process_pre_battle_effects(self, u: List[float]):
         """
         Process all pre battle effects.
 
+        :param u: turn random vector
+
         """
         # for all trainers
         for i in range(len(self.teams)):
@@ -275,46 +829,36 @@ class PkmBattleEnv(Env, GameState):
             # check if active pkm should be no more confused
             if team.confused:
                 team.n_turns_confused += 1
-                if random.uniform(0, 1) <= 0.5 or team.n_turns_confused == 4:
+                if u[COL_CONFUSION_END + i] <= CONFUSION_END_CHANCE or team.n_turns_confused == MAX_TURNS_CONFUSED:
                     team.confused = False
                     team.n_turns_confused = 0
-                    if self.debug:
-                        self.log += f'STATUS: Trainer {i}\'s {str(pkm)} is no longer confused\n'
-                        self.commands.append(('event', ['log', f'Trainer {i} active is no longer confused.']))
+                    if self.events is not None:
+                        self.events.emit(BattleEvent.NO_LONGER_CONFUSED, i, pkm, pkm.hp)
 
             # check if active pkm should be no longer asleep
             if pkm.asleep():
                 pkm.n_turns_asleep += 1
-                if random.uniform(0, 1) <= 0.5 or pkm.n_turns_asleep == 4:
+                if u[COL_ASLEEP_END + i] <= ASLEEP_END_CHANCE or pkm.n_turns_asleep == MAX_TURNS_ASLEEP:
                     pkm.status = PkmStatus.NONE
                     pkm.n_turns_asleep = 0
-                    if self.debug:
-                        self.log += f'STATUS: Trainer {i}\'s {str(pkm)} is no longer asleep\n'
-                        self.commands.append(('event', ['log', f'Trainer {i} active is no longer asleep.']))
+                    if self.events is not None:
+                        self.events.emit(BattleEvent.NO_LONGER_ASLEEP, i, pkm, pkm.hp)
 
             # check if active pkm should be no longer frozen
             if pkm.frozen():
-                if random.uniform(0, 1) <= 0.2:
+                if u[COL_FROZEN_END + i] <= FROZEN_END_CHANCE:
                     pkm.status = PkmStatus.NONE
-                    if self.debug:
-                        self.log += f'STATUS: Trainer {i}\'s {str(pkm)} is no longer frozen\n'
-                        self.commands.append(('event', ['log', f'Trainer {i} active is no longer frozen.']))
+                    if self.events is not None:
+                        self.events.emit(BattleEvent.NO_LONGER_FROZEN, i, pkm, pkm.hp)
 
     def __process_post_battle_effects(self):
         """
         Process all post battle effects.
 
         """
-        if self.weather.condition != WeatherCondition.CLEAR:
-            self.n_turns_no_clear += 1
-
-            # clear weather if appropriated
-            if self.n_turns_no_clear > 5:
-                self.weather.condition = WeatherCondition.CLEAR
-                self.n_turns_no_clear = 0
-                if self.debug:
-                    self.log += 'STATE: The weather is clear\n'
-                    self.commands.append(('event', ['log', f'The weather is clear.']))
+        # clear weather if appropriated
+        if _advance_weather(self.weather) and self.events is not None:
+            self.events.emit(BattleEvent.WEATHER_CLEAR)
 
     def __get_post_battle_damage(self, t_id: int) -> float:
         """
@@ -324,63 +868,44 @@ class PkmBattleEnv(Env, GameState):
         :return: damage to pkm
         """
         pkm = self.teams[t_id].active
-        state_damage = 0.
-
-        if self.weather.condition == WeatherCondition.SANDSTORM and (
-                pkm.type != PkmType.ROCK and pkm.type != PkmType.GROUND and pkm.type != PkmType.STEEL):
-            state_damage = STATE_DAMAGE
-        elif self.weather.condition == WeatherCondition.HAIL and (pkm.type != PkmType.ICE):
-            state_damage = STATE_DAMAGE
+        state_damage = weather_damage(pkm.type, self.weather.condition)
 
         before_hp = pkm.hp
         pkm.hp -= state_damage
         pkm.hp = 0. if pkm.hp < 0. else pkm.hp
         damage = before_hp - pkm.hp
 
-        if self.debug and state_damage > 0.:
-            self.log += 'STATE DAMAGE: %s takes %s weather damage from sandstorm/hail hp reduces from %s to %s\n' % (
-                str(pkm), damage, before_hp, pkm.hp)
-            self.commands.append(('event', ['log', f'Trainer {t_id} takes {damage} damage from sandstorm/hail.']))
-            self.commands.append(('event', ['hp', t_id, pkm.hp]))
-
-        if pkm.status == PkmStatus.POISONED or pkm.status == PkmStatus.BURNED:
-            state_damage = STATE_DAMAGE
+        if self.events is not None and state_damage > 0.:
+            self.events.emit(BattleEvent.WEATHER_DAMAGE, t_id, pkm, damage, before_hp, pkm.hp)
 
+        state_damage = status_damage(pkm.status)
+        if state_damage > 0.:
             before_hp = pkm.hp
             pkm.hp -= state_damage
             pkm.hp = 0. if pkm.hp < 0. else pkm.hp
             damage = before_hp - pkm.hp
 
-            if self.debug and damage > 0.:
-                self.log += 'STATE DAMAGE: %s takes %s state damage from %s, hp reduces from %s to %s\n' % (
-                    str(pkm), damage, 'poison' if pkm.status == PkmStatus.POISONED else 'burn', before_hp, pkm.hp)
-                self.commands.append(('event', ['log', f'Trainer {t_id} takes {damage} damage from poison/burn.']))
-                self.commands.append(('event', ['hp', t_id, pkm.hp]))
+            if self.events is not None and damage > 0.:
+                self.events.emit(BattleEvent.STATE_DAMAGE, t_id, pkm, damage, before_hp, pkm.hp, pkm.status)
 
         return damage
 
-    def __get_attack_order(self, actions) -> Tuple[int, int]:
+    def __get_attack_order(self, actions, u: List[float]) -> Tuple[int, int]:
         """
         Get attack order for this turn.
         Priority is given to the pkm with highest speed_stage. Otherwise random.
 
+        :param u: turn random vector
         :return: tuple with first and second trainer to perform attack
         """
-        action0 = actions[0]
-        action1 = actions[1]
-        speed0 = self.teams[0].stage[PkmStat.SPEED] + (
-            self.teams[0].active.moves[action0].priority if action0 < DEFAULT_PKM_N_MOVES else 0)
-        speed1 = self.teams[1].stage[PkmStat.SPEED] + (
-            self.teams[1].active.moves[action1].priority if action1 < DEFAULT_PKM_N_MOVES else 0)
+        speed0 = _attack_speed(self.teams[0], actions[0])
+        speed1 = _attack_speed(self.teams[1], actions[1])
         if speed0 > speed1:
-            order = [0, 1]
+            return 0, 1
         elif speed1 > speed0:
-            order = [1, 0]
-        else:
-            # random attack order
-            order = [0, 1]
-            np.random.shuffle(order)
-        return order[0], order[1]
+            return 1, 0
+        # random attack order
+        return (0, 1) if u[COL_ORDER] < ORDER_CHANCE else (1, 0)
 
     class PkmMoveView:
 
@@ -394,10 +919,9 @@ class PkmBattleEnv(Env, GameState):
         def set_weather(self, weather: WeatherCondition):
             if weather != self.__engine.weather.condition:
                 self.__engine.weather.condition = weather
-                self.__engine.n_turns_no_clear = 0
-                if self.__engine.debug:
-                    self.__engine.log += f'STATE: The weather is now {weather.name}\n'
-                    self.__engine.commands.append(('event', ['log', f'The weather is now {weather.name}.']))
+                self.__engine.weather.n_turns_no_clear = 0
+                if self.__engine.events is not None:
+                    self.__engine.events.emit(BattleEvent.WEATHER, weather)
 
         def set_fixed_damage(self, damage: float):
             self._damage = damage
@@ -408,39 +932,16 @@ class PkmBattleEnv(Env, GameState):
         def set_status(self, status: PkmStatus, t_id: int = 1):
             pkm = self._active[t_id]
             team = self._team[t_id]
-            if status == PkmStatus.PARALYZED and pkm.type != PkmType.ELECTRIC and pkm.type != PkmType.GROUND and \
-                    pkm.status != PkmStatus.PARALYZED:
-                pkm.status = PkmStatus.PARALYZED
-                if self.__engine.debug:
-                    self.__engine.log += f'STATUS: {str(pkm)} was paralyzed\n'
-                    self.__engine.commands.append(('event', ['log', f'Trainer {t_id} is now paralyzed.']))
-            elif status == PkmStatus.POISONED and pkm.type != PkmType.POISON and pkm.type != PkmType.STEEL and \
-                    pkm.status != PkmStatus.POISONED:
-                pkm.status = PkmStatus.POISONED
-                if self.__engine.debug:
-                    self.__engine.log += f'STATUS: {str(pkm)} was poisoned\n'
-                    self.__engine.commands.append(('event', ['log', f'Trainer {t_id} is now poisoned.']))
-            elif status == PkmStatus.BURNED and pkm.type != PkmType.FIRE and pkm.status != PkmStatus.BURNED:
-                pkm.status = PkmStatus.BURNED
-                if self.__engine.debug:
-                    self.__engine.log += f'STATUS: {str(pkm)} was burned\n'
-                    self.__engine.commands.append(('event', ['log', f'Trainer {t_id} is now burned.']))
-            elif status == PkmStatus.SLEEP and pkm.status != PkmStatus.SLEEP:
-                pkm.status = PkmStatus.SLEEP
-                pkm.n_turns_asleep = 0
-                if self.__engine.debug:
-                    self.__engine.log += f'STATUS: {str(pkm)} is now asleep\n'
-                    self.__engine.commands.append(('event', ['log', f'Trainer {t_id} is now asleep.']))
-            elif status == PkmStatus.FROZEN and pkm.type != PkmType.ICE and pkm.status != PkmStatus.FROZEN:
-                pkm.status = PkmStatus.FROZEN
-                if self.__engine.debug:
-                    self.__engine.log += f'STATUS: {str(pkm)} was frozen\n'
-                    self.__engine.commands.append(('event', ['log', f'Trainer {t_id} is now frozen.']))
+            if _status_applies(status, pkm.type, pkm.status):
+                pkm.status = status
+                if status == PkmStatus.SLEEP:
+                    pkm.n_turns_asleep = 0
+                if self.__engine.events is not None:
+                    self.__engine.events.emit(BattleEvent.STATUS, t_id, pkm, pkm.hp, status)
             elif not team.confused:
                 team.confused = True
-                if self.__engine.debug:
-                    self.__engine.log += f'STATUS: {str(pkm)} is now confused\n'
-                    self.__engine.commands.append(('event', ['log', f'Trainer {t_id} is now confused.']))
+                if self.__engine.events is not None:
+                    self.__engine.events.emit(BattleEvent.CONFUSED, t_id, pkm, pkm.hp)
 
         def set_stage(self, stat: PkmStat = PkmStat.ATTACK, delta_stage: int = 1, t_id: int = 1):
             if delta_stage != 0:
@@ -451,19 +952,17 @@ class PkmBattleEnv(Env, GameState):
                         team.stage[stat] = MIN_STAGE
                     elif team.stage[stat] > MAX_STAGE:
                         team.stage[stat] = MAX_STAGE
-                    if self.__engine.debug:
-                        self.__engine.log += 'STAGE: %s %s %s\n' % (
-                            str(team.active), stat.name, 'increased' if delta_stage > 0 else 'decreased')
-                        self.__engine.commands.append(('event', [stat.name, t_id, team.stage[stat]]))
+                    if self.__engine.events is not None:
+                        self.__engine.events.emit(BattleEvent.STAGE, t_id, team.active, team.active.hp, stat,
+                                                  delta_stage, team.stage[stat])
 
         def set_entry_hazard(self, hazard: PkmEntryHazard = PkmEntryHazard.SPIKES, t_id: int = 1):
             team = self.__engine.teams[t_id]
             team.entry_hazard[hazard] += 1
             if team.entry_hazard[hazard] >= N_HAZARD_STAGES:
                 team.entry_hazard[hazard] = N_HAZARD_STAGES - 1
-            elif self.__engine.debug:
-                self.__engine.log += f'ENTRY HAZARD: Trainer {t_id} gets spikes\n'
-                self.__engine.commands.append(('event', ['log', f'Trainer {t_id} gets spikes.']))
+            elif self.__engine.events is not None:
+                self.__engine.events.emit(BattleEvent.ENTRY_HAZARD, t_id)
 
         @property
         def recover(self):
@@ -486,12 +985,13 @@ class PkmBattleEnv(Env, GameState):
     def __create_pkm_move_view(self):
         return PkmBattleEnv.PkmMoveView(self)
 
-    def __get_attack_dmg_rcvr(self, t_id: int, m_id: int) -> Tuple[float, float]:
+    def __get_attack_dmg_rcvr(self, t_id: int, m_id: int, u: List[float]) -> Tuple[float, float]:
         """
         Get damage and recover done by an attack m_id of active pkm of trainer t_id
 
         :param t_id: trainer of the active pkm
         :param m_id: move of the active pkm
+        :param u: turn random vector
         :return: damage, recover
         """
 
@@ -504,55 +1004,40 @@ class PkmBattleEnv(Env, GameState):
         else:
             move = Struggle
 
-        if move.acc <= random.random():
-            if self.debug:
-                self.log += 'MOVE FAILS: Trainer %s with %s fails %s\n' % (t_id, str(pkm), str(move))
-                self.commands.append(('event', ['log', f'Trainer {t_id} active fails its move.']))
+        if move.acc <= u[COL_ACCURACY + t_id]:
+            if self.events is not None:
+                self.events.emit(BattleEvent.MOVE_FAILS, t_id, pkm, pkm.hp, move)
             return 0., 0.
 
         opp = not t_id
         opp_team = self.teams[opp]
         opp_pkm = opp_team.active
 
-        if self.debug:
-            self.log += 'MOVE: Trainer %s with %s uses %s\n' % (t_id, str(pkm), str(move))
-            self.commands.append(('attack', [t_id, move.type.value, move.power > 0.]))
+        if self.events is not None:
+            self.events.emit(BattleEvent.MOVE, t_id, pkm, pkm.hp, move)
 
         # set recover
         recover = self.__get_recover()
 
         # calculate damage
-        fixed_damage = self.__get_fixed_damage()
-        if fixed_damage > 0. and TYPE_CHART_MULTIPLIER[move.type][opp_pkm.type] > 0.:
-            damage = fixed_damage
-        else:
-            stab = 1.5 if move.type == pkm.type else 1.
-            if (move.type == PkmType.WATER and self.weather.condition == WeatherCondition.RAIN) or (
-                    move.type == PkmType.FIRE and self.weather.condition == WeatherCondition.SUNNY):
-                weather = 1.5
-            elif (move.type == PkmType.WATER and self.weather.condition == WeatherCondition.SUNNY) or (
-                    move.type == PkmType.FIRE and self.weather.condition == WeatherCondition.RAIN):
-                weather = .5
-            else:
-                weather = 1.
-            stage_level = team.stage[PkmStat.ATTACK] - opp_team.stage[PkmStat.DEFENSE]
-            stage = (stage_level + 2.) / 2 if stage_level >= 0. else 2. / (np.abs(stage_level) + 2.)
-            multiplier = TYPE_CHART_MULTIPLIER[move.type][opp_pkm.type] if move != Struggle else 1.0
-            damage = multiplier * stab * weather * stage * move.power
+        stage_level = team.stage[PkmStat.ATTACK] - opp_team.stage[PkmStat.DEFENSE]
+        damage = attack_damage(move, pkm.type, opp_pkm.type, stage_level, self.weather.condition,
+                               self.__get_fixed_damage())
 
         # effects are only applied after damage calculation
         self.move_view._team = [team, opp_team]
         self.move_view._active = [pkm, opp_pkm]
-        move.effect(self.move_view)
+        move.effect(self.move_view, u[COL_EFFECT + t_id])
 
         return round(damage), round(recover)
 
-    def __perform_pkm_attack(self, t_id: int, m_id: int) -> Tuple[float, float]:
+    def __perform_pkm_attack(self, t_id: int, m_id: int, u: List[float]) -> Tuple[float, float]:
         """
         Perform a pkm attack
 
         :param t_id: trainer
         :param m_id: move
+        :param u: turn random vector
         :return: reward, recover
         """
         damage, recover = 0., 0.
@@ -565,48 +1050,46 @@ class PkmBattleEnv(Env, GameState):
             before_opp_hp = opp_pkm.hp
 
             # get damage and recover values from attack
-            damage_2_deal, health_2_recover = self.__get_attack_dmg_rcvr(t_id, m_id)
+            damage_2_deal, health_2_recover = self.__get_attack_dmg_rcvr(t_id, m_id, u)
 
             # perform recover
             pkm.hp += health_2_recover
             pkm.hp = MAX_HIT_POINTS if pkm.hp > MAX_HIT_POINTS else pkm.hp
             recover = pkm.hp - before_hp
-            if self.debug and recover > 0.:
-                self.log += f'RECOVER: recovers {recover}\n'
-                self.commands.append(('event', ['log', f'Trainer {t_id} active recovers.']))
-                self.commands.append(('event', ['hp', t_id, pkm.hp]))
-            elif self.debug and recover < 0.:
-                self.log += f'RECOIL DAMAGE: gets {-recover} recoil damage\n'
-                self.commands.append(('event', ['log', f'Trainer {t_id} active takes recoil damage.']))
-                self.commands.append(('event', ['hp', t_id, pkm.hp]))
+            if self.events is not None and recover > 0.:
+                self.events.emit(BattleEvent.RECOVER, t_id, recover, pkm.hp)
+            elif self.events is not None and recover < 0.:
+                self.events.emit(BattleEvent.RECOIL, t_id, -recover, pkm.hp)
 
             # perform damage
             opp_pkm.hp -= damage_2_deal
             opp_pkm.hp = 0. if opp_pkm.hp < 0. else opp_pkm.hp
             damage = before_opp_hp - opp_pkm.hp
-            if self.debug and damage > 0.:
-                self.log += 'DAMAGE: deals %s damage, hp reduces from %s to %s for %s\n' % (
-                    damage, before_opp_hp, opp_pkm.hp, str(opp_pkm))
-                self.commands.append(('event', ['log', f'Trainer {1 if opponent else 0} active takes damage.']))
-                self.commands.append(('event', ['hp', 1 if opponent else 0, opp_pkm.hp]))
+            if self.events is not None and damage > 0.:
+                self.events.emit(BattleEvent.DAMAGE, 1 if opponent else 0, opp_pkm, damage, before_opp_hp, opp_pkm.hp)
 
         return damage, recover
 
-    def __get_pre_combat_damage(self, t_id: int) -> float:
+    def __get_pre_combat_damage(self, t_id: int, u: List[float]) -> float:
         """
         Check if trainer t_id active pkm is confused this turn and cannot move and take damage.
 
         :param t_id: trainer
+        :param u: turn random vector
         :return: 0. if not confused or damage to take if confused
         """
-        return STATE_DAMAGE if self.teams[t_id].confused and random.uniform(0, 1) <= 0.33 else 0.
+        return STATE_DAMAGE if self.teams[t_id].confused and u[COL_CONFUSION_DAMAGE + t_id] <= CONFUSION_DAMAGE_CHANCE \
+            else 0.
 
-    def __switch_fainted_pkm(self) -> Tuple[float, float]:
+    def __switch_fainted_pkm(self, u: List[float], iteration: int = 0) -> Tuple[float, float]:
         """
         Recursive damage dealt to fainted switched pkm, while faiting for entry hazard.
 
+        :param u: turn random vector
+        :param iteration: recursion depth
         :return: damage to pkm 0, damage to pkm 1
         """
+        col = COL_FAINTED_SWITCH + 2 * min(iteration, MAX_FAINTED_SWITCH_ITERATIONS - 1)
         damage0, damage1 = 0., 0.
         self.switched = [False, False]
         team0 = self.teams[0]
@@ -614,34 +1097,417 @@ class PkmBattleEnv(Env, GameState):
         pkm0 = self.teams[0].active
         pkm1 = self.teams[1].active
         if pkm0.fainted():
-            if self.debug:
-                self.log += 'FAINTED: %s\n' % (str(pkm0))
-                self.commands.append(('event', ['log', f'Trainer 0 active fainted.']))
-            new_active, _, pos = team0.switch(-1)
+            if self.events is not None:
+                self.events.emit(BattleEvent.FAINTED, 0, pkm0)
+            new_active, _, pos = team0.switch(-1, u[col])
             self.switched[0] = True
-            if self.debug:
-                if pos != -1:
-                    self.commands.append(('switch', [0, pos, new_active.hp,
-                                                     new_active.moves[0].power,
-                                                     new_active.moves[1].power,
-                                                     new_active.moves[2].power,
-                                                     new_active.moves[3].power]))
+            if self.events is not None and pos != -1:
+                self.events.emit(BattleEvent.FAINTED_SWITCH, 0, pos, new_active, new_active.hp)
             damage0 = self.__get_entry_hazard_damage(0)
         if pkm1.fainted():
-            if self.debug:
-                self.log += 'FAINTED: %s\n' % (str(pkm1))
-                self.commands.append(('event', ['log', f'Trainer 1 active fainted.']))
-            new_active, _, pos = team1.switch(-1)
+            if self.events is not None:
+                self.events.emit(BattleEvent.FAINTED, 1, pkm1)
+            new_active, _, pos = team1.switch(-1, u[col + 1])
             self.switched[1] = True
-            if self.debug:
-                if pos != -1:
-                    self.commands.append(('switch', [1, pos, new_active.hp]))
+            if self.events is not None and pos != -1:
+                self.events.emit(BattleEvent.FAINTED_SWITCH, 1, pos, new_active, new_active.hp)
             damage1 = self.__get_entry_hazard_damage(1)
+        self.__touch_actives()
         d0, d1 = 0., 0.
         if (pkm0.fainted() or pkm1.fainted()) and (not team0.fainted() and not team1.fainted()):
-            d0, d1 = self.__switch_fainted_pkm()
+            d0, d1 = self.__switch_fainted_pkm(u, iteration + 1)
         return damage0 + d0, damage1 + d1
 
     def close(self):
         if self.conn is not None:
             self.conn.close()
+
+
+class _ExpectedTurn(GameState):
+    """
+    Mean turn of PkmBattleEnv.expected_step. The turn is resolved once on a copy of the game state, keeping for each
+    active pkm the probability of each of its hit points, statuses and attack and defense stage changes of the turn,
+    instead of enumerating the random vectors like PkmBattleEnv.outcomes. The two attack orders of a speed tie are
+    resolved one after the other and mixed.
+    """
+
+    def __init__(self, state: GameState, switched: List[bool], fixed_damage: float, recover: float):
+        """
+        :param state: game state to start from, left unchanged
+        :param switched: if each active pkm was switched in and takes entry hazard damage
+        :param fixed_damage: pending fixed damage of the next attack that hits
+        :param recover: pending recover of the next attack that hits
+        """
+        super().__init__((state.teams[0].clone(), state.teams[1].clone()), state.weather.clone())
+        self.events = None
+        self.move_view = PkmBattleEnv.PkmMoveView(self)
+        self.switched = list(switched)
+        self.pkms = self.teams[0].get_pkm_list() + self.teams[1].get_pkm_list()
+        # mixture of the move view recover and fixed damage, (probability, recover, fixed damage) entries
+        self.pending = [(1., recover, fixed_damage)] if recover != 0. or fixed_damage != 0. else []
+        # hit points: probability of the active pkm
+        self.hp = [{}, {}]
+        self.p_confusion_damage = [0., 0.]
+        # probability of each status of the active pkm, with sleep and freeze only when they last this turn
+        self.p_status = [{}, {}]
+        # stat: (probability, stage change) of the stage changes of the turn that did not happen or are not applied
+        self.p_stage = [{}, {}]
+
+    def run(self, actions) -> Tuple[GameState, List[float], float]:
+        """
+        :param actions: players actions
+        :return: expected game state, expected rewards and probability that the battle ends
+        """
+        self.__process_switch_pkms(actions)
+        r = self.__resolve_pre_battle()
+
+        speed0 = _attack_speed(self.teams[0], actions[0])
+        speed1 = _attack_speed(self.teams[1], actions[1])
+        p_order = 1. if speed0 > speed1 else 0. if speed1 > speed0 else ORDER_CHANCE
+        if p_order == 1. or p_order == 0.:
+            r_battle = self.__resolve_battle(actions, (0, 1) if p_order == 1. else (1, 0))
+            p_fainted = [self.__p_fainted(0), self.__p_fainted(1)]
+            for team, hp in zip(self.teams, self.hp):
+                team.active.hp = sum(h * p for h, p in hp.items())
+        else:
+            # mix the attack orders, the rest of the state follows player 0 attacking first
+            snapshot = self.__battle_snapshot(), [hp.copy() for hp in self.hp], self.pending.copy(), \
+                [p_status.copy() for p_status in self.p_status], [p_stage.copy() for p_stage in self.p_stage]
+            r_battle = [0., 0.]
+            p_fainted = [0., 0.]
+            hp = [0., 0.]
+            for order, p in (((1, 0), 1. - p_order), ((0, 1), p_order)):
+                state, hp_dist, self.pending, p_status, p_stage = snapshot
+                self.__battle_restore(state)
+                self.hp = [hp.copy() for hp in hp_dist]
+                self.p_status = [p.copy() for p in p_status]
+                self.p_stage = [p.copy() for p in p_stage]
+                r_order = self.__resolve_battle(actions, order)
+                for i in range(2):
+                    r_battle[i] += p * r_order[i]
+                    p_fainted[i] += p * self.__p_fainted(i)
+                    hp[i] += p * sum(h * p_h for h, p_h in self.hp[i].items())
+            for team, team_hp in zip(self.teams, hp):
+                team.active.hp = team_hp
+        r[0] += r_battle[0]
+        r[1] += r_battle[1]
+
+        _advance_weather(self.weather)
+
+        # switch fainted pkm, the engine rewards the damage to team 0 as damage to the first trainer to attack
+        damage0, p_end0 = self.__switch_fainted_pkm(0, p_fainted[0])
+        damage1, p_end1 = self.__switch_fainted_pkm(1, p_fainted[1])
+        sign = 2. * p_order - 1.
+        r[0] += sign * (damage1 - damage0) / MAX_HIT_POINTS
+        r[1] += sign * (damage0 - damage1) / MAX_HIT_POINTS
+
+        # check if battle ended, one team is usually fainted by the attack of the other
+        r[0] += p_end0
+        r[1] += p_end1
+
+        return GameState(self.teams, self.weather), r, min(1., p_end0 + p_end1)
+
+    def __battle_snapshot(self) -> Tuple:
+        """
+        Get the state the attacks can change, the active pkm, stages, confusion, entry hazards and weather.
+
+        :return: snapshot
+        """
+        return tuple((team.active.snapshot(), tuple(team.stage), team.confused, team.n_turns_confused,
+                      tuple(team.entry_hazard)) for team in self.teams), self.weather.condition, \
+            self.weather.n_turns_no_clear
+
+    def __battle_restore(self, snapshot: Tuple):
+        """
+        Restore the state the attacks can change.
+
+        :param snapshot: snapshot from __battle_snapshot
+        """
+        teams, self.weather.condition, self.weather.n_turns_no_clear = snapshot
+        for team, (pkm, stage, team.confused, team.n_turns_confused, entry_hazard) in zip(self.teams, teams):
+            team.active.restore(pkm)
+            team.stage = list(stage)
+            team.entry_hazard = list(entry_hazard)
+
+    def __p_fainted(self, t_id: int) -> float:
+        """
+        :param t_id: trainer
+        :return: probability that the active pkm of a trainer is fainted
+        """
+        return self.hp[t_id].get(0., 0.)
+
+    def __damage(self, t_id: int, outcomes: List[Tuple[float, float]]) -> float:
+        """
+        Deal damage to the active pkm of a trainer if it is not fainted.
+
+        :param t_id: trainer
+        :param outcomes: exclusive (probability, damage) outcomes, no damage otherwise
+        :return: expected damage dealt
+        """
+        return self.__change_hp(t_id, [(p, -damage) for p, damage in outcomes if p > 0.], True)
+
+    def __recover(self, t_id: int, outcomes: List[Tuple[float, float]]) -> float:
+        """
+        Recover the active pkm of a trainer if it is not fainted, a negative recover is a recoil.
+
+        :param t_id: trainer
+        :param outcomes: exclusive (probability, recover) outcomes, no recover otherwise
+        :return: expected hit points recovered
+        """
+        return self.__change_hp(t_id, [(p, recover) for p, recover in outcomes if p > 0. and recover != 0.], False)
+
+    def __change_hp(self, t_id: int, outcomes: List[Tuple[float, float]], damage: bool) -> float:
+        """
+        Change the hit points of the active pkm of a trainer if it is not fainted. As in the engine, hit points after
+        a damage are at least zero and after a recover at most the maximum, so a recoil can leave negative hit points
+        that are only fainted at the next damage.
+
+        :param t_id: trainer
+        :param outcomes: exclusive (probability, hit points change) outcomes
+        :param damage: if the changes are damage
+        :return: expected hit points change
+        """
+        if not outcomes:
+            return 0.
+        p_none = 1. - sum(p for p, _ in outcomes)
+        hp = {}
+        change = 0.
+        for h, p_h in self.hp[t_id].items():
+            if h == 0.:
+                hp[h] = hp.get(h, 0.) + p_h
+                continue
+            for p, delta in outcomes:
+                new_h = max(h + delta, 0.) if damage else min(h + delta, MAX_HIT_POINTS)
+                change += p_h * p * (new_h - h)
+                hp[new_h] = hp.get(new_h, 0.) + p_h * p
+            if p_none > 0.:
+                hp[h] = hp.get(h, 0.) + p_h * p_none
+        self.hp[t_id] = hp
+        return change
+
+    def __p_acts(self, t_id: int) -> float:
+        """
+        :param t_id: trainer
+        :return: probability that the active pkm of a trainer is not blocked by confusion damage or its status
+        """
+        p_status = self.p_status[t_id]
+        p_blocked = p_status.get(PkmStatus.SLEEP, 0.) + p_status.get(PkmStatus.FROZEN, 0.) + \
+            PARALYSIS_CHANCE * p_status.get(PkmStatus.PARALYZED, 0.)
+        return (1. - self.p_confusion_damage[t_id]) * (1. - p_blocked)
+
+    def __process_switch_pkms(self, actions):
+        """
+        Switch pkm if players chosen to do so, as PkmBattleEnv.__process_switch_pkms.
+
+        :param actions: players actions
+        """
+        for i, team in enumerate(self.teams):
+            pos = actions[i] - DEFAULT_PKM_N_MOVES
+            if 0 <= pos < (team.size() - 1) and not team.party[pos].fainted():
+                team.switch(pos)
+                self.switched[i] = True
+
+    def __resolve_pre_battle(self) -> List[float]:
+        """
+        Entry hazard damage, pre battle effects and the chance of confusion damage.
+
+        :return: expected rewards
+        """
+        r = [0., 0.]
+        for i, team in enumerate(self.teams):
+            self.hp[i] = {team.active.hp: 1.}
+            spikes = spikes_damage(team.entry_hazard[PkmEntryHazard.SPIKES], team.active.type)
+            if spikes and self.switched[i]:
+                damage = -self.__damage(i, [(1., spikes)])
+                self.switched[i] = False
+                r[i] -= damage / MAX_HIT_POINTS
+                r[not i] += damage / MAX_HIT_POINTS
+
+        p_active_not_fainted = (1. - self.__p_fainted(0)) * (1. - self.__p_fainted(1))
+
+        for i, team in enumerate(self.teams):
+            pkm = team.active
+            if team.confused:
+                team.n_turns_confused += 1
+                p_end = 1. if team.n_turns_confused == MAX_TURNS_CONFUSED else CONFUSION_END_CHANCE
+                if p_end > .5:
+                    team.confused = False
+                    team.n_turns_confused = 0
+                self.p_confusion_damage[i] = (1. - p_end) * CONFUSION_DAMAGE_CHANCE
+                # confusion damage only changes the rewards
+                damage = p_active_not_fainted * self.p_confusion_damage[i] * STATE_DAMAGE
+                r[i] -= damage / MAX_HIT_POINTS
+                r[not i] += damage / MAX_HIT_POINTS
+            p_end = 0.
+            if pkm.asleep():
+                pkm.n_turns_asleep += 1
+                p_end = 1. if pkm.n_turns_asleep == MAX_TURNS_ASLEEP else ASLEEP_END_CHANCE
+            elif pkm.frozen():
+                p_end = FROZEN_END_CHANCE
+            self.p_status[i] = {pkm.status: 1. - p_end, PkmStatus.NONE: p_end} if p_end > 0. else {pkm.status: 1.}
+            if p_end > .5:
+                pkm.status = PkmStatus.NONE
+                pkm.n_turns_asleep = 0
+        return r
+
+    def __resolve_battle(self, actions, order: Tuple[int, int]) -> List[float]:
+        """
+        Attacks and post battle damage in an attack order, as PkmBattleEnv.__resolve_battle.
+
+        :param actions: players actions
+        :param order: first and second trainer to attack
+        :return: expected rewards
+        """
+        r = [0., 0.]
+        dmg = [0., 0.]
+        hp = [0., 0.]
+        # probability that each pkm can attack if it is not fainted
+        p_can = [0., 0.]
+        for t_id in order:
+            p_acts = self.__p_acts(t_id)
+            p_can[t_id] = (1. - self.__p_fainted(not t_id)) * p_acts
+            dmg[not t_id], hp[t_id] = self.__perform_pkm_attack(t_id, actions[t_id], p_acts)
+        for i in range(2):
+            r[i] += (dmg[not i] + hp[i] - dmg[i]) / MAX_HIT_POINTS + self.__p_fainted(not i)
+
+        # post battle damage applies if the pkm could attack, the status damage replaces the weather damage in the
+        # rewards
+        dmg = [0., 0.]
+        for t_id in order:
+            pkm = self.teams[t_id].active
+            p_status_damage = sum(p for status, p in self.p_status[t_id].items() if status_damage(status) > 0.)
+            weather = -self.__damage(t_id, [(p_can[t_id], weather_damage(pkm.type, self.weather.condition))])
+            dmg[t_id] = (1. - p_status_damage) * weather - \
+                self.__damage(t_id, [(p_can[t_id] * p_status_damage, STATE_DAMAGE)])
+        for i in range(2):
+            r[i] += (dmg[not i] - dmg[i]) / MAX_HIT_POINTS
+        return r
+
+    def __perform_pkm_attack(self, t_id: int, m_id: int, p_acts: float) -> Tuple[float, float]:
+        """
+        Expected attack of the active pkm of a trainer.
+
+        :param t_id: trainer
+        :param m_id: move
+        :param p_acts: probability that the pkm is not blocked by confusion damage or its status
+        :return: expected damage, expected recover
+        """
+        if m_id >= DEFAULT_PKM_N_MOVES or p_acts <= 0.:
+            return 0., 0.
+        opp = not t_id
+        team = self.teams[t_id]
+        pkm = team.active
+        opp_team = self.teams[opp]
+        opp_pkm = opp_team.active
+        move = pkm.moves[m_id]
+        p_alive = 1. - self.__p_fainted(t_id)
+        p_opp_alive = 1. - self.__p_fainted(opp)
+        if move.pp > 0:
+            if p_alive * p_opp_alive * p_acts > .5:
+                move.pp -= 1
+        else:
+            move = Struggle
+        p_hit = p_acts * min(max(move.acc, 0.), 1.)
+        if p_hit <= 0. or p_alive <= 0. or p_opp_alive <= 0.:
+            return 0., 0.
+
+        stage_level = team.stage[PkmStat.ATTACK] - opp_team.stage[PkmStat.DEFENSE]
+        p_attack, attack_change = self.p_stage[t_id].get(PkmStat.ATTACK, (0., 0))
+        p_defense, defense_change = self.p_stage[opp].get(PkmStat.DEFENSE, (0., 0))
+        p_none = 1. - sum(p for p, _, _ in self.pending)
+        damage_outcomes, recover_outcomes = [], []
+        for p_pending, pending_recover, pending_damage in self.pending + [(p_none, 0., 0.)]:
+            # each pkm not fainted is changed if the other is not fainted either
+            recover_outcomes.append((p_opp_alive * p_hit * p_pending, round(pending_recover)))
+            for p_level, level in (((1. - p_attack) * (1. - p_defense), stage_level),
+                                   (p_attack * (1. - p_defense), stage_level + attack_change),
+                                   ((1. - p_attack) * p_defense, stage_level - defense_change),
+                                   (p_attack * p_defense, stage_level + attack_change - defense_change)):
+                if p_level > 0.:
+                    damage_outcomes.append((p_alive * p_hit * p_pending * p_level, round(
+                        attack_damage(move, pkm.type, opp_pkm.type, level, self.weather.condition, pending_damage))))
+        recover = self.__recover(t_id, recover_outcomes)
+        damage = -self.__damage(opp, damage_outcomes)
+
+        # an attack that hits consumes the pending recover and fixed damage, and its effect sets them
+        p_hit *= p_alive * p_opp_alive
+        self.pending = [(p * (1. - p_hit), pending_recover, pending_damage)
+                        for p, pending_recover, pending_damage in self.pending]
+        p_effect = p_hit * move.prob
+        if p_effect > 0.:
+            self.__add_effect_chances(move, t_id if move.target == 0 else opp, p_effect)
+        if p_effect > .5:
+            self.move_view._team = [team, opp_team]
+            self.move_view._active = [pkm, opp_pkm]
+            move.effect(self.move_view, 0.)
+            self.move_view._damage = 0.
+            self.move_view._recover = 0.
+        elif p_hit > .5:
+            move.reveal()
+        return damage, recover
+
+    def __add_effect_chances(self, move: PkmMove, target: int, p_effect: float):
+        """
+        Add the chances of the recover, fixed damage, status and stage change of a move effect, before the effect is
+        applied if more likely than not.
+
+        :param move: move
+        :param target: trainer of the target pkm
+        :param p_effect: probability of the effect
+        """
+        if move.recover != 0. or move.fixed_damage != 0.:
+            self.pending.append((p_effect, move.recover, move.fixed_damage))
+        if move.status != PkmStatus.NONE:
+            pkm_type = self.teams[target].active.type
+            p_status = {}
+            for status, p in self.p_status[target].items():
+                if _status_applies(move.status, pkm_type, status):
+                    p_status[move.status] = p_status.get(move.status, 0.) + p * p_effect
+                    p *= 1. - p_effect
+                p_status[status] = p_status.get(status, 0.) + p
+            self.p_status[target] = p_status
+        if move.stage != 0 and (move.stat == PkmStat.ATTACK or move.stat == PkmStat.DEFENSE):
+            stage = self.teams[target].stage[move.stat]
+            if MIN_STAGE < stage < MAX_STAGE:
+                change = min(max(stage + move.stage, MIN_STAGE), MAX_STAGE) - stage
+                # a stage change more likely than not is applied, then the chance is of the stage before it
+                self.p_stage[target][move.stat] = (p_effect, change) if p_effect <= .5 else (1. - p_effect, -change)
+
+    def __switch_fainted_pkm(self, t_id: int, p_fainted: float) -> Tuple[float, float]:
+        """
+        Expected entry hazard damage of the pkm that replaces a fainted active pkm, picked uniformly from the not
+        fainted party. The replacement is switched in if the active pkm is more likely fainted than not.
+
+        :param t_id: trainer
+        :param p_fainted: probability that the active pkm is fainted
+        :return: expected damage, probability that the whole team is fainted
+        """
+        team = self.teams[t_id]
+        not_fainted = team.get_not_fainted()
+        if p_fainted <= 0.:
+            return 0., 0.
+        if not not_fainted:
+            return 0., p_fainted
+        damage = 0.
+        spikes = team.entry_hazard[PkmEntryHazard.SPIKES]
+        for pos in not_fainted:
+            pkm = team.party[pos]
+            dealt = min(spikes_damage(spikes, pkm.type), pkm.hp) * p_fainted / len(not_fainted)
+            pkm.hp -= dealt
+            damage += dealt
+        if p_fainted > .5:
+            team.switch(-1, 0.)
+        return damage, 0.
+
+
+def expected_step(state: GameState, actions) -> Tuple[GameState, List[float], float]:
+    """
+    Apply the mean result of a turn to a game state, see PkmBattleEnv.expected_step. The state is left unchanged.
+
+    :param state: game state or battle env
+    :param actions: players actions, an action of DEFAULT_N_ACTIONS or more is a pass
+    :return: expected game state, expected rewards and probability that the battle ends
+    """
+    if isinstance(state, PkmBattleEnv):
+        return state.expected_step(actions)
+    return _ExpectedTurn(state, [False, False], 0., 0.).run(actions)
@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from vgc.datatypes.Objects import PkmTeam
+from vgc.engine.PkmBattleEnv import PkmBattleEnv
+
+# idle envs kept for each configuration, extra released envs are dropped
+DEFAULT_ENV_POOL_SIZE = 8
+
+
+class PkmBattleEnvPool:
+
+    def __init__(self, max_size: int = DEFAULT_ENV_POOL_SIZE):
+        """
+        Pool of idle battle envs, so battles reuse an env with PkmBattleEnv.reset instead of constructing a new one.
+        Envs are pooled by configuration and the pool can be shared between threads, each env is only handed to one
+        user at a time.
+
+        :param max_size: maximum number of idle envs kept for each configuration
+        """
+        self.max_size = max_size
+        self.__idle: Dict[Tuple[bool, Tuple[bool, bool]], List[PkmBattleEnv]] = {}
+        self.__lock = Lock()
+
+    def acquire(self, debug: bool = False, encode: Tuple[bool, bool] = (True, True)) -> PkmBattleEnv:
+        """
+        Get an idle env, or a new one if there is none. The caller starts each battle with
+        env.reset(teams=..., predictions=...).
+
+        :param debug: keep a battle log
+        :param encode: players that get encoded observations
+        :return: battle env
+        """
+        key = (debug, tuple(encode))
+        with self.__lock:
+            idle = self.__idle.get(key)
+            if idle:
+                return idle.pop()
+        return PkmBattleEnv((PkmTeam(), PkmTeam()), debug=debug, encode=key[1])
+
+    def release(self, env: PkmBattleEnv):
+        """
+        Return an env to the pool. The env must not be used afterwards.
+
+        :param env: env obtained from acquire
+        """
+        key = (env.debug, tuple(env.requires_encode))
+        with self.__lock:
+            idle = self.__idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append(env)
+
+    @contextmanager
+    def env(self, debug: bool = False, encode: Tuple[bool, bool] = (True, True)):
+        """
+        Acquire an env for the duration of a with block and release it afterwards.
+        """
+        env = self.acquire(debug, encode)
+        try:
+            yield env
+        finally:
+            self.release(env)
+
+
+# pool shared by the competition and team build modules
+env_pool = PkmBattleEnvPool()
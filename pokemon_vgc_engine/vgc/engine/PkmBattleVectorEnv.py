@@ -0,0 +1,249 @@
+import multiprocessing as mp
+import random
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, List, Dict, Tuple
+
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from vgc.behaviour import BattlePolicy
+from vgc.behaviour.BattlePolicies import RandomPlayer
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, DEFAULT_TEAM_SIZE
+from vgc.datatypes.Types import N_HAZARD_STAGES
+from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.engine.RandomStream import RandomStream
+from vgc.util.Encoding import GAME_STATE_ENCODE_LEN
+from vgc.util.generator.PkmTeamGenerators import PkmTeamGenerator, RandomTeamGenerator
+
+try:
+    from gymnasium.vector import AutoresetMode
+except ImportError:  # gymnasium < 1.0 always resets in the same step
+    AutoresetMode = None
+
+# name, shape of one battle and dtype of the arrays shared between the vector env and its workers
+SHARED_ARRAYS = (('observations', (GAME_STATE_ENCODE_LEN,), np.float32),
+                 ('action_masks', (DEFAULT_N_ACTIONS,), np.bool_),
+                 ('rewards', (), np.float64),
+                 ('terminations', (), np.bool_),
+                 ('actions', (), np.int64),
+                 ('final_observations', (GAME_STATE_ENCODE_LEN,), np.float32),
+                 ('final_action_masks', (DEFAULT_N_ACTIONS,), np.bool_))
+
+
+def _attach(shms: Dict[str, SharedMemory], n_envs: int) -> Dict[str, np.ndarray]:
+    return {name: np.ndarray((n_envs,) + shape, dtype, buffer=shms[name].buf) for name, shape, dtype in SHARED_ARRAYS}
+
+
+class _BattleWorker:
+    """
+    Runs a slice of the battles of the vector env. Player 0 is controlled by the vector env actions and player 1 by
+    the opponent policy. Terminated battles restart with new teams in the same step, their last observation and action
+    mask are kept in the final arrays.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], start: int, stop: int, team_generator: PkmTeamGenerator,
+                 opponent: BattlePolicy, team_size: int):
+        self.arrays = {name: array[start:stop] for name, array in arrays.items()}
+        self.team_generator = team_generator
+        self.opponent = opponent
+        self.team_size = team_size
+        self.rng = RandomStream()
+        self.envs: List[Optional[PkmBattleEnv]] = [None] * (stop - start)
+        self.opponent_states: List = [None] * (stop - start)
+
+    def reset(self, seed: Optional[int]):
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+            self.rng.seed(seed)
+        for i in range(len(self.envs)):
+            self.__new_battle(i)
+
+    def step(self):
+        arrays = self.arrays
+        for i, env in enumerate(self.envs):
+            try:
+                opponent_action = self.opponent.get_action(self.opponent_states[i])
+            except Exception:
+                opponent_action = random.randrange(DEFAULT_N_ACTIONS)
+            (s0, self.opponent_states[i]), r, terminated, _, _ = env.step([int(arrays['actions'][i]), opponent_action])
+            arrays['rewards'][i] = r[0]
+            arrays['terminations'][i] = terminated
+            if terminated:
+                arrays['final_observations'][i] = s0
+                arrays['final_action_masks'][i] = env.action_mask(0)
+                self.__new_battle(i)
+            else:
+                arrays['observations'][i] = s0
+                arrays['action_masks'][i] = env.action_mask(0)
+
+    def close(self):
+        self.opponent.close()
+
+    def __new_battle(self, i: int):
+        teams = []
+        for _ in range(2):
+            team = self.team_generator.get_team()
+            teams.append(team.get_battle_team(random.sample(range(len(team)), self.team_size)))
+        env = PkmBattleEnv((teams[0], teams[1]), encode=(True, self.opponent.requires_encode()), rng=self.rng.spawn())
+        (s0, self.opponent_states[i]), _ = env.reset()
+        self.envs[i] = env
+        self.arrays['observations'][i] = s0
+        self.arrays['action_masks'][i] = env.action_mask(0)
+
+
+def _worker_loop(conn: Connection, names: Dict[str, str], n_envs: int, start: int, stop: int,
+                 team_generator: PkmTeamGenerator, opponent: BattlePolicy, team_size: int):
+    shms = {name: SharedMemory(name=shm_name) for name, shm_name in names.items()}
+    worker = _BattleWorker(_attach(shms, n_envs), start, stop, team_generator, opponent, team_size)
+    try:
+        while True:
+            command, arg = conn.recv()
+            if command == 'step':
+                worker.step()
+            elif command == 'reset':
+                worker.reset(arg)
+            elif command == 'close':
+                break
+            conn.send(None)
+    finally:
+        worker.close()
+        del worker
+        for shm in shms.values():
+            shm.close()
+        conn.close()
+
+
+class PkmBattleVectorEnv(VectorEnv):
+    """
+    Gymnasium vector env of n_envs battles run by n_workers processes, each one stepping its share of the battles.
+    Observations, action masks, rewards and terminations are written by the workers into shared memory, only the
+    command is sent through the pipe. The agent plays player 0 of every battle against the opponent policy, and
+    terminated battles restart with new random teams in the same step, with the last observation and info of the ended
+    battles returned in the final_obs and final_info infos as gymnasium does. With n_workers=0 the battles run in
+    process.
+    """
+
+    def __init__(self, n_envs: int, n_workers: int = 1, team_generator: PkmTeamGenerator = None,
+                 opponent: BattlePolicy = None, team_size: int = DEFAULT_TEAM_SIZE, copy: bool = True,
+                 context: Optional[str] = None):
+        """
+        :param n_envs: number of battles
+        :param n_workers: number of worker processes, 0 to run the battles in this process
+        :param team_generator: generator of the teams of both players, random teams by default
+        :param opponent: battle policy of player 1, random player by default
+        :param team_size: number of pkm of each battle team
+        :param copy: return copies of the shared observations, otherwise views overwritten by the next step
+        :param context: multiprocessing start method, the platform default if None
+        """
+        self.num_envs = n_envs
+        self.single_observation_space = spaces.Box(-1., float(N_HAZARD_STAGES), (GAME_STATE_ENCODE_LEN,), np.float32)
+        self.single_action_space = spaces.Discrete(DEFAULT_N_ACTIONS)
+        self.observation_space = batch_space(self.single_observation_space, n_envs)
+        self.action_space = batch_space(self.single_action_space, n_envs)
+        self.metadata = {'autoreset_mode': AutoresetMode.SAME_STEP} if AutoresetMode is not None else {}
+        self.closed = False
+        self.copy = copy
+        team_generator = RandomTeamGenerator() if team_generator is None else team_generator
+        opponent = RandomPlayer() if opponent is None else opponent
+        self.__shms = {name: SharedMemory(create=True, size=max(1, int(np.prod((n_envs,) + shape)) *
+                                                                  np.dtype(dtype).itemsize))
+                       for name, shape, dtype in SHARED_ARRAYS}
+        self.__arrays = _attach(self.__shms, n_envs)
+        self.__local_worker = None
+        self.__conns: List[Connection] = []
+        self.__processes = []
+        if n_workers == 0:
+            self.__local_worker = _BattleWorker(self.__arrays, 0, n_envs, team_generator, opponent, team_size)
+            return
+        ctx = mp.get_context(context)
+        names = {name: shm.name for name, shm in self.__shms.items()}
+        bounds = np.linspace(0, n_envs, min(n_workers, n_envs) + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            conn, worker_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker_loop, args=(worker_conn, names, n_envs, int(start), int(stop),
+                                                             team_generator, opponent, team_size), daemon=True)
+            process.start()
+            worker_conn.close()
+            self.__conns.append(conn)
+            self.__processes.append(process)
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None) -> Tuple[np.ndarray, dict]:
+        """
+        Start new battles in every slot.
+
+        :param seed: seed of the team generation and battle random streams, each worker gets seed + worker index
+        :param options: unused
+        :return: observations and infos with the action masks
+        """
+        if self.__local_worker is not None:
+            self.__local_worker.reset(seed)
+        else:
+            self.__broadcast([('reset', None if seed is None else seed + i) for i in range(len(self.__conns))])
+        return self.__observations(), {'action_mask': self.action_masks()}
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """
+        Advance one turn of every battle.
+
+        :param actions: action of player 0 of every battle
+        :return: observations, rewards, terminations, truncations and infos with the action masks, and if a battle
+            ended the final observations and infos of the ended battles with their masks
+        """
+        self.__arrays['actions'][:] = actions
+        if self.__local_worker is not None:
+            self.__local_worker.step()
+        else:
+            self.__broadcast([('step', None)] * len(self.__conns))
+        rewards = self.__arrays['rewards'].copy()
+        terminations = self.__arrays['terminations'].copy()
+        infos = {'action_mask': self.action_masks()}
+        if terminations.any():
+            final_observations = self.__arrays['final_observations']
+            final_obs = np.full(self.num_envs, None, dtype=object)
+            for i in np.flatnonzero(terminations):
+                final_obs[i] = final_observations[i].copy() if self.copy else final_observations[i]
+            final_action_masks = self.__arrays['final_action_masks'] & terminations[:, np.newaxis]
+            infos['final_obs'] = final_obs
+            infos['_final_obs'] = terminations.copy()
+            infos['final_info'] = {'action_mask': final_action_masks, '_action_mask': terminations.copy()}
+            infos['_final_info'] = terminations.copy()
+        return self.__observations(), rewards, terminations, np.zeros(self.num_envs, dtype=bool), infos
+
+    def action_masks(self) -> np.ndarray:
+        """
+        :return: legal actions of player 0 of every battle, boolean array with shape (n_envs, DEFAULT_N_ACTIONS)
+        """
+        return self.__arrays['action_masks'].copy()
+
+    def close_extras(self, **kwargs):
+        for conn in self.__conns:
+            conn.send(('close', None))
+        for process in self.__processes:
+            process.join()
+        for conn in self.__conns:
+            conn.close()
+        if self.__local_worker is not None:
+            self.__local_worker.close()
+        self.__local_worker = None
+        self.__arrays = None
+        for shm in self.__shms.values():
+            try:
+                shm.close()
+            except BufferError:
+                # observations returned without copy still map the block, it is released with them
+                pass
+            shm.unlink()
+
+    def __observations(self) -> np.ndarray:
+        observations = self.__arrays['observations']
+        return observations.copy() if self.copy else observations
+
+    def __broadcast(self, commands: List[Tuple]):
+        for conn, command in zip(self.__conns, commands):
+            conn.send(command)
+        for conn in self.__conns:
+            conn.recv()
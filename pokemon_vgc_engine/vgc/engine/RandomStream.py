@@ -0,0 +1,134 @@
+from typing import Optional, List, Tuple
+
+import numpy as np
+
+from vgc.datatypes.Constants import DEFAULT_TEAM_SIZE
+
+# Columns of the per turn random vector. Every random decision of a turn reads a fixed column, so two battles that
+# share the vector take exactly the same decisions (common random numbers), whatever happened earlier in the turn.
+COL_ORDER = 0
+COL_CONFUSION_END = 1  # + team
+COL_ASLEEP_END = 3  # + team
+COL_FROZEN_END = 5  # + team
+COL_CONFUSION_DAMAGE = 7  # + team
+COL_PARALYSIS = 9  # + team
+COL_ACCURACY = 11  # + team
+COL_EFFECT = 13  # + team
+COL_FAINTED_SWITCH = 15  # + 2 * iteration + team
+MAX_FAINTED_SWITCH_ITERATIONS = 2 * DEFAULT_TEAM_SIZE + 2
+N_RANDOM_COLUMNS = COL_FAINTED_SWITCH + 2 * MAX_FAINTED_SWITCH_ITERATIONS
+
+DEFAULT_RANDOM_BLOCK_SIZE = 64 * N_RANDOM_COLUMNS
+
+
+class RandomStream:
+    """
+    Stream of uniform random numbers in [0, 1) pre-generated by NumPy in blocks. A stream is owned by a single battle
+    and seeded independently of the global random generators, so two battles with the same seed roll the same dice.
+    The generator is only built on the first draw, creating a stream that is never used is cheap.
+    """
+
+    def __init__(self, seed: Optional[int] = None, block_size: int = DEFAULT_RANDOM_BLOCK_SIZE):
+        """
+        :param seed: stream seed, fresh entropy if None
+        :param block_size: amount of numbers generated at once
+        """
+        self.block_size = block_size
+        self.seed(seed)
+
+    def seed(self, seed: Optional[int] = None, spawn_key: Tuple[int, ...] = ()):
+        """
+        Restart the stream from a seed.
+
+        :param seed: stream seed, fresh entropy if None
+        :param spawn_key: key of a child stream, see spawn
+        """
+        self.__entropy = seed
+        self.__spawn_key = spawn_key
+        self.__n_children = 0
+        self.__rng = None
+        self.__rng_state = None
+        self.__block = []
+        self.__pos = 0
+
+    def spawn(self) -> 'RandomStream':
+        """
+        Create an independent child stream. The children of equally seeded streams are equal, so forward models and
+        copies of paired battles also share their dice.
+
+        :return: child stream
+        """
+        child = RandomStream.__new__(RandomStream)
+        child.block_size = self.block_size
+        child.seed(self.__get_entropy(), self.__spawn_key + (self.__n_children,))
+        self.__n_children += 1
+        return child
+
+    def random(self) -> float:
+        """
+        :return: next uniform random number in [0, 1)
+        """
+        if self.__pos >= len(self.__block):
+            self.__refill()
+        u = self.__block[self.__pos]
+        self.__pos += 1
+        return u
+
+    def take(self, n: int) -> List[float]:
+        """
+        Draw n numbers at once. They never straddle two blocks, the rest of a block too short is skipped.
+
+        :param n: amount of numbers, at most block_size
+        :return: list of uniform random numbers in [0, 1)
+        """
+        if self.__pos + n > len(self.__block):
+            self.__refill()
+        u = self.__block[self.__pos:self.__pos + n]
+        self.__pos += n
+        return u
+
+    def get_state(self) -> Tuple:
+        """
+        Position of the stream. Blocks are never modified, so this does not copy them.
+
+        :return: opaque state for set_state
+        """
+        return self.__get_entropy(), self.__spawn_key, self.__n_children, self.__rng_state, self.__block, self.__pos
+
+    def set_state(self, state: Tuple):
+        """
+        Move the stream back (or forward) to a state from get_state.
+
+        :param state: state from get_state
+        """
+        entropy, spawn_key, self.__n_children, rng_state, self.__block, self.__pos = state
+        if entropy != self.__entropy or spawn_key != self.__spawn_key:
+            self.__entropy = entropy
+            self.__spawn_key = spawn_key
+            self.__rng = None
+            self.__rng_state = None
+        if rng_state is not self.__rng_state:
+            if rng_state is None:
+                self.__rng = None
+            else:
+                if self.__rng is None:
+                    self.__rng = self.__create_rng()
+                self.__rng.bit_generator.state = rng_state
+            self.__rng_state = rng_state
+
+    def __get_entropy(self) -> int:
+        # unseeded streams draw their entropy late, but once observed it is fixed so the stream can be replayed
+        if self.__entropy is None:
+            self.__entropy = np.random.SeedSequence().entropy
+        return self.__entropy
+
+    def __create_rng(self) -> np.random.Generator:
+        seed_seq = np.random.SeedSequence(self.__get_entropy(), spawn_key=self.__spawn_key)
+        return np.random.Generator(np.random.PCG64(seed_seq))
+
+    def __refill(self):
+        if self.__rng is None:
+            self.__rng = self.__create_rng()
+        self.__block = self.__rng.random(self.block_size).tolist()
+        self.__rng_state = self.__rng.bit_generator.state
+        self.__pos = 0
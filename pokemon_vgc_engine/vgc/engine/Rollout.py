@@ -0,0 +1,51 @@
+from typing import Callable
+
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES
+from vgc.datatypes.Objects import GameState
+from vgc.datatypes.Types import PkmStat
+from vgc.engine.DamageCalculation import DAMAGE_MULTIPLIER_LIST, STAGE_LEVEL_OFFSET
+
+# battles still running after this many turns end without a winner
+DEFAULT_ROLLOUT_MAX_TURNS = 200
+
+# Rollout policies play on the raw battle state, from the point of view of player, without views or encodings. They
+# get one uniform random number in [0, 1) per decision and return the action.
+RolloutPolicy = Callable[[GameState, int, float], int]
+
+
+def random_move(g: GameState, player: int, u: float) -> int:
+    """
+    Use a uniformly random move of the active pkm, never switch.
+
+    :param g: battle state
+    :param player: trainer
+    :param u: uniform random number
+    :return: action
+    """
+    return int(u * DEFAULT_PKM_N_MOVES)
+
+
+def greedy_damage(g: GameState, player: int, u: float) -> int:
+    """
+    Use the move of the active pkm with highest expected damage, the damage estimated like OneTurnLookahead times
+    the move accuracy.
+
+    :param g: battle state
+    :param player: trainer
+    :param u: uniform random number
+    :return: action
+    """
+    team = g.teams[player]
+    opp_team = g.teams[not player]
+    pkm = team.active
+    multiplier = DAMAGE_MULTIPLIER_LIST
+    stage_level = team.stage[PkmStat.ATTACK] - opp_team.stage[PkmStat.DEFENSE] + STAGE_LEVEL_OFFSET
+    pkm_type = pkm.type
+    opp_type = opp_team.active.type
+    condition = g.weather.condition
+    best, best_damage = 0, -1.
+    for i, move in enumerate(pkm.moves):
+        damage = multiplier[move.type][pkm_type][opp_type][condition][stage_level] * move.power * move.acc
+        if damage > best_damage:
+            best, best_damage = i, damage
+    return best
@@ -0,0 +1,385 @@
+from vgc.datatypes.Constants import DEFAULT_PKM_N_MOVES, MAX_HIT_POINTS, STATE_DAMAGE, SPIKES_2, SPIKES_3
+from vgc.datatypes.Types import WeatherCondition, PkmEntryHazard, PkmType, PkmStatus, PkmStat, N_HAZARD_STAGES, \
+    MIN_STAGE, MAX_STAGE
+from vgc.engine.DamageCalculation import STRUGGLE_MOVE_TYPE, STAGE_LEVEL_OFFSET
+from vgc.engine.RandomStream import COL_ORDER, COL_CONFUSION_END, COL_ASLEEP_END, COL_FROZEN_END, \
+    COL_CONFUSION_DAMAGE, COL_PARALYSIS, COL_ACCURACY, COL_EFFECT, COL_FAINTED_SWITCH, MAX_FAINTED_SWITCH_ITERATIONS
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        # without numba the kernel runs as plain Python
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+# Turn resolution of BatchedPkmBattleEnv as scalar code over its packed arrays, one battle at a time. The same rules
+# as the vectorized engine, compiled by numba when installed. Columns of the packed move table, duplicated from
+# BatchedPkmBattleEnv (which imports this module) so they are compile time constants.
+_MOVE_POWER = 0
+_MOVE_ACC = 1
+_MOVE_TYPE = 3
+_MOVE_PRIORITY = 4
+_MOVE_PROB = 5
+_MOVE_TARGET = 6
+_MOVE_RECOVER = 7
+_MOVE_STATUS = 8
+_MOVE_STAT = 9
+_MOVE_STAGE = 10
+_MOVE_FIXED_DAMAGE = 11
+_MOVE_WEATHER = 12
+_MOVE_HAZARD = 13
+_MOVE_STRUGGLE = 14
+
+_NONE = int(PkmStatus.NONE)
+_PARALYZED = int(PkmStatus.PARALYZED)
+_POISONED = int(PkmStatus.POISONED)
+_CONFUSED = int(PkmStatus.CONFUSED)
+_SLEEP = int(PkmStatus.SLEEP)
+_FROZEN = int(PkmStatus.FROZEN)
+_BURNED = int(PkmStatus.BURNED)
+_CLEAR = int(WeatherCondition.CLEAR)
+_SANDSTORM = int(WeatherCondition.SANDSTORM)
+_HAIL = int(WeatherCondition.HAIL)
+_SPIKES = int(PkmEntryHazard.SPIKES)
+_NO_HAZARD = int(PkmEntryHazard.NONE)
+_ATTACK = int(PkmStat.ATTACK)
+_DEFENSE = int(PkmStat.DEFENSE)
+_SPEED = int(PkmStat.SPEED)
+_FLYING = int(PkmType.FLYING)
+_ROCK = int(PkmType.ROCK)
+_GROUND = int(PkmType.GROUND)
+_STEEL = int(PkmType.STEEL)
+_ICE = int(PkmType.ICE)
+_ELECTRIC = int(PkmType.ELECTRIC)
+_POISON = int(PkmType.POISON)
+_FIRE = int(PkmType.FIRE)
+
+
+@njit(cache=True)
+def _switch(b, t, slot, members, stage, confused, pkm_public):
+    entering = members[b, t, slot]
+    members[b, t, slot] = members[b, t, 0]
+    members[b, t, 0] = entering
+    stage[b, t, :] = 0
+    confused[b, t] = False
+    pkm_public[b, t, entering] = True
+
+
+@njit(cache=True)
+def _entry_hazard_damage(b, t, hp, pkm_type, members, entry_hazard, switched):
+    active = members[b, t, 0]
+    spikes = entry_hazard[b, t, _SPIKES]
+    if spikes > 0 and pkm_type[b, t, active] != _FLYING and switched[b, t]:
+        before_hp = hp[b, t, active]
+        after_hp = before_hp - (STATE_DAMAGE if spikes <= 1 else SPIKES_2 if spikes == 2 else SPIKES_3)
+        after_hp = 0. if after_hp < 0. else after_hp
+        hp[b, t, active] = after_hp
+        switched[b, t] = False
+        return before_hp - after_hp
+    return 0.
+
+
+@njit(cache=True)
+def _post_battle_damage(b, t, hp, pkm_type, status, members, weather):
+    active = members[b, t, 0]
+    p_type = pkm_type[b, t, active]
+    state_damage = 0.
+    if weather[b] == _SANDSTORM and p_type != _ROCK and p_type != _GROUND and p_type != _STEEL:
+        state_damage = STATE_DAMAGE
+    elif weather[b] == _HAIL and p_type != _ICE:
+        state_damage = STATE_DAMAGE
+    before_hp = hp[b, t, active]
+    after_hp = before_hp - state_damage
+    after_hp = 0. if after_hp < 0. else after_hp
+    damage = before_hp - after_hp
+    if status[b, t, active] == _POISONED or status[b, t, active] == _BURNED:
+        before_hp = after_hp
+        after_hp = before_hp - STATE_DAMAGE
+        after_hp = 0. if after_hp < 0. else after_hp
+        damage = before_hp - after_hp
+    hp[b, t, active] = after_hp
+    return damage
+
+
+@njit(cache=True)
+def _apply_effects(b, att, move, status, n_turns_asleep, pkm_type, members, stage, confused, entry_hazard, weather,
+                   n_turns_no_clear, pending_recover, pending_fixed_damage):
+    pending_recover[b] = move[_MOVE_RECOVER]
+    pending_fixed_damage[b] = move[_MOVE_FIXED_DAMAGE]
+    target = att if move[_MOVE_TARGET] == 0 else 1 - att
+
+    # stage effect
+    delta_stage = int(move[_MOVE_STAGE])
+    stat = int(move[_MOVE_STAT])
+    level = stage[b, target, stat]
+    if delta_stage != 0 and MIN_STAGE < level < MAX_STAGE:
+        level += delta_stage
+        stage[b, target, stat] = MIN_STAGE if level < MIN_STAGE else MAX_STAGE if level > MAX_STAGE else level
+
+    # status effect, any status that can not be set falls back to confusion
+    new_status = int(move[_MOVE_STATUS])
+    if new_status != _NONE:
+        active = members[b, target, 0]
+        current = status[b, target, active]
+        p_type = pkm_type[b, target, active]
+        if (new_status == _PARALYZED and p_type != _ELECTRIC and p_type != _GROUND and current != _PARALYZED) or \
+                (new_status == _POISONED and p_type != _POISON and p_type != _STEEL and current != _POISONED) or \
+                (new_status == _BURNED and p_type != _FIRE and current != _BURNED) or \
+                (new_status == _SLEEP and current != _SLEEP) or \
+                (new_status == _FROZEN and p_type != _ICE and current != _FROZEN):
+            status[b, target, active] = new_status
+            if new_status == _SLEEP:
+                n_turns_asleep[b, target, active] = 0
+        else:
+            confused[b, target] = True
+
+    # weather effect
+    new_weather = int(move[_MOVE_WEATHER])
+    if new_weather != _CLEAR and new_weather != weather[b]:
+        weather[b] = new_weather
+        n_turns_no_clear[b] = 0
+
+    # entry hazard effect, the target is the trainer index
+    hazard = int(move[_MOVE_HAZARD])
+    if hazard != _NO_HAZARD:
+        hazard_target = int(move[_MOVE_TARGET])
+        level = entry_hazard[b, hazard_target, hazard] + 1
+        entry_hazard[b, hazard_target, hazard] = level if level < N_HAZARD_STAGES - 1 else N_HAZARD_STAGES - 1
+
+
+@njit(cache=True)
+def _perform_pkm_attack(b, att, action, u, hp, pkm_type, status, n_turns_asleep, members, moves, pp, move_public,
+                        stage, confused, entry_hazard, weather, n_turns_no_clear, pending_recover,
+                        pending_fixed_damage, damage_multiplier, type_chart, struggle_row):
+    if action >= DEFAULT_PKM_N_MOVES:
+        return 0., 0.
+    opp = 1 - att
+    active = members[b, att, 0]
+    opp_active = members[b, opp, 0]
+
+    # spend power points or struggle
+    has_pp = pp[b, att, active, action] > 0
+    if has_pp:
+        pp[b, att, active, action] -= 1
+        move = moves[b, att, active, action]
+    else:
+        move = struggle_row
+
+    damage, recover = 0., 0.
+    if u[b, COL_ACCURACY + att] < move[_MOVE_ACC]:
+        # set recover and fixed damage pending from previous effects
+        recover = pending_recover[b]
+        fixed_damage = pending_fixed_damage[b]
+        pending_recover[b] = 0.
+        pending_fixed_damage[b] = 0.
+
+        # calculate damage
+        move_type = int(move[_MOVE_TYPE])
+        opp_type = pkm_type[b, opp, opp_active]
+        if fixed_damage > 0. and type_chart[move_type, opp_type] > 0.:
+            damage = fixed_damage
+        else:
+            stage_level = stage[b, att, _ATTACK] - stage[b, opp, _DEFENSE]
+            damage = damage_multiplier[STRUGGLE_MOVE_TYPE if move[_MOVE_STRUGGLE] > 0. else move_type,
+                                       pkm_type[b, att, active], opp_type, weather[b],
+                                       stage_level + STAGE_LEVEL_OFFSET] * move[_MOVE_POWER]
+
+        # effects are only applied after damage calculation
+        if has_pp:
+            move_public[b, att, active, action] = True
+        if u[b, COL_EFFECT + att] < move[_MOVE_PROB]:
+            _apply_effects(b, att, move, status, n_turns_asleep, pkm_type, members, stage, confused, entry_hazard,
+                           weather, n_turns_no_clear, pending_recover, pending_fixed_damage)
+        damage = float(round(damage))
+        recover = float(round(recover))
+
+    # perform recover
+    before_hp = hp[b, att, active]
+    after_hp = before_hp + recover
+    after_hp = MAX_HIT_POINTS if after_hp > MAX_HIT_POINTS else after_hp
+    hp[b, att, active] = after_hp
+
+    # perform damage
+    before_opp_hp = hp[b, opp, opp_active]
+    after_opp_hp = before_opp_hp - damage
+    after_opp_hp = 0. if after_opp_hp < 0. else after_opp_hp
+    hp[b, opp, opp_active] = after_opp_hp
+
+    return before_opp_hp - after_opp_hp, after_hp - before_hp
+
+
+@njit(cache=True)
+def _team_fainted(b, t, hp):
+    for k in range(hp.shape[2]):
+        if hp[b, t, k] != 0.:
+            return False
+    return True
+
+
+@njit(cache=True)
+def _switch_random(b, t, u, hp, members, stage, confused, pkm_public):
+    n_candidates = 0
+    for slot in range(1, members.shape[2]):
+        if hp[b, t, members[b, t, slot]] != 0.:
+            n_candidates += 1
+    if n_candidates == 0:
+        return
+    # select the floor(u * n)-th not fainted party pkm
+    choice = min(int(u * n_candidates), n_candidates - 1)
+    for slot in range(1, members.shape[2]):
+        if hp[b, t, members[b, t, slot]] != 0.:
+            if choice == 0:
+                _switch(b, t, slot, members, stage, confused, pkm_public)
+                return
+            choice -= 1
+
+
+@njit(cache=True)
+def resolve_turns(actions, u, r, hp, pkm_type, status, n_turns_asleep, pkm_public, members, moves, pp, move_public,
+                  stage, confused, n_turns_confused, entry_hazard, switched, weather, n_turns_no_clear,
+                  pending_recover, pending_fixed_damage, turn, winner, done, damage_multiplier, type_chart,
+                  struggle_row):
+    """
+    Resolve a turn of every battle not done, with the same rules and random columns as BatchedPkmBattleEnv.step.
+    The battle arrays are updated in place.
+
+    :param actions: actions with shape (N, 2)
+    :param u: turn random vectors with shape (N, N_RANDOM_COLUMNS)
+    :param r: output rewards with shape (N, 2), must be zeros
+    """
+    team_size = members.shape[2]
+    for b in range(actions.shape[0]):
+        if done[b]:
+            continue
+        turn[b] += 1
+
+        # switch pkm, switching to a missing member fails as switching to a fainted pkm
+        for t in range(2):
+            pos = actions[b, t] - DEFAULT_PKM_N_MOVES
+            if 0 <= pos < team_size - 1 and hp[b, t, members[b, t, pos + 1]] != 0.:
+                _switch(b, t, pos + 1, members, stage, confused, pkm_public)
+                switched[b, t] = True
+
+        # set trainer attack order
+        speed0 = float(stage[b, 0, _SPEED])
+        if actions[b, 0] < DEFAULT_PKM_N_MOVES:
+            speed0 += moves[b, 0, members[b, 0, 0], actions[b, 0], _MOVE_PRIORITY]
+        speed1 = float(stage[b, 1, _SPEED])
+        if actions[b, 1] < DEFAULT_PKM_N_MOVES:
+            speed1 += moves[b, 1, members[b, 1, 0], actions[b, 1], _MOVE_PRIORITY]
+        if speed0 > speed1:
+            first = 0
+        elif speed1 > speed0:
+            first = 1
+        else:
+            first = 0 if u[b, COL_ORDER] < 0.5 else 1
+        second = 1 - first
+
+        # get entry hazard damage
+        dmg0 = _entry_hazard_damage(b, 0, hp, pkm_type, members, entry_hazard, switched)
+        dmg1 = _entry_hazard_damage(b, 1, hp, pkm_type, members, entry_hazard, switched)
+        r[b, 0] += (dmg1 - dmg0) / MAX_HIT_POINTS
+        r[b, 1] += (dmg0 - dmg1) / MAX_HIT_POINTS
+
+        # process all pre battle effects
+        for t in range(2):
+            if confused[b, t]:
+                n_turns_confused[b, t] += 1
+                if u[b, COL_CONFUSION_END + t] <= 0.5 or n_turns_confused[b, t] == 4:
+                    confused[b, t] = False
+                    n_turns_confused[b, t] = 0
+            active = members[b, t, 0]
+            if status[b, t, active] == _SLEEP:
+                n_turns_asleep[b, t, active] += 1
+                if u[b, COL_ASLEEP_END + t] <= 0.5 or n_turns_asleep[b, t, active] == 4:
+                    status[b, t, active] = _NONE
+                    n_turns_asleep[b, t, active] = 0
+            if status[b, t, active] == _FROZEN and u[b, COL_FROZEN_END + t] <= 0.2:
+                status[b, t, active] = _NONE
+
+        # confusion state damage
+        active_not_fainted = hp[b, 0, members[b, 0, 0]] != 0. and hp[b, 1, members[b, 1, 0]] != 0.
+        dmg0 = STATE_DAMAGE if active_not_fainted and confused[b, 0] and u[b, COL_CONFUSION_DAMAGE] <= 0.33 else 0.
+        dmg1 = STATE_DAMAGE if active_not_fainted and confused[b, 1] and u[b, COL_CONFUSION_DAMAGE + 1] <= 0.33 \
+            else 0.
+        confusion_damage0 = dmg0 > 0.
+        confusion_damage1 = dmg1 > 0.
+        r[b, 0] += (dmg1 - dmg0) / MAX_HIT_POINTS
+        r[b, 1] += (dmg0 - dmg1) / MAX_HIT_POINTS
+
+        # battle
+        can_attack0 = False
+        can_attack1 = False
+        dealt0, dealt1, recovered0, recovered1 = 0., 0., 0., 0.
+        for att in (first, second):
+            active_not_fainted = hp[b, 0, members[b, 0, 0]] != 0. and hp[b, 1, members[b, 1, 0]] != 0.
+            att_status = status[b, att, members[b, att, 0]]
+            paralyzed = att_status == _PARALYZED and u[b, COL_PARALYSIS + att] <= 0.25
+            can = active_not_fainted and not paralyzed and att_status != _SLEEP and att_status != _FROZEN and \
+                not (confusion_damage0 if att == 0 else confusion_damage1)
+            d, h = 0., 0.
+            if can:
+                d, h = _perform_pkm_attack(b, att, actions[b, att], u, hp, pkm_type, status, n_turns_asleep, members,
+                                           moves, pp, move_public, stage, confused, entry_hazard, weather,
+                                           n_turns_no_clear, pending_recover, pending_fixed_damage,
+                                           damage_multiplier, type_chart, struggle_row)
+            if att == 0:
+                can_attack0, dealt0, recovered0 = can, d, h
+            else:
+                can_attack1, dealt1, recovered1 = can, d, h
+
+        r[b, 0] += (dealt0 + recovered0 - dealt1) / MAX_HIT_POINTS + (1. if hp[b, 1, members[b, 1, 0]] == 0. else 0.)
+        r[b, 1] += (dealt1 + recovered1 - dealt0) / MAX_HIT_POINTS + (1. if hp[b, 0, members[b, 0, 0]] == 0. else 0.)
+
+        # get post battle effects damage
+        dmg0 = _post_battle_damage(b, 0, hp, pkm_type, status, members, weather) if can_attack0 else 0.
+        dmg1 = _post_battle_damage(b, 1, hp, pkm_type, status, members, weather) if can_attack1 else 0.
+        r[b, 0] += (dmg1 - dmg0) / MAX_HIT_POINTS
+        r[b, 1] += (dmg0 - dmg1) / MAX_HIT_POINTS
+
+        # process all post battle effects
+        if weather[b] != _CLEAR:
+            n_turns_no_clear[b] += 1
+            if n_turns_no_clear[b] > 5:
+                weather[b] = _CLEAR
+                n_turns_no_clear[b] = 0
+
+        # switch fainted pkm, dealing entry hazard damage to the pkm entering the battle
+        dmg0, dmg1 = 0., 0.
+        iteration = 0
+        pending = True
+        while pending:
+            switched[b, 0] = False
+            switched[b, 1] = False
+            fainted0 = hp[b, 0, members[b, 0, 0]] == 0.
+            fainted1 = hp[b, 1, members[b, 1, 0]] == 0.
+            col = COL_FAINTED_SWITCH + 2 * min(iteration, MAX_FAINTED_SWITCH_ITERATIONS - 1)
+            if fainted0:
+                _switch_random(b, 0, u[b, col], hp, members, stage, confused, pkm_public)
+                switched[b, 0] = True
+                dmg0 += _entry_hazard_damage(b, 0, hp, pkm_type, members, entry_hazard, switched)
+            if fainted1:
+                _switch_random(b, 1, u[b, col + 1], hp, members, stage, confused, pkm_public)
+                switched[b, 1] = True
+                dmg1 += _entry_hazard_damage(b, 1, hp, pkm_type, members, entry_hazard, switched)
+            pending = (fainted0 or fainted1) and not _team_fainted(b, 0, hp) and not _team_fainted(b, 1, hp)
+            iteration += 1
+        # as in PkmBattleEnv this damage is rewarded by attack order and not by trainer
+        sign = 1. if first == 0 else -1.
+        r[b, 0] += sign * (dmg1 - dmg0) / MAX_HIT_POINTS
+        r[b, 1] += sign * (dmg0 - dmg1) / MAX_HIT_POINTS
+
+        # check if battle ended
+        t0 = _team_fainted(b, 0, hp)
+        t1 = _team_fainted(b, 1, hp)
+        r[b, 0] += 1. if t0 else 0.
+        r[b, 1] += 1. if t1 else 0.
+        if t0 or t1:
+            winner[b] = 1 if t0 else 0
+            done[b] = True
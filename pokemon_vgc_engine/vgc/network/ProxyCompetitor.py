@@ -6,6 +6,7 @@ from vgc.balance import DeltaRoster
 from vgc.behaviour import BattlePolicy, TeamSelectionPolicy, TeamBuildPolicy, TeamPredictor, BalancePolicy
 from vgc.competition.Competition import Competitor
 from vgc.datatypes.Objects import PkmFullTeam, PkmTeam, PkmRoster
+from vgc.util.Networking import recv_async
 
 ENCODE_TIMEOUT = 1.0
 CLOSE_TIMEOUT = 1.0
@@ -23,6 +24,11 @@ class ProxyBattlePolicy(BattlePolicy):
         action: int = self.conn.recv()
         return action
 
+    async def get_action_async(self, s) -> int:
+        self.conn.send(('BattlePolicy', 'get_action', s))
+        action: int = await recv_async(self.conn)
+        return action
+
     def requires_encode(self) -> bool:
         # self.conn.settimeout(ENCODE_TIMEOUT)
         self.conn.send(('BattlePolicy', 'requires_encode',))
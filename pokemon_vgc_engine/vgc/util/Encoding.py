@@ -1,7 +1,10 @@
-from typing import List, Union
+from array import array
+from typing import List, Optional, Sequence, Tuple, Union
 
-from vgc.datatypes.Constants import MAX_HIT_POINTS, MOVE_MAX_PP, DEFAULT_TEAM_SIZE
-from vgc.datatypes.Objects import PkmMove, Pkm, PkmTeam, GameState, Weather
+import numpy as np
+
+from vgc.datatypes.Constants import MAX_HIT_POINTS, MOVE_MAX_PP, DEFAULT_TEAM_SIZE, DEFAULT_PKM_N_MOVES
+from vgc.datatypes.Objects import PkmMove, Pkm, PkmTeam, PkmFullTeam, GameState, Weather
 from vgc.datatypes.Types import N_TYPES, N_STATUS, N_STATS, N_ENTRY_HAZARD, N_WEATHER, PkmStat, PkmType, \
     PkmStatus, WeatherCondition, PkmEntryHazard
 from vgc.engine.HiddenInformation import null_pkm, null_pkm_move
@@ -13,6 +16,13 @@ def one_hot(p, n):
     return b
 
 
+def _one_hot_index(e, start: int, end: int) -> int:
+    # decoders take lists, arrays and memoryviews
+    if isinstance(e, list):
+        return e.index(1, start, end) - start
+    return int(np.argmax(np.asarray(e[start:end])))
+
+
 def encode_move(e, move: PkmMove):
     e += [move.power / MAX_HIT_POINTS,
           move.acc,
@@ -31,28 +41,28 @@ def encode_move(e, move: PkmMove):
 
 
 def decode_move(e) -> PkmMove:
-    power = e[0] * MAX_HIT_POINTS
-    acc = e[1]
-    pp = int(e[2] * MOVE_MAX_PP)
-    priority = e[3]
-    prob = e[4]
-    target = e[5]
-    recover = e[6] * MAX_HIT_POINTS
-    stat = PkmStat(e[7])
-    stage = e[8] * 2
-    fixed_damage = e[9] * MAX_HIT_POINTS
+    power = float(e[0]) * MAX_HIT_POINTS
+    acc = float(e[1])
+    pp = round(e[2] * MOVE_MAX_PP)
+    priority = bool(e[3])
+    prob = float(e[4])
+    target = round(e[5])
+    recover = float(e[6]) * MAX_HIT_POINTS
+    stat = PkmStat(round(e[7]))
+    stage = round(e[8] * 2)
+    fixed_damage = float(e[9]) * MAX_HIT_POINTS
     _start = 10
     _end = _start + N_TYPES
-    move_type = PkmType(e.index(1, _start, _end) - _start)
+    move_type = PkmType(_one_hot_index(e, _start, _end))
     _start = _end
     _end = _start + N_STATUS
-    status = PkmStatus(e.index(1, _start, _end) - _start)
+    status = PkmStatus(_one_hot_index(e, _start, _end))
     _start = _end
     _end = _start + N_WEATHER
-    weather = WeatherCondition(e.index(1, _start, _end) - _start)
+    weather = WeatherCondition(_one_hot_index(e, _start, _end))
     _start = _end
     _end = _start + N_ENTRY_HAZARD
-    hazard = PkmEntryHazard(e.index(1, _start, _end) - _start)
+    hazard = PkmEntryHazard(_one_hot_index(e, _start, _end))
     return PkmMove(power=power, acc=acc, max_pp=pp, priority=priority, prob=prob, target=target, recover=recover,
                    stat=stat, stage=stage, fixed_damage=fixed_damage, move_type=move_type, status=status,
                    weather=weather, hazard=hazard)
@@ -91,14 +101,14 @@ def partial_encode_pkm(e, pkm: Pkm, prediction: Union[Pkm, None] = None):
 
 
 def decode_pkm(e) -> Pkm:
-    hp = e[0] * MAX_HIT_POINTS
-    n_turns_asleep = int(e[1] * 5)
+    hp = float(e[0]) * MAX_HIT_POINTS
+    n_turns_asleep = round(e[1] * 5)
     _start = 2
     _end = _start + N_TYPES
-    p_type = PkmType(e.index(1, _start, _end) - _start)
+    p_type = PkmType(_one_hot_index(e, _start, _end))
     _start = _end
     _end = _start + N_STATUS
-    status = PkmStatus(e.index(1, _start, _end) - _start)
+    status = PkmStatus(_one_hot_index(e, _start, _end))
     _start = _end
     _end = _start + MOVE_ENCODE_LEN
     move0 = decode_move(e[_start:_end])
@@ -140,17 +150,13 @@ def partial_encode_team(e, team: PkmTeam, prediction: Union[PkmTeam, None] = Non
 
 
 def decode_team(e) -> PkmTeam:
-    confused = e[0]
+    confused = bool(e[0])
     _start = 1
     _end = _start + N_ENTRY_HAZARD
-    entry_hazard = e[_start: _end]
+    entry_hazard = [round(h) for h in e[_start: _end]]
     _start = _end
     _end = _start + N_STATS
-    stage = []
-    i = 0
-    for stat in range(_start, _end):
-        stage.append(e[stat] * 5)
-        i += 1
+    stage = [round(e[stat] * 5) for stat in range(_start, _end)]
     pkms: List[Pkm] = []
     for _ in range(DEFAULT_TEAM_SIZE):
         _start = _end
@@ -159,13 +165,14 @@ def decode_team(e) -> PkmTeam:
     team = PkmTeam(pkms)
     team.confused = confused
     team.entry_hazard = entry_hazard
+    team.stage = stage
     return team
 
 
 TEAM_ENCODE_LEN = 591
 
 
-def encode_game_state(e, game_state: GameState):  # TODO encode over array instead of expanding
+def encode_game_state(e, game_state: GameState):
     for team in game_state.teams:
         encode_team(e, team)
     e += one_hot(game_state.weather.condition, N_WEATHER)
@@ -180,13 +187,625 @@ def partial_encode_game_state(e, game_state: GameState, prediction: PkmTeam = No
 
 
 def decode_game_state(e) -> GameState:
+    if not isinstance(e, list):
+        # arrays are decoded with argmax over whole blocks
+        return decode_game_states(e)[0]
     teams = (decode_team(e[:TEAM_ENCODE_LEN]), decode_team(e[TEAM_ENCODE_LEN:TEAM_ENCODE_LEN * 2]))
     game_state = GameState(teams, Weather())
     _start = TEAM_ENCODE_LEN * 2
     _end = _start + N_WEATHER
-    game_state.weather.condition = WeatherCondition(e.index(1, _start, _end) - _start)
-    game_state.weather.n_turns_no_clear = e[_end] * 5
+    game_state.weather.condition = WeatherCondition(_one_hot_index(e, _start, _end))
+    game_state.weather.n_turns_no_clear = round(e[_end] * 5)
     return game_state
 
 
 GAME_STATE_ENCODE_LEN = 1188
+
+
+# Array encoders, they write the same values as the list encoders into a preallocated float32 buffer at fixed offsets.
+# Each one clears its slice of the buffer and then only writes the scalars and the set bit of each one hot field,
+# through a memoryview since item assignment on it is much cheaper than on the ndarray. Moves are copied from their
+# cached encoding, only the power points change during a battle.
+
+_PKM_MOVES_OFFSET = 2 + N_TYPES + N_STATUS
+_TEAM_PKM_OFFSET = 1 + N_ENTRY_HAZARD + N_STATS
+
+
+def _write_move(m: memoryview, o: int, move: PkmMove):
+    try:
+        encoding = move.encoding
+    except AttributeError:  # moves unpickled from before the cache
+        encoding = None
+    if encoding is None:
+        e = []
+        encode_move(e, move)
+        encoding = move.encoding = array('f', e)
+    m[o:o + MOVE_ENCODE_LEN] = encoding
+    m[o + 2] = move.pp / MOVE_MAX_PP
+
+
+def _write_pkm_header(m: memoryview, o: int, pkm: Pkm):
+    m[o] = pkm.hp / MAX_HIT_POINTS
+    m[o + 1] = pkm.n_turns_asleep / 5
+    m[o + 2 + pkm.type] = 1.
+    m[o + 2 + N_TYPES + pkm.status] = 1.
+
+
+def _write_pkm(m: memoryview, o: int, pkm: Pkm):
+    _write_pkm_header(m, o, pkm)
+    o += _PKM_MOVES_OFFSET
+    for move in pkm.moves:
+        _write_move(m, o, move)
+        o += MOVE_ENCODE_LEN
+
+
+def _write_partial_pkm(m: memoryview, o: int, pkm: Pkm, prediction: Union[Pkm, None]):
+    if pkm.revealed:
+        _write_pkm_header(m, o, pkm)
+    else:
+        _write_pkm_header(m, o, prediction if prediction is not None else null_pkm)
+    o += _PKM_MOVES_OFFSET
+    for i, move in enumerate(pkm.moves):
+        if move.revealed:
+            _write_move(m, o, move)
+        elif prediction is not None and prediction.moves[i] is not None:
+            _write_move(m, o, prediction.moves[i])
+        else:
+            _write_move(m, o, null_pkm_move)
+        o += MOVE_ENCODE_LEN
+
+
+def _write_team_header(m: memoryview, o: int, team: PkmTeam):
+    m[o] = team.confused
+    o += 1
+    for i in range(N_ENTRY_HAZARD):
+        m[o + i] = team.entry_hazard[i]
+    o += N_ENTRY_HAZARD
+    for stat in range(N_STATS):
+        m[o + stat] = team.stage[stat] / 5
+
+
+def _write_team(m: memoryview, o: int, team: PkmTeam):
+    _write_team_header(m, o, team)
+    o += _TEAM_PKM_OFFSET
+    _write_pkm(m, o, team.active)
+    for pkm in team.party[:DEFAULT_TEAM_SIZE - 1]:
+        o += PKM_ENCODE_LEN
+        _write_pkm(m, o, pkm)
+
+
+def _write_partial_team(m: memoryview, o: int, team: PkmTeam, prediction: Union[PkmTeam, None]):
+    _write_team_header(m, o, team)
+    o += _TEAM_PKM_OFFSET
+    _write_partial_pkm(m, o, team.active, prediction.active if prediction is not None else None)
+    for i, pkm in enumerate(team.party):
+        o += PKM_ENCODE_LEN
+        _write_partial_pkm(m, o, pkm, prediction.party[i] if prediction is not None else None)
+
+
+def _write_weather(m: memoryview, o: int, weather: Weather):
+    m[o + weather.condition] = 1.
+    m[o + N_WEATHER] = weather.n_turns_no_clear / 5
+
+
+def encode_move_array(a: np.ndarray, move: PkmMove, offset: int = 0) -> np.ndarray:
+    """
+    Array version of encode_move.
+
+    :param a: contiguous float32 buffer
+    :param move: move
+    :param offset: position of the encoding in the buffer
+    :return: the buffer
+    """
+    _write_move(memoryview(a), offset, move)
+    return a
+
+
+def encode_pkm_array(a: np.ndarray, pkm: Pkm, offset: int = 0) -> np.ndarray:
+    """
+    Array version of encode_pkm.
+
+    :param a: contiguous float32 buffer
+    :param pkm: pokemon
+    :param offset: position of the encoding in the buffer
+    :return: the buffer
+    """
+    a[offset:offset + PKM_ENCODE_LEN] = 0.
+    _write_pkm(memoryview(a), offset, pkm)
+    return a
+
+
+def partial_encode_pkm_array(a: np.ndarray, pkm: Pkm, prediction: Union[Pkm, None] = None,
+                             offset: int = 0) -> np.ndarray:
+    """
+    Array version of partial_encode_pkm.
+
+    :param a: contiguous float32 buffer
+    :param pkm: pokemon
+    :param prediction: prediction of the hidden pokemon information
+    :param offset: position of the encoding in the buffer
+    :return: the buffer
+    """
+    a[offset:offset + PKM_ENCODE_LEN] = 0.
+    _write_partial_pkm(memoryview(a), offset, pkm, prediction)
+    return a
+
+
+def encode_team_array(a: np.ndarray, team: PkmTeam, offset: int = 0) -> np.ndarray:
+    """
+    Array version of encode_team.
+
+    :param a: contiguous float32 buffer
+    :param team: team
+    :param offset: position of the encoding in the buffer
+    :return: the buffer
+    """
+    a[offset:offset + TEAM_ENCODE_LEN] = 0.
+    _write_team(memoryview(a), offset, team)
+    return a
+
+
+def partial_encode_team_array(a: np.ndarray, team: PkmTeam, prediction: Union[PkmTeam, None] = None,
+                              offset: int = 0) -> np.ndarray:
+    """
+    Array version of partial_encode_team.
+
+    :param a: contiguous float32 buffer
+    :param team: team
+    :param prediction: prediction of the hidden team information
+    :param offset: position of the encoding in the buffer
+    :return: the buffer
+    """
+    a[offset:offset + TEAM_ENCODE_LEN] = 0.
+    _write_partial_team(memoryview(a), offset, team, prediction)
+    return a
+
+
+def encode_game_state_array(a: np.ndarray, game_state: GameState, offset: int = 0) -> np.ndarray:
+    """
+    Array version of encode_game_state.
+
+    :param a: contiguous float32 buffer
+    :param game_state: game state
+    :param offset: position of the encoding in the buffer
+    :return: the buffer
+    """
+    a[offset:offset + GAME_STATE_ENCODE_LEN] = 0.
+    m = memoryview(a)
+    _write_team(m, offset, game_state.teams[0])
+    _write_team(m, offset + TEAM_ENCODE_LEN, game_state.teams[1])
+    _write_weather(m, offset + 2 * TEAM_ENCODE_LEN, game_state.weather)
+    return a
+
+
+def partial_encode_game_state_array(a: np.ndarray, game_state: GameState, prediction: PkmTeam = None,
+                                    offset: int = 0) -> np.ndarray:
+    """
+    Array version of partial_encode_game_state.
+
+    :param a: contiguous float32 buffer
+    :param game_state: game state
+    :param prediction: prediction of the hidden opponent team information
+    :param offset: position of the encoding in the buffer
+    :return: the buffer
+    """
+    a[offset:offset + GAME_STATE_ENCODE_LEN] = 0.
+    m = memoryview(a)
+    _write_team(m, offset, game_state.teams[0])
+    _write_partial_team(m, offset + TEAM_ENCODE_LEN, game_state.teams[1], prediction)
+    _write_weather(m, offset + 2 * TEAM_ENCODE_LEN, game_state.weather)
+    return a
+
+
+def batch_array(out: Optional[np.ndarray], n: int, length: int) -> np.ndarray:
+    """
+    Get the cleared rows of a batch encoding array.
+
+    :param out: contiguous float32 array of shape (m, length) with m >= n, a new one if None
+    :param n: number of encodings
+    :param length: length of an encoding
+    :return: first n rows of out
+    """
+    if out is None:
+        return np.zeros((n, length), dtype=np.float32)
+    if out.dtype != np.float32 or out.ndim != 2 or out.shape[0] < n or out.shape[1] != length or \
+            not out.flags.c_contiguous:
+        raise ValueError(f'expected a contiguous float32 array of shape ({n}, {length}), got {out.dtype} {out.shape}')
+    out = out[:n]
+    out[...] = 0.
+    return out
+
+
+def encode_game_states(states: Sequence[GameState], out: Optional[np.ndarray] = None, partial: bool = False,
+                       tensor: bool = False):
+    """
+    Encode many game states at once, each one into a row of a single array, as encode_game_state_array or
+    partial_encode_game_state_array.
+
+    :param states: game states
+    :param out: contiguous float32 array with at least len(states) rows of GAME_STATE_ENCODE_LEN, a new one if None
+    :param partial: hide the opponent team information not revealed
+    :param tensor: return a torch tensor sharing the memory of the array (requires torch)
+    :return: array or tensor of shape (len(states), GAME_STATE_ENCODE_LEN)
+    """
+    out = batch_array(out, len(states), GAME_STATE_ENCODE_LEN)
+    m = memoryview(out.reshape(-1))
+    for i, game_state in enumerate(states):
+        o = i * GAME_STATE_ENCODE_LEN
+        _write_team(m, o, game_state.teams[0])
+        if partial:
+            _write_partial_team(m, o + TEAM_ENCODE_LEN, game_state.teams[1], None)
+        else:
+            _write_team(m, o + TEAM_ENCODE_LEN, game_state.teams[1])
+        _write_weather(m, o + 2 * TEAM_ENCODE_LEN, game_state.weather)
+    if tensor:
+        import torch
+        return torch.from_numpy(out)
+    return out
+
+
+# Full team encoders, for team building, they encode the move effects of each pkm of a full team instead of its battle
+# state.
+
+def encode_full_move(e, move: PkmMove):
+    e += [(move.power / MAX_HIT_POINTS) * move.acc if move.fixed_damage == 0.0 else move.fixed_damage / MAX_HIT_POINTS,
+          move.priority,
+          move.prob,
+          move.target,
+          move.recover / MAX_HIT_POINTS,
+          move.stat.value,
+          move.stage / 2]
+    e += one_hot(move.type, N_TYPES)
+    e += one_hot(move.status, N_STATUS)
+    e += [move.weather != move.weather.CLEAR]
+    e += one_hot(move.hazard, N_ENTRY_HAZARD)
+
+
+def encode_full_pkm(e, pkm: Pkm):
+    e += [pkm.max_hp / MAX_HIT_POINTS]
+    e += one_hot(pkm.type, N_TYPES)
+    for move in pkm.moves:
+        encode_full_move(e, move)
+
+
+def encode_full_team(team: PkmFullTeam):
+    e = []
+    for pkm in team.pkm_list:
+        encode_full_pkm(e, pkm)
+    return e
+
+
+FULL_TEAM_ENCODE_LEN = len(encode_full_team(PkmFullTeam()))
+FULL_PKM_ENCODE_LEN = FULL_TEAM_ENCODE_LEN // len(PkmFullTeam().pkm_list)
+FULL_MOVE_ENCODE_LEN = (FULL_PKM_ENCODE_LEN - 1 - N_TYPES) // DEFAULT_PKM_N_MOVES
+
+
+def _write_full_move(m: memoryview, o: int, move: PkmMove):
+    m[o] = (move.power / MAX_HIT_POINTS) * move.acc if move.fixed_damage == 0.0 else \
+        move.fixed_damage / MAX_HIT_POINTS
+    m[o + 1] = move.priority
+    m[o + 2] = move.prob
+    m[o + 3] = move.target
+    m[o + 4] = move.recover / MAX_HIT_POINTS
+    m[o + 5] = move.stat.value
+    m[o + 6] = move.stage / 2
+    o += 7
+    m[o + move.type] = 1.
+    o += N_TYPES
+    m[o + move.status] = 1.
+    o += N_STATUS
+    m[o] = move.weather != move.weather.CLEAR
+    m[o + 1 + move.hazard] = 1.
+
+
+def _write_full_pkm(m: memoryview, o: int, pkm: Pkm):
+    m[o] = pkm.max_hp / MAX_HIT_POINTS
+    m[o + 1 + pkm.type] = 1.
+    o += 1 + N_TYPES
+    for move in pkm.moves:
+        _write_full_move(m, o, move)
+        o += FULL_MOVE_ENCODE_LEN
+
+
+def encode_full_teams(teams: Sequence[PkmFullTeam], out: Optional[np.ndarray] = None, tensor: bool = False):
+    """
+    Encode many teams of the same size at once, each one into a row of a single array, as encode_full_team.
+
+    :param teams: teams
+    :param out: contiguous float32 array with at least len(teams) rows of the team encoding length, a new one if None
+    :param tensor: return a torch tensor sharing the memory of the array (requires torch)
+    :return: array or tensor of shape (len(teams), team size * FULL_PKM_ENCODE_LEN)
+    """
+    team_size = len(teams[0].pkm_list) if teams else 0
+    length = team_size * FULL_PKM_ENCODE_LEN
+    out = batch_array(out, len(teams), length)
+    m = memoryview(out.reshape(-1))
+    for i, team in enumerate(teams):
+        if len(team.pkm_list) != team_size:
+            raise ValueError(f'expected teams of {team_size} pkm, got {len(team.pkm_list)}')
+        o = i * length
+        for pkm in team.pkm_list:
+            _write_full_pkm(m, o, pkm)
+            o += FULL_PKM_ENCODE_LEN
+    if tensor:
+        import torch
+        return torch.from_numpy(out)
+    return out
+
+
+def _round(x: np.ndarray) -> np.ndarray:
+    return np.rint(x).astype(np.int64)
+
+
+def _scale(x: np.ndarray, k: float) -> np.ndarray:
+    return np.multiply(x, k, dtype=np.float64)
+
+
+class EncodedGameStates:
+
+    def __init__(self, e):
+        """
+        Read only views of encoded game states, to read their fields without decoding them into objects. The states,
+        teams, pkms and moves blocks are views of the encoding. The fields are computed from them when read, as arrays
+        indexed by state, team, pkm and move, and one hot fields are decoded with an argmax over their block.
+
+        :param e: encoded game state or states of shape (N, GAME_STATE_ENCODE_LEN), as an array, memoryview or list
+        """
+        states = np.asarray(e)
+        if states.ndim == 1:
+            states = states[np.newaxis]
+        states = states.view()
+        states.flags.writeable = False
+        n = len(states)
+        self.states = states
+        self.teams = states[:, :2 * TEAM_ENCODE_LEN].reshape(n, 2, TEAM_ENCODE_LEN)
+        self.pkms = self.teams[..., _TEAM_PKM_OFFSET:].reshape(n, 2, DEFAULT_TEAM_SIZE, PKM_ENCODE_LEN)
+        self.moves = self.pkms[..., _PKM_MOVES_OFFSET:].reshape(n, 2, DEFAULT_TEAM_SIZE, DEFAULT_PKM_N_MOVES,
+                                                                 MOVE_ENCODE_LEN)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    @property
+    def confused(self) -> np.ndarray:
+        return self.teams[..., 0] != 0.
+
+    @property
+    def entry_hazard(self) -> np.ndarray:
+        return _round(self.teams[..., 1:1 + N_ENTRY_HAZARD])
+
+    @property
+    def stage(self) -> np.ndarray:
+        return _round(self.teams[..., 1 + N_ENTRY_HAZARD:_TEAM_PKM_OFFSET] * 5)
+
+    @property
+    def hp(self) -> np.ndarray:
+        return _scale(self.pkms[..., 0], MAX_HIT_POINTS)
+
+    @property
+    def n_turns_asleep(self) -> np.ndarray:
+        return _round(self.pkms[..., 1] * 5)
+
+    @property
+    def pkm_type(self) -> np.ndarray:
+        return np.argmax(self.pkms[..., 2:2 + N_TYPES], axis=-1)
+
+    @property
+    def status(self) -> np.ndarray:
+        return np.argmax(self.pkms[..., 2 + N_TYPES:_PKM_MOVES_OFFSET], axis=-1)
+
+    @property
+    def power(self) -> np.ndarray:
+        return _scale(self.moves[..., 0], MAX_HIT_POINTS)
+
+    @property
+    def acc(self) -> np.ndarray:
+        return self.moves[..., 1]
+
+    @property
+    def pp(self) -> np.ndarray:
+        return _round(self.moves[..., 2] * MOVE_MAX_PP)
+
+    @property
+    def priority(self) -> np.ndarray:
+        return self.moves[..., 3] != 0.
+
+    @property
+    def prob(self) -> np.ndarray:
+        return self.moves[..., 4]
+
+    @property
+    def target(self) -> np.ndarray:
+        return _round(self.moves[..., 5])
+
+    @property
+    def recover(self) -> np.ndarray:
+        return _scale(self.moves[..., 6], MAX_HIT_POINTS)
+
+    @property
+    def stat(self) -> np.ndarray:
+        return _round(self.moves[..., 7])
+
+    @property
+    def move_stage(self) -> np.ndarray:
+        return _round(self.moves[..., 8] * 2)
+
+    @property
+    def fixed_damage(self) -> np.ndarray:
+        return _scale(self.moves[..., 9], MAX_HIT_POINTS)
+
+    @property
+    def move_type(self) -> np.ndarray:
+        return np.argmax(self.moves[..., 10:10 + N_TYPES], axis=-1)
+
+    @property
+    def move_status(self) -> np.ndarray:
+        _start = 10 + N_TYPES
+        return np.argmax(self.moves[..., _start:_start + N_STATUS], axis=-1)
+
+    @property
+    def move_weather(self) -> np.ndarray:
+        _start = 10 + N_TYPES + N_STATUS
+        return np.argmax(self.moves[..., _start:_start + N_WEATHER], axis=-1)
+
+    @property
+    def move_hazard(self) -> np.ndarray:
+        _start = 10 + N_TYPES + N_STATUS + N_WEATHER
+        return np.argmax(self.moves[..., _start:_start + N_ENTRY_HAZARD], axis=-1)
+
+    @property
+    def weather(self) -> np.ndarray:
+        _start = 2 * TEAM_ENCODE_LEN
+        return np.argmax(self.states[:, _start:_start + N_WEATHER], axis=-1)
+
+    @property
+    def n_turns_no_clear(self) -> np.ndarray:
+        return _round(self.states[:, 2 * TEAM_ENCODE_LEN + N_WEATHER] * 5)
+
+
+def decode_game_states(e) -> List[GameState]:
+    """
+    Decode many game states at once, as decode_game_state. The fields of all the states are first decoded together
+    with EncodedGameStates, only the objects are then built one by one.
+
+    :param e: encoded game states, or their EncodedGameStates
+    :return: game states
+    """
+    v = e if isinstance(e, EncodedGameStates) else EncodedGameStates(e)
+    power, acc, pp, priority, prob, target, recover, stat, stage, fixed_damage, move_type, move_status, weather, \
+        hazard = (f.tolist() for f in (v.power, v.acc, v.pp, v.priority, v.prob, v.target, v.recover, v.stat,
+                                       v.move_stage, v.fixed_damage, v.move_type, v.move_status, v.move_weather,
+                                       v.move_hazard))
+    hp, n_turns_asleep, pkm_type, status = (f.tolist() for f in (v.hp, v.n_turns_asleep, v.pkm_type, v.status))
+    confused, entry_hazard, team_stage = v.confused.tolist(), v.entry_hazard.tolist(), v.stage.tolist()
+    condition, n_turns_no_clear = v.weather.tolist(), v.n_turns_no_clear.tolist()
+    game_states = []
+    for i in range(len(v)):
+        teams = []
+        for t in range(2):
+            pkms = []
+            for k in range(DEFAULT_TEAM_SIZE):
+                m = [PkmMove(power=power[i][t][k][j], acc=acc[i][t][k][j], max_pp=pp[i][t][k][j],
+                             priority=priority[i][t][k][j], prob=prob[i][t][k][j], target=target[i][t][k][j],
+                             recover=recover[i][t][k][j], stat=PkmStat(stat[i][t][k][j]), stage=stage[i][t][k][j],
+                             fixed_damage=fixed_damage[i][t][k][j], move_type=PkmType(move_type[i][t][k][j]),
+                             status=PkmStatus(move_status[i][t][k][j]), weather=WeatherCondition(weather[i][t][k][j]),
+                             hazard=PkmEntryHazard(hazard[i][t][k][j])) for j in range(DEFAULT_PKM_N_MOVES)]
+                pkm = Pkm(max_hp=hp[i][t][k], p_type=PkmType(pkm_type[i][t][k]), status=PkmStatus(status[i][t][k]),
+                          move0=m[0], move1=m[1], move2=m[2], move3=m[3])
+                pkm.n_turns_asleep = n_turns_asleep[i][t][k]
+                pkms.append(pkm)
+            team = PkmTeam(pkms)
+            team.confused = confused[i][t]
+            team.entry_hazard = entry_hazard[i][t]
+            team.stage = team_stage[i][t]
+            teams.append(team)
+        game_state = GameState((teams[0], teams[1]), Weather())
+        game_state.weather.condition = WeatherCondition(condition[i])
+        game_state.weather.n_turns_no_clear = n_turns_no_clear[i]
+        game_states.append(game_state)
+    return game_states
+
+
+class ObservationEncoder:
+
+    def __init__(self):
+        """
+        Incremental partial_encode_game_state_array of the successive states of a battle, seen by the same player. The
+        last observation is kept and each encode only patches what changed since: the team and weather fields, the
+        fields of the pokemon marked with touch that differ from the encoded ones, including moves newly revealed, and
+        the slots whose pokemon changed with a switch, which are encoded again. The owner of the battle marks every
+        pokemon that was active since the last encode, and resets the encoder after any other change.
+        """
+        self.buffer = np.zeros(GAME_STATE_ENCODE_LEN, dtype=np.float32)
+        self.__m = memoryview(self.buffer)
+        n_slots = 2 * DEFAULT_TEAM_SIZE
+        # pokemon of each slot with its encoded (hp, n_turns_asleep, type, status) and (pp, revealed) of its moves
+        self.__pkm: List[Optional[Pkm]] = [None] * n_slots
+        self.__headers: List[Tuple] = [()] * n_slots
+        self.__moves: List[List[Tuple[int, bool]]] = [[] for _ in range(n_slots)]
+        self.__weather = WeatherCondition.CLEAR
+        # ids of the pokemon touched since the last encode
+        self.__touched = set()
+
+    def reset(self):
+        """
+        Forget the last observation, the next encode writes the whole state.
+        """
+        for slot in range(len(self.__pkm)):
+            self.__pkm[slot] = None
+        self.buffer[2 * TEAM_ENCODE_LEN:2 * TEAM_ENCODE_LEN + N_WEATHER] = 0.
+        self.__touched.clear()
+
+    def touch(self, pkm: Pkm):
+        """
+        Mark a pokemon whose battle state may have changed.
+
+        :param pkm: pokemon
+        """
+        self.__touched.add(id(pkm))
+
+    def encode(self, game_state: GameState) -> np.ndarray:
+        """
+        Update the observation to a new state.
+
+        :param game_state: state seen by the player, the opponent team second
+        :return: the observation buffer, overwritten by the next encode
+        """
+        m = self.__m
+        for t, team in enumerate(game_state.teams):
+            o = t * TEAM_ENCODE_LEN
+            _write_team_header(m, o, team)
+            o += _TEAM_PKM_OFFSET
+            slot = t * DEFAULT_TEAM_SIZE
+            self.__patch_pkm(m, o, slot, team.active, t == 1)
+            for pkm in team.party[:DEFAULT_TEAM_SIZE - 1]:
+                o += PKM_ENCODE_LEN
+                slot += 1
+                self.__patch_pkm(m, o, slot, pkm, t == 1)
+        self.__touched.clear()
+        o = 2 * TEAM_ENCODE_LEN
+        m[o + self.__weather] = 0.
+        _write_weather(m, o, game_state.weather)
+        self.__weather = game_state.weather.condition
+        return self.buffer
+
+    def __patch_pkm(self, m: memoryview, o: int, slot: int, pkm: Pkm, partial: bool):
+        if pkm is not self.__pkm[slot]:
+            self.buffer[o:o + PKM_ENCODE_LEN] = 0.
+            if partial:
+                _write_partial_pkm(m, o, pkm, None)
+                header = pkm if pkm.revealed else null_pkm
+                self.__moves[slot] = [(move.pp, move.revealed) for move in pkm.moves]
+            else:
+                _write_pkm(m, o, pkm)
+                header = pkm
+                self.__moves[slot] = [(move.pp, True) for move in pkm.moves]
+            self.__pkm[slot] = pkm
+            self.__headers[slot] = header.hp, header.n_turns_asleep, header.type, header.status
+            return
+        if id(pkm) not in self.__touched:
+            return
+        src = pkm if not partial or pkm.revealed else null_pkm
+        header = src.hp, src.n_turns_asleep, src.type, src.status
+        old = self.__headers[slot]
+        if header != old:
+            m[o] = src.hp / MAX_HIT_POINTS
+            m[o + 1] = src.n_turns_asleep / 5
+            m[o + 2 + old[2]] = 0.
+            m[o + 2 + src.type] = 1.
+            m[o + 2 + N_TYPES + old[3]] = 0.
+            m[o + 2 + N_TYPES + src.status] = 1.
+            self.__headers[slot] = header
+        o += _PKM_MOVES_OFFSET
+        moves = self.__moves[slot]
+        for i, move in enumerate(pkm.moves):
+            pp, revealed = moves[i]
+            if revealed:
+                if move.pp != pp:
+                    m[o + 2] = move.pp / MOVE_MAX_PP
+                    moves[i] = move.pp, True
+            elif move.revealed:
+                _write_move(m, o, move)
+                moves[i] = move.pp, True
+            o += MOVE_ENCODE_LEN
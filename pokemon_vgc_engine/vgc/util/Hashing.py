@@ -0,0 +1,93 @@
+import numpy as np
+
+from vgc.datatypes.Constants import MAX_HIT_POINTS, MOVE_MAX_PP, MAX_TEAM_SIZE, DEFAULT_PKM_N_MOVES
+from vgc.datatypes.Types import N_STATUS, N_STATS, N_STAGES, N_ENTRY_HAZARD, N_HAZARD_STAGES, N_WEATHER, MIN_STAGE
+
+ZOBRIST_SEED = 0x5eed
+MAX_TURNS_ASLEEP = 4
+MAX_TURNS_CONFUSED = 4
+MAX_TURNS_NO_CLEAR = 5
+N_HP_BUCKETS = int(MAX_HIT_POINTS) + 1
+
+
+def _table(rng: np.random.Generator, *shape: int):
+    return rng.integers(0, 2 ** 63, size=shape, dtype=np.int64).tolist()
+
+
+# Zobrist tables, one random 63 bit code per value of every state feature. Python lists are faster to index than
+# numpy arrays for scalar lookups. Pkm features are indexed by team and slot (0 is the active pkm).
+_rng = np.random.default_rng(ZOBRIST_SEED)
+Z_HP = _table(_rng, 2, MAX_TEAM_SIZE, N_HP_BUCKETS)
+Z_STATUS = _table(_rng, 2, MAX_TEAM_SIZE, N_STATUS)
+Z_TURNS_ASLEEP = _table(_rng, 2, MAX_TEAM_SIZE, MAX_TURNS_ASLEEP + 1)
+Z_PP = _table(_rng, 2, MAX_TEAM_SIZE, DEFAULT_PKM_N_MOVES, MOVE_MAX_PP + 1)
+Z_STAGE = _table(_rng, 2, N_STATS, N_STAGES)
+Z_CONFUSED = _table(_rng, 2, MAX_TURNS_CONFUSED + 1)
+Z_ENTRY_HAZARD = _table(_rng, 2, N_ENTRY_HAZARD, N_HAZARD_STAGES + 1)
+Z_WEATHER = _table(_rng, N_WEATHER, MAX_TURNS_NO_CLEAR + 1)
+Z_SWITCHED = _table(_rng, 2)
+del _rng
+
+
+def pkm_key(pkm, t: int, slot: int) -> int:
+    """
+    Zobrist key of a pkm in a team slot. The static pkm data (type, hit points and moves) is folded in through its
+    hash, so pkm swapping slots change the key.
+
+    :param pkm: pkm
+    :param t: team index
+    :param slot: slot in the team, 0 is the active pkm
+    :return: 64 bit key
+    """
+    slot %= MAX_TEAM_SIZE
+    hp = int(pkm.hp)
+    key = hash((t, slot, hash(pkm))) ^ Z_HP[t][slot][hp if 0 <= hp < N_HP_BUCKETS else N_HP_BUCKETS - 1] ^ \
+        Z_STATUS[t][slot][pkm.status] ^ Z_TURNS_ASLEEP[t][slot][min(pkm.n_turns_asleep, MAX_TURNS_ASLEEP)]
+    for z_pp, move in zip(Z_PP[t][slot], pkm.moves):
+        key ^= z_pp[move.pp if move.pp <= MOVE_MAX_PP else MOVE_MAX_PP]
+    return key
+
+
+def team_key(team, t: int) -> int:
+    """
+    Zobrist key of a team, members, stages, confusion and entry hazards.
+
+    :param team: team
+    :param t: team index
+    :return: 64 bit key
+    """
+    key = pkm_key(team.active, t, 0)
+    for i, pkm in enumerate(team.party):
+        key ^= pkm_key(pkm, t, i + 1)
+    z_stage = Z_STAGE[t]
+    for stat, stage in enumerate(team.stage):
+        key ^= z_stage[stat][stage - MIN_STAGE]
+    if team.confused:
+        key ^= Z_CONFUSED[t][min(team.n_turns_confused, MAX_TURNS_CONFUSED)]
+    z_hazard = Z_ENTRY_HAZARD[t]
+    for hazard, level in enumerate(team.entry_hazard):
+        key ^= z_hazard[hazard][min(level, N_HAZARD_STAGES)]
+    return key
+
+
+def weather_key(condition: int, n_turns_no_clear: int) -> int:
+    """
+    Zobrist key of the weather.
+
+    :param condition: weather condition
+    :param n_turns_no_clear: turns since the weather is not clear
+    :return: 64 bit key
+    """
+    return Z_WEATHER[condition][min(n_turns_no_clear, MAX_TURNS_NO_CLEAR)]
+
+
+def game_state_key(game_state) -> int:
+    """
+    Zobrist key of a game state. Equal battle states have equal keys, hit points are bucketed to whole points and
+    revealed information is not part of the key.
+
+    :param game_state: game state
+    :return: 64 bit key
+    """
+    return team_key(game_state.teams[0], 0) ^ team_key(game_state.teams[1], 1) ^ \
+        weather_key(game_state.weather.condition, game_state.weather.n_turns_no_clear)
@@ -1,5 +1,7 @@
+import asyncio
 import contextlib
 import threading
+from multiprocessing.connection import Connection
 
 
 class WouldBlockError(Exception):
@@ -14,3 +16,36 @@ def non_blocking_lock(lock=threading.Lock()):
         yield lock
     finally:
         lock.release()
+
+
+async def wait_readable(conn: Connection):
+    """
+    Wait until a connection has data to receive, without blocking the event loop.
+
+    :param conn: connection
+    """
+    if conn.poll():
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        future = loop.create_future()
+        loop.add_reader(conn.fileno(), lambda: future.done() or future.set_result(None))
+    except NotImplementedError:
+        # event loops without reader callbacks, as the Windows proactor loop
+        await loop.run_in_executor(None, conn.poll, None)
+        return
+    try:
+        await future
+    finally:
+        loop.remove_reader(conn.fileno())
+
+
+async def recv_async(conn: Connection):
+    """
+    Receive from a connection without blocking the event loop while the message has not arrived.
+
+    :param conn: connection
+    :return: received object
+    """
+    await wait_readable(conn)
+    return conn.recv()